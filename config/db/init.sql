@@ -96,8 +96,10 @@ CREATE TABLE IF NOT EXISTS model_predictions (
     prediction_interval_upper DOUBLE PRECISION,
     confidence DOUBLE PRECISION,
     is_anomaly BOOLEAN DEFAULT false,
+    labels JSONB, -- label set of the forecast series
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+ALTER TABLE model_predictions ADD COLUMN IF NOT EXISTS labels JSONB;
 
 -- User feedback table - for learning from user input
 CREATE TABLE IF NOT EXISTS user_feedback (
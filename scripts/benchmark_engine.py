@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark ML Engine Throughput
+Times fetch, training and inference against a Prometheus (or fake_prometheus.py)
+
+Example:
+    python scripts/fake_prometheus.py --port 9091 --series 50 --latency-ms 20 &
+    python scripts/benchmark_engine.py --prometheus http://localhost:9091
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'services' / 'ml_engine'))
+
+from loguru import logger  # noqa: E402
+from data_collector import PrometheusDataCollector  # noqa: E402
+from anomaly_detector import AnomalyDetectorEngine  # noqa: E402
+
+
+def timed(label, func, *args, **kwargs):
+    """Run func and print its wall time"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {label:<32}{elapsed:>8.3f}s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ML engine fetch/train/inference throughput')
+    parser.add_argument('--prometheus', default='http://localhost:9091', help='Prometheus URL')
+    parser.add_argument('--config', default=str(ROOT / 'config' / 'ml_config.yml'), help='ML config file')
+    parser.add_argument('--lookback-hours', type=int, default=24, help='Training history to fetch')
+    parser.add_argument('--ticks', type=int, default=3, help='Inference ticks to run')
+    parser.add_argument('--verbose', action='store_true', help='Keep engine logging')
+
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level='WARNING')
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    config['prometheus_url'] = args.prometheus
+    config['model_path'] = tempfile.mkdtemp(prefix='saimon-bench-')
+    config['data_collection']['lookback_hours'] = args.lookback_hours
+    config.setdefault('api', {})['url'] = 'http://127.0.0.1:9'  # Don't post anomalies anywhere
+
+    collector = PrometheusDataCollector(config)
+    engine = AnomalyDetectorEngine(config)
+    engine._register_model_in_db = lambda *a, **k: None
+
+    metric_names = [m['name'] for m in config['data_collection']['metrics']]
+    print(f"📊 {len(metric_names)} metrics, {args.lookback_hours}h history, models in {config['model_path']}\n")
+
+    total_points = 0
+    for name in metric_names:
+        batch, _ = timed(f"fetch training {name[:20]}", collector.fetch_training_batch, name)
+        total_points += len(batch)
+        timed(f"train {name[:26]}", engine.train_metric_models, name, batch)
+
+    print(f"\n📦 {total_points} training points\n")
+
+    for tick in range(args.ticks):
+        data, fetch_time = timed(f"tick {tick + 1} fetch recent", collector.fetch_recent_metrics)
+        anomalies, detect_time = timed(f"tick {tick + 1} detect", engine.detect_anomalies, data)
+        points = sum(len(df) for df in data.values())
+        print(f"   {points} points, {len(anomalies)} anomalies, "
+              f"{points / max(detect_time, 1e-9):,.0f} points/s scored\n")
+
+
+if __name__ == '__main__':
+    main()
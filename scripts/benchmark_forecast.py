@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark Seasonal AR Forecasting
+Times fitting the seasonal AR forecaster for many series at once and the
+one-step-ahead forecast of a detection tick, and checks forecast accuracy
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'services' / 'ml_engine'))
+
+from forecast import SeasonalARForecaster  # noqa: E402
+
+
+STEP_MS = 60_000
+
+
+def make_series(rng, n_series, points, start_ms, phi=0.7):
+    """Daily-seasonal series with AR(1) noise, in series-major order"""
+    t = start_ms + np.arange(points, dtype=np.int64) * STEP_MS
+    hours = (t % 86_400_000) / 3_600_000
+    level = rng.uniform(10, 100, (n_series, 1))
+    amplitude = rng.uniform(1, 20, (n_series, 1))
+    noise = rng.normal(0, 1, (n_series, points))
+    for i in range(1, points):
+        noise[:, i] += phi * noise[:, i - 1]
+    values = level + amplitude * np.sin(2 * np.pi * hours / 24) + noise
+    return np.tile(t, n_series), values.ravel(), np.repeat(np.arange(n_series), points)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark seasonal AR fit and forecast')
+    parser.add_argument('--series', type=int, default=10000, help='Number of series')
+    parser.add_argument('--points', type=int, default=1440, help='Training points per series')
+    parser.add_argument('--tick', type=int, default=5, help='New points per series per detection tick')
+    parser.add_argument('--p', type=int, default=2, help='AR order')
+    parser.add_argument('--d', type=int, default=0, help='Differencing (0 or 1)')
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    keys = [f"series-{i}" for i in range(args.series)]
+    start_ms = 1_700_000_000_000 // STEP_MS * STEP_MS
+
+    timestamps, values, series = make_series(rng, args.series, args.points + args.tick, start_ms)
+    per_series = args.points + args.tick
+    train = (np.arange(len(values)) % per_series) < args.points
+    test = ~train
+
+    start = time.perf_counter()
+    model = SeasonalARForecaster.fit(values[train], series[train], keys, timestamps[train],
+                                     p=args.p, d=args.d)
+    fit_time = time.perf_counter() - start
+
+    # History as the engine keeps it between ticks: the last p + d samples
+    history = {}
+    warm = (np.arange(len(values)) % per_series) == args.points - 1
+    model.forecast(values[warm], series[warm], keys, timestamps[warm], history=history)
+
+    start = time.perf_counter()
+    expected, sigma = model.forecast(values[test], series[test], keys, timestamps[test], history=history)
+    forecast_time = time.perf_counter() - start
+
+    error = values[test] - expected
+    coverage = (np.abs(error) <= 1.96 * sigma).mean()
+
+    print(f"series: {args.series}, training points per series: {args.points}, AR({args.p}), d={args.d}")
+    print(f"fit:      {fit_time:8.2f} s  ({args.series * args.points / fit_time / 1e6:.1f}M samples/s)")
+    print(f"forecast: {forecast_time * 1000:8.1f} ms for {test.sum()} samples "
+          f"({forecast_time / args.series * 1e6:.1f} us per series)")
+    print(f"rmse: {np.sqrt(np.mean(error ** 2)):.3f}  mean sigma: {sigma.mean():.3f}  "
+          f"95% interval coverage: {coverage:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark Isolation Forest Scoring
+Compares scikit-learn's decision_function with the array-backed CompactIsolationForest
+"""
+
+import sys
+import time
+import pickle
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'services' / 'ml_engine'))
+
+from forest_scorer import CompactIsolationForest  # noqa: E402
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Isolation Forest scoring')
+    parser.add_argument('--batch-sizes', default='1,10,60,1000,10000', help='Comma-separated rows per call')
+    parser.add_argument('--features', type=int, default=20, help='Feature columns')
+    parser.add_argument('--trees', type=int, default=100, help='n_estimators')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (best is reported)')
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    train = rng.normal(50, 10, (20000, args.features)).astype(np.float32)
+
+    scaler = StandardScaler()
+    model = IsolationForest(n_estimators=args.trees, max_samples=256, random_state=42)
+    model.fit(scaler.fit_transform(train))
+
+    forest_dir = Path(tempfile.mkdtemp(prefix='saimon-forest-')) / 'model.forest'
+    CompactIsolationForest.from_sklearn(model, scaler).save(forest_dir)
+    compact = CompactIsolationForest.load(forest_dir)
+
+    pickled = len(pickle.dumps({'model': model, 'scaler': scaler}))
+    print(f"🌲 {args.trees} trees, {args.features} features")
+    print(f"💾 Pickle {pickled / 1024:.0f} KiB, compact export {compact.nbytes / 1024:.0f} KiB (memory-mapped)\n")
+    print(f"{'rows':>8}{'sklearn (ms)':>14}{'compact (ms)':>14}{'speedup':>9}{'max abs err':>13}")
+
+    for size in [int(s) for s in args.batch_sizes.split(',')]:
+        batch = rng.normal(50, 15, (size, args.features)).astype(np.float32)
+
+        sklearn_time = best_of(lambda: model.decision_function(scaler.transform(batch)), args.repeat)
+        compact_time = best_of(lambda: compact.decision_function(batch), args.repeat)
+        error = np.max(np.abs(model.decision_function(scaler.transform(batch)) - compact.decision_function(batch)))
+
+        print(f"{size:>8}{sklearn_time * 1000:>14.3f}{compact_time * 1000:>14.3f}"
+              f"{sklearn_time / compact_time:>8.1f}x{error:>13.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark Streaming Half-Space Trees
+Times online scoring and learning per detection tick for many series, and
+checks that injected outliers score above normal samples
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'services' / 'ml_engine'))
+
+from halfspace_trees import HalfSpaceTrees  # noqa: E402
+
+
+def make_tick(rng, n_series, columns, outlier_rate=0.0):
+    """One scrape of every series: correlated features and optional outliers"""
+    base = rng.normal(0, 1, (n_series, 3))
+    features = np.repeat(base, -(-columns // 3), axis=1)[:, :columns] + rng.normal(0, 0.2, (n_series, columns))
+    outliers = rng.random(n_series) < outlier_rate
+    features[outliers] += rng.normal(0, 6, (outliers.sum(), columns))
+    return features, outliers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark online Half-Space Trees')
+    parser.add_argument('--series', type=int, default=5000, help='Series scraped per tick')
+    parser.add_argument('--ticks', type=int, default=20, help='Ticks to stream')
+    parser.add_argument('--features', type=int, default=20, help='Feature columns')
+    parser.add_argument('--trees', type=int, default=10, help='Number of trees')
+    parser.add_argument('--height', type=int, default=8, help='Tree height')
+    parser.add_argument('--window', type=int, default=5000, help='Samples per mass window')
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    model = HalfSpaceTrees(n_trees=args.trees, height=args.height, window_size=args.window)
+
+    # Warm up: the first window lays out the trees, the second calibrates
+    for _ in range(-(-2 * args.window // args.series) + 1):
+        model.score_learn(make_tick(rng, args.series, args.features)[0])
+
+    times, outlier_scores, normal_scores = [], [], []
+    for _ in range(args.ticks):
+        features, outliers = make_tick(rng, args.series, args.features, outlier_rate=0.001)
+        start = time.perf_counter()
+        scores = model.score_learn(features)
+        times.append(time.perf_counter() - start)
+        outlier_scores.append(scores[outliers])
+        normal_scores.append(scores[~outliers])
+
+    tick = np.median(times)
+    outlier_scores = np.concatenate(outlier_scores)
+    normal_scores = np.concatenate(normal_scores)
+    print(f"series: {args.series}, features: {args.features}, trees: {args.trees}, "
+          f"height: {args.height}, window: {args.window}")
+    print(f"tick:   {tick * 1000:8.1f} ms  ({tick / args.series * 1e6:.2f} us per sample, score + learn)")
+    print(f"normal scores:  median {np.median(normal_scores):.3f}, 99th percentile "
+          f"{np.percentile(normal_scores, 99):.3f}")
+    if len(outlier_scores):
+        print(f"outlier scores: median {np.median(outlier_scores):.3f}, "
+              f"flagged at 0.7: {(outlier_scores > 0.7).mean():.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark One-Class SVM Training
+Compares fit time and score agreement of the exact kernel One-Class SVM with
+the Nystroem + SGD approximation, with and without subsampling
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+from scipy import stats
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'services' / 'ml_engine'))
+
+from anomaly_detector import _fit_one_class_svm  # noqa: E402
+
+
+def make_features(rng, size, columns):
+    """Correlated features with a share of injected outliers"""
+    base = rng.normal(0, 1, (size, 4))
+    mixing = rng.normal(0, 1, (4, columns))
+    features = base @ mixing + rng.normal(0, 0.3, (size, columns))
+    outliers = rng.random(size) < 0.01
+    features[outliers] += rng.normal(0, 6, (outliers.sum(), columns))
+    return features.astype(np.float32), outliers
+
+
+def fit_and_score(config, train, test):
+    start = time.perf_counter()
+    model, scaler = _fit_one_class_svm(train, config)
+    fit_time = time.perf_counter() - start
+    # Raw decision values; negative is outside the model's nu boundary
+    return fit_time, model.decision_function(scaler.transform(test))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark exact vs approximate One-Class SVM')
+    parser.add_argument('--sizes', default='2000,5000,10000,20000', help='Comma-separated training set sizes')
+    parser.add_argument('--features', type=int, default=20, help='Feature columns')
+    parser.add_argument('--components', type=int, default=300, help='Nystroem components')
+    parser.add_argument('--subsample', type=int, default=5000, help='Subsample size for the subsampled variant')
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    base = {'kernel': 'rbf', 'gamma': 'auto', 'nu': 0.1}
+    variants = [
+        ('approximate', {**base, 'mode': 'approximate', 'n_components': args.components}),
+        ('approx+subsample', {**base, 'mode': 'approximate', 'n_components': args.components,
+                              'subsample_size': args.subsample}),
+        ('exact+subsample', {**base, 'subsample_size': args.subsample}),
+    ]
+
+    print(f"{'rows':>7} {'variant':<18}{'fit (s)':>9}{'speedup':>9}{'spearman':>10}{'flag agree':>12}{'outlier recall':>16}")
+
+    for size in [int(s) for s in args.sizes.split(',')]:
+        train, _ = make_features(rng, size, args.features)
+        test, outliers = make_features(rng, 2000, args.features)
+
+        exact_time, exact_scores = fit_and_score(base, train, test)
+        exact_flags = exact_scores < 0
+        print(f"{size:>7} {'exact':<18}{exact_time:>9.2f}{'':>9}{'':>10}{'':>12}"
+              f"{exact_flags[outliers].mean():>16.2f}")
+
+        for name, config in variants:
+            fit_time, scores = fit_and_score(config, train, test)
+            flags = scores < 0
+            rho = stats.spearmanr(exact_scores, scores).correlation
+            print(f"{'':>7} {name:<18}{fit_time:>9.2f}{exact_time / fit_time:>8.1f}x{rho:>10.4f}"
+                  f"{(flags == exact_flags).mean():>12.3f}{flags[outliers].mean():>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
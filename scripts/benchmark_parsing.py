@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark Prometheus Response Parsing
+Compares the legacy dict-per-sample decoder with the columnar SeriesBatch decoder
+"""
+
+import sys
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'services' / 'ml_engine'))
+
+from series_batch import parse_query_range  # noqa: E402
+
+
+def make_result(n_series, n_points, step=60):
+    """Build a synthetic query_range result matrix"""
+    rng = np.random.default_rng(42)
+    start = 1_700_000_000
+    result = []
+    for s in range(n_series):
+        values = rng.normal(50, 10, n_points)
+        result.append({
+            'metric': {'__name__': 'node_cpu_seconds_total', 'cpu': str(s), 'mode': 'idle', 'instance': 'node-exporter:9100'},
+            'values': [[start + i * step, repr(float(v))] for i, v in enumerate(values)]
+        })
+    return result
+
+
+def parse_legacy(result):
+    """The original per-sample decoder from PrometheusDataCollector"""
+    data_points = []
+    for metric_result in result:
+        metric_labels = metric_result['metric']
+        for timestamp, value in metric_result['values']:
+            data_points.append({
+                'timestamp': datetime.fromtimestamp(float(timestamp)),
+                'value': float(value),
+                'labels': metric_labels
+            })
+    return pd.DataFrame(data_points)
+
+
+def parse_columnar(result):
+    """The columnar decoder, materialized as a DataFrame"""
+    return parse_query_range(result).to_frame()
+
+
+def measure(func, result, repeat):
+    """Return (best seconds, peak traced bytes) for a decoder"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(result)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(result)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark query_range response parsing')
+    parser.add_argument('--series', type=int, default=16, help='Number of series in the response')
+    parser.add_argument('--points', type=int, default=10080, help='Points per series (10080 = 7 days at 1m)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is reported)')
+
+    args = parser.parse_args()
+
+    print(f"📦 Building response: {args.series} series x {args.points} points")
+    result = make_result(args.series, args.points)
+    total = args.series * args.points
+
+    rows = []
+    for name, func in [('legacy', parse_legacy), ('columnar', parse_columnar),
+                       ('columnar (arrays only)', parse_query_range)]:
+        seconds, peak = measure(func, result, args.repeat)
+        rows.append((name, seconds, peak))
+
+    print(f"\n{'decoder':<24}{'time (s)':>10}{'Mpts/s':>10}{'peak MB':>10}")
+    for name, seconds, peak in rows:
+        print(f"{name:<24}{seconds:>10.3f}{total / seconds / 1e6:>10.2f}{peak / 1e6:>10.1f}")
+
+    legacy_time, legacy_peak = rows[0][1], rows[0][2]
+    for name, seconds, peak in rows[1:]:
+        print(f"\n⚡ {name}: {legacy_time / seconds:.1f}x faster, {legacy_peak / max(peak, 1):.1f}x less peak memory")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Recorded-Data Prometheus Stand-in
+Serves /api/v1/query_range, /api/v1/query and /api/v1/label/__name__/values
+from recorded or synthetic series, for offline benchmarking of the ML engine
+
+Point the ML engine and API at it with PROMETHEUS_URL=http://localhost:9091
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import yaml
+
+# Prometheus rejects range queries above this many points per series
+MAX_POINTS_PER_SERIES = 11000
+
+# Points per range query when recording (data_collection.fetch.max_points_per_shard)
+RECORD_POINTS_PER_SHARD = 10000
+
+DEFAULT_METRICS = [
+    'node_cpu_seconds_total',
+    'node_memory_MemAvailable_bytes',
+    'node_disk_read_bytes_total',
+    'node_disk_written_bytes_total',
+    'node_network_receive_bytes_total',
+    'node_network_transmit_bytes_total',
+]
+
+_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_duration(value):
+    """Parse a Prometheus duration ('1m', '30s') or float seconds"""
+    value = str(value).strip()
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)(ms|s|m|h|d|w)', value)
+    if match:
+        return float(match.group(1)) * _UNITS[match.group(2)]
+    return float(value)
+
+
+def parse_time(value):
+    """Parse an RFC3339 or unix timestamp query parameter"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+class RecordedSeries:
+    """One series replayed cyclically over its recorded time span"""
+
+    def __init__(self, labels, timestamps, values):
+        order = np.argsort(timestamps)
+        self.labels = labels
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)[order]
+        self.values = np.asarray(values, dtype=np.float64)[order]
+        self.start = self.timestamps[0]
+        self.period = max(self.timestamps[-1] - self.start, 1.0)
+
+    def sample(self, grid):
+        """Value at each requested timestamp, wrapping around the recording"""
+        offsets = (grid - self.start) % self.period + self.start
+        idx = np.searchsorted(self.timestamps, offsets, side='right') - 1
+        return self.values[np.clip(idx, 0, len(self.values) - 1)]
+
+
+class SyntheticSeries:
+    """Deterministic daily-seasonal series with noise and sparse spikes"""
+
+    def __init__(self, labels, seed, base, anomaly_rate):
+        rng = np.random.default_rng(seed)
+        self.labels = labels
+        self.seed = seed
+        self.base = base
+        self.amplitude = base * rng.uniform(0.1, 0.3)
+        self.noise = base * rng.uniform(0.02, 0.05)
+        self.phase = rng.uniform(0, 2 * np.pi)
+        self.anomaly_rate = anomaly_rate
+
+    def _hash(self, grid, salt):
+        """Stateless pseudo-random numbers in [0, 1) keyed by timestamp"""
+        return np.modf(np.abs(np.sin(grid * 12.9898 + (self.seed + salt) * 78.233)) * 43758.5453)[0]
+
+    def sample(self, grid):
+        daily = self.amplitude * np.sin(2 * np.pi * grid / 86400 + self.phase)
+        noise = self.noise * (self._hash(grid, 1) * 2 - 1)
+        spikes = np.where(self._hash(grid, 2) < self.anomaly_rate, self.base * 2, 0.0)
+        return self.base + daily + noise + spikes
+
+
+class SeriesStore:
+    """All series served by the stand-in, keyed by metric name"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, series):
+        self.metrics.setdefault(name, []).append(series)
+
+    def resolve(self, query):
+        """
+        Map a PromQL expression to a stored metric
+
+        PromQL is not evaluated: the first known metric name in the query
+        is served as-is, so rate()/aggregations return the raw series.
+        """
+        for token in re.findall(r'[a-zA-Z_:][a-zA-Z0-9_:]*', query):
+            if token in self.metrics:
+                return token
+        return None
+
+    def load_recordings(self, directory):
+        """Load ``<metric>.json`` files holding saved query_range responses"""
+        for path in sorted(Path(directory).glob('*.json')):
+            with open(path, 'r') as f:
+                payload = json.load(f)
+            result = payload.get('data', {}).get('result', payload if isinstance(payload, list) else [])
+            for item in result:
+                samples = item.get('values', [])
+                if not samples:
+                    continue
+                timestamps = [float(t) for t, _ in samples]
+                values = [float(v) for _, v in samples]
+                self.add(path.stem, RecordedSeries(item['metric'], timestamps, values))
+
+    def add_synthetic(self, metric_names, series_per_metric, anomaly_rate, seed):
+        for m, name in enumerate(metric_names):
+            for s in range(series_per_metric):
+                labels = {'__name__': name, 'instance': f'host-{s}:9100', 'job': 'node-exporter'}
+                base = 10 ** (1 + (m + s) % 6)
+                self.add(name, SyntheticSeries(labels, seed + m * 1000 + s, base, anomaly_rate))
+
+
+def make_handler(store, latency, jitter):
+    """Build the request handler bound to a store and latency profile"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, status, error_type, message):
+            self._send(status, {'status': 'error', 'errorType': error_type, 'error': message})
+
+        def _params(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if self.command == 'POST':
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length).decode()
+                params.update({k: v[0] for k, v in parse_qs(body).items()})
+            return url.path, params
+
+        def _delay(self):
+            if latency or jitter:
+                time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+        def _handle(self):
+            path, params = self._params()
+            self._delay()
+
+            if path == '/-/healthy':
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b'Prometheus is Healthy.\n')
+            elif path == '/api/v1/label/__name__/values':
+                self._send(200, {'status': 'success', 'data': sorted(store.metrics)})
+            elif path == '/api/v1/query_range':
+                self._query_range(params)
+            elif path == '/api/v1/query':
+                self._query(params)
+            else:
+                self._error(404, 'not_found', f'unknown endpoint {path}')
+
+        def _query_range(self, params):
+            try:
+                start = parse_time(params['start'])
+                end = parse_time(params['end'])
+                step = parse_duration(params['step'])
+            except (KeyError, ValueError) as e:
+                self._error(400, 'bad_data', f'invalid parameter: {e}')
+                return
+
+            if step <= 0 or end < start:
+                self._error(400, 'bad_data', 'invalid time range or step')
+                return
+            if (end - start) / step > MAX_POINTS_PER_SERIES:
+                self._error(400, 'bad_data',
+                            'exceeded maximum resolution of 11,000 points per timeseries. '
+                            'Try decreasing the query resolution (?step=XX)')
+                return
+
+            name = store.resolve(params.get('query', ''))
+            grid = start + np.arange(int((end - start) // step) + 1) * step
+            result = []
+            for series in store.metrics.get(name, []):
+                values = series.sample(grid)
+                result.append({
+                    'metric': series.labels,
+                    'values': [[float(t), repr(float(v))] for t, v in zip(grid, values)]
+                })
+            self._send(200, {'status': 'success', 'data': {'resultType': 'matrix', 'result': result}})
+
+        def _query(self, params):
+            at = parse_time(params['time']) if 'time' in params else time.time()
+            name = store.resolve(params.get('query', ''))
+            grid = np.array([at])
+            result = [
+                {'metric': series.labels, 'value': [at, repr(float(series.sample(grid)[0]))]}
+                for series in store.metrics.get(name, [])
+            ]
+            self._send(200, {'status': 'success', 'data': {'resultType': 'vector', 'result': result}})
+
+        def do_GET(self):
+            self._handle()
+
+        def do_POST(self):
+            self._handle()
+
+    return Handler
+
+
+def record(args):
+    """Save query_range responses from a live Prometheus for later replay"""
+    import httpx
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    end = time.time()
+    start = end - args.hours * 3600
+    step = parse_duration(args.step)
+
+    # Split the range like the ML engine's training fetches, so recordings
+    # longer than 11,000 steps stay under Prometheus' per-series limit
+    shard_span = (RECORD_POINTS_PER_SHARD - 1) * step
+    shards = []
+    shard_start = start
+    while shard_start <= end:
+        shard_end = min(shard_start + shard_span, end)
+        shards.append((shard_start, shard_end))
+        shard_start = shard_end + step
+
+    for name in args.metrics:
+        series = {}
+        for shard_start, shard_end in shards:
+            response = httpx.get(f"{args.source}/api/v1/query_range",
+                                 params={'query': name, 'start': shard_start, 'end': shard_end, 'step': args.step},
+                                 timeout=60)
+            response.raise_for_status()
+            for item in response.json().get('data', {}).get('result', []):
+                key = json.dumps(item['metric'], sort_keys=True)
+                series.setdefault(key, {'metric': item['metric'], 'values': []})['values'].extend(item.get('values', []))
+
+        payload = {'status': 'success', 'data': {'resultType': 'matrix', 'result': list(series.values())}}
+        with open(out_dir / f"{name}.json", 'w') as f:
+            json.dump(payload, f)
+        print(f"💾 Recorded {name} ({len(shards)} queries)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prometheus stand-in serving recorded or synthetic series')
+    parser.add_argument('--port', type=int, default=9091, help='Port to listen on')
+    parser.add_argument('--recordings', help='Directory of <metric>.json query_range responses to replay')
+    parser.add_argument('--config', help='ml_config.yml to take synthetic metric names from')
+    parser.add_argument('--series', type=int, default=4, help='Synthetic series per metric')
+    parser.add_argument('--anomaly-rate', type=float, default=0.002, help='Synthetic spike probability per point')
+    parser.add_argument('--seed', type=int, default=42, help='Synthetic data seed')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Added latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Random +/- latency jitter')
+    parser.add_argument('--record', action='store_true', help='Record from --source into --out instead of serving')
+    parser.add_argument('--source', default='http://localhost:9090', help='Prometheus to record from')
+    parser.add_argument('--out', default='recordings', help='Recording output directory')
+    parser.add_argument('--hours', type=float, default=24, help='Hours of history to record')
+    parser.add_argument('--step', default='1m', help='Recording step')
+
+    args = parser.parse_args()
+
+    metric_names = DEFAULT_METRICS
+    if args.config:
+        with open(args.config, 'r') as f:
+            config = yaml.safe_load(f)
+        metric_names = [m['name'] for m in config.get('data_collection', {}).get('metrics', [])]
+    args.metrics = metric_names
+
+    if args.record:
+        record(args)
+        return
+
+    store = SeriesStore()
+    if args.recordings:
+        store.load_recordings(args.recordings)
+    else:
+        store.add_synthetic(metric_names, args.series, args.anomaly_rate, args.seed)
+
+    if not store.metrics:
+        print("❌ No series to serve")
+        sys.exit(1)
+
+    handler = make_handler(store, args.latency_ms / 1000, args.jitter_ms / 1000)
+    server = ThreadingHTTPServer(('0.0.0.0', args.port), handler)
+
+    total = sum(len(series) for series in store.metrics.values())
+    print(f"📡 Serving {len(store.metrics)} metrics ({total} series) on http://localhost:{args.port}")
+    print(f"⏱️  Latency: {args.latency_ms}ms ± {args.jitter_ms}ms")
+    print(f"🔥 Press Ctrl+C to stop\n")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
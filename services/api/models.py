@@ -97,6 +97,24 @@ class Alert(Base):
     anomaly = relationship("Anomaly", back_populates="alerts")
 
 
+class ModelPrediction(Base):
+    """Forecasts with prediction intervals, for monitoring model quality"""
+    __tablename__ = "model_predictions"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    model_id = Column(UUID(as_uuid=True), ForeignKey("ml_models.id"))
+    metric_id = Column(UUID(as_uuid=True), ForeignKey("metrics.id"))
+    timestamp = Column(DateTime, nullable=False, index=True)
+    actual_value = Column(Float)
+    predicted_value = Column(Float, nullable=False)
+    prediction_interval_lower = Column(Float)
+    prediction_interval_upper = Column(Float)
+    confidence = Column(Float)
+    is_anomaly = Column(Boolean, default=False)
+    labels = Column(JSON)  # Series the forecast belongs to
+    created_at = Column(DateTime, server_default=func.now())
+
+
 class TrainingJob(Base):
     """Model training job tracking"""
     __tablename__ = "training_jobs"
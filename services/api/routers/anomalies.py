@@ -24,6 +24,8 @@ class AnomalyCreate(BaseModel):
     severity: str
     algorithm: str = "unknown"
     labels: Dict = {}
+    context: Dict = {}
+    id: Optional[uuid.UUID] = None  # Event id; re-sending it updates that anomaly
 
 
 @router.post("/anomalies")
@@ -31,7 +33,24 @@ async def create_anomaly(
     anomaly: AnomalyCreate,
     db: Session = Depends(get_db)
 ):
-    """Create a new anomaly record"""
+    """Create a new anomaly record, or update the one with the given id"""
+    anomaly_id = anomaly.id or uuid.uuid4()
+    
+    # An ongoing anomaly is re-sent as it grows: update it in place
+    existing = db.query(db_models.Anomaly).filter(db_models.Anomaly.id == anomaly_id).first() \
+        if anomaly.id else None
+    if existing is not None:
+        existing.value = anomaly.value
+        existing.expected_value = anomaly.expected_value
+        existing.anomaly_score = anomaly.anomaly_score
+        existing.severity = anomaly.severity
+        existing.context = anomaly.context or None
+        db.commit()
+        return {
+            "message": "Anomaly updated successfully",
+            "anomaly_id": str(existing.id)
+        }
+    
     # Get or create metric
     metric = db.query(db_models.Metric).filter(
         db_models.Metric.name == anomaly.metric_name
@@ -49,14 +68,15 @@ async def create_anomaly(
     
     # Create anomaly
     db_anomaly = db_models.Anomaly(
-        id=uuid.uuid4(),
+        id=anomaly_id,
         metric_id=metric.id,
         timestamp=datetime.fromisoformat(anomaly.timestamp) if isinstance(anomaly.timestamp, str) else anomaly.timestamp,
         value=anomaly.value,
         expected_value=anomaly.expected_value,
         anomaly_score=anomaly.anomaly_score,
         severity=anomaly.severity,
-        labels=anomaly.labels
+        labels=anomaly.labels,
+        context=anomaly.context or None
     )
     
     db.add(db_anomaly)
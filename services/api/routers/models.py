@@ -3,10 +3,11 @@ ML model management endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, List, Dict
 from pydantic import BaseModel
 from datetime import datetime
 from uuid import UUID
+import uuid
 
 from database import get_db
 import models as db_models
@@ -27,6 +28,25 @@ class ModelCreate(BaseModel):
     trained_at: Optional[datetime] = None
 
 
+class PredictionPoint(BaseModel):
+    """One forecast"""
+    timestamp: datetime
+    actual_value: Optional[float] = None
+    predicted_value: float
+    prediction_interval_lower: Optional[float] = None
+    prediction_interval_upper: Optional[float] = None
+    confidence: Optional[float] = None
+    is_anomaly: bool = False
+    labels: Dict = {}
+
+
+class PredictionBatch(BaseModel):
+    """Schema for storing the forecasts of one metric"""
+    metric_name: str
+    model_type: str
+    predictions: List[PredictionPoint]
+
+
 @router.get("/models")
 async def list_models(
     active_only: bool = False,
@@ -134,6 +154,50 @@ async def activate_model(model_id: str, db: Session = Depends(get_db)):
     }
 
 
+@router.post("/predictions")
+async def create_predictions(batch: PredictionBatch, db: Session = Depends(get_db)):
+    """Store a batch of model predictions for a metric"""
+    try:
+        # Get or create metric
+        metric = db.query(db_models.Metric).filter(
+            db_models.Metric.name == batch.metric_name
+        ).first()
+        
+        if not metric:
+            metric = db_models.Metric(
+                id=uuid.uuid4(),
+                name=batch.metric_name,
+                metric_type="system"
+            )
+            db.add(metric)
+            db.flush()
+        
+        # Latest model of this type for the metric, if registered
+        model = db.query(db_models.MLModel).filter(
+            db_models.MLModel.metric_id == metric.id,
+            db_models.MLModel.model_type == batch.model_type
+        ).order_by(db_models.MLModel.created_at.desc()).first()
+        
+        db.bulk_insert_mappings(db_models.ModelPrediction, [
+            {
+                "id": uuid.uuid4(),
+                "model_id": model.id if model else None,
+                "metric_id": metric.id,
+                **prediction.model_dump()
+            }
+            for prediction in batch.predictions
+        ])
+        db.commit()
+        
+        return {
+            "message": "Predictions stored successfully",
+            "count": len(batch.predictions)
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error storing predictions: {str(e)}")
+
+
 @router.get("/training-jobs")
 async def list_training_jobs(
     status: Optional[str] = Query(None, regex="^(queued|running|completed|failed)$"),
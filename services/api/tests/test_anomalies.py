@@ -0,0 +1,101 @@
+"""
+Tests for the anomaly endpoints
+"""
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from database import get_db
+from routers import anomalies
+
+
+class FakeQuery:
+    def __init__(self, result):
+        self.result = result
+
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        return self.result
+
+
+class FakeSession:
+    """Session stand-in holding at most one stored anomaly"""
+
+    def __init__(self, existing=None):
+        self.existing = existing
+        self.added = []
+        self.commits = 0
+
+    def query(self, model):
+        return FakeQuery(self.existing if model is anomalies.db_models.Anomaly else None)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def flush(self):
+        pass
+
+    def commit(self):
+        self.commits += 1
+
+    def refresh(self, obj):
+        pass
+
+
+def make_client(session):
+    app = FastAPI()
+    app.include_router(anomalies.router, prefix="/api/v1")
+    app.dependency_overrides[get_db] = lambda: session
+    return TestClient(app)
+
+
+def payload(**overrides):
+    anomaly = {
+        "metric_name": "node_cpu_seconds_total",
+        "timestamp": "2024-01-01T00:00:00",
+        "value": 1.0,
+        "anomaly_score": 0.9,
+        "severity": "high"
+    }
+    anomaly.update(overrides)
+    return anomaly
+
+
+@pytest.mark.parametrize("bad_id", ["not-a-uuid", "1234", ""])
+def test_create_anomaly_rejects_malformed_id(bad_id):
+    session = FakeSession()
+    response = make_client(session).post("/api/v1/anomalies", json=payload(id=bad_id))
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "id"]
+    assert session.commits == 0
+
+
+def test_create_anomaly_keeps_given_id():
+    event_id = uuid.uuid4()
+    session = FakeSession()
+    response = make_client(session).post("/api/v1/anomalies", json=payload(id=str(event_id)))
+
+    assert response.status_code == 200
+    assert response.json()["anomaly_id"] == str(event_id)
+    assert session.added[-1].id == event_id
+
+
+def test_create_anomaly_updates_existing_event():
+    event_id = uuid.uuid4()
+    existing = anomalies.db_models.Anomaly(id=event_id, anomaly_score=0.8, severity="medium")
+    session = FakeSession(existing)
+    response = make_client(session).post(
+        "/api/v1/anomalies",
+        json=payload(id=str(event_id), anomaly_score=0.97, severity="critical", context={"ongoing": True})
+    )
+
+    assert response.status_code == 200
+    assert response.json()["message"] == "Anomaly updated successfully"
+    assert existing.anomaly_score == 0.97
+    assert existing.severity == "critical"
+    assert not session.added
@@ -0,0 +1,174 @@
+"""
+Columnar Anomaly Batches
+Detected anomalies stored as arrays instead of one dict per point
+"""
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+
+SEVERITY_NAMES = ('low', 'medium', 'high', 'critical')
+
+
+def severity_thresholds(severity_levels: dict) -> np.ndarray:
+    """Ascending score thresholds of the medium, high and critical levels"""
+    return np.array([
+        severity_levels.get('medium', 0.85),
+        severity_levels.get('high', 0.95),
+        severity_levels.get('critical', 0.99)
+    ], dtype=np.float64)
+
+
+def severity_codes(scores: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    """Index into SEVERITY_NAMES for every score"""
+    return np.searchsorted(thresholds, scores, side='right').astype(np.int8)
+
+
+@dataclass
+class AnomalyBatch:
+    """
+    Anomalies of one or more metrics stored column-wise
+
+    Each row is an anomaly event covering ``count`` consecutive points from
+    ``timestamp`` to ``end_timestamp``; single-point events have count 1.
+
+    Attributes:
+        metric_name: Metric of each anomaly (object array of str)
+        timestamp: int64 epoch milliseconds of the first point
+        value: Observed value at the peak
+        anomaly_score: Peak scores in 0-1
+        severity: Codes into SEVERITY_NAMES
+        model_type: Model that flagged each anomaly (object array of str)
+        labels: Label dict of each anomaly's series (object array)
+        detected_at: Detection time shared by the batch
+        end_timestamp: int64 epoch milliseconds of the last point
+        count: Points in each event
+        context: Extra detail of each anomaly, a dict or None (object array)
+        expected_value: Forecast value at the peak, NaN without a forecast
+        event_id: Id of the run each row reports; rows of a run that is
+            still growing are re-sent under the same id (object array)
+        ongoing: Whether the run was still open when reported
+    """
+    metric_name: np.ndarray
+    timestamp: np.ndarray
+    value: np.ndarray
+    anomaly_score: np.ndarray
+    severity: np.ndarray
+    model_type: np.ndarray
+    labels: np.ndarray
+    detected_at: datetime = None
+    end_timestamp: np.ndarray = None
+    count: np.ndarray = None
+    context: np.ndarray = None
+    expected_value: np.ndarray = None
+    event_id: np.ndarray = None
+    ongoing: np.ndarray = None
+
+    def __post_init__(self):
+        if self.end_timestamp is None:
+            self.end_timestamp = self.timestamp
+        if self.count is None:
+            self.count = np.ones(len(self.timestamp), dtype=np.int64)
+        if self.context is None:
+            self.context = np.full(len(self.timestamp), None, dtype=object)
+        if self.expected_value is None:
+            self.expected_value = np.full(len(self.timestamp), np.nan)
+        if self.event_id is None:
+            self.event_id = np.full(len(self.timestamp), None, dtype=object)
+        if self.ongoing is None:
+            self.ongoing = np.zeros(len(self.timestamp), dtype=bool)
+
+    @classmethod
+    def empty_batch(cls) -> 'AnomalyBatch':
+        return cls(
+            metric_name=np.empty(0, dtype=object),
+            timestamp=np.empty(0, dtype=np.int64),
+            value=np.empty(0, dtype=np.float64),
+            anomaly_score=np.empty(0, dtype=np.float64),
+            severity=np.empty(0, dtype=np.int8),
+            model_type=np.empty(0, dtype=object),
+            labels=np.empty(0, dtype=object)
+        )
+
+    @classmethod
+    def concat(cls, batches: list) -> 'AnomalyBatch':
+        """Join batches, keeping the latest detection time"""
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return cls.empty_batch()
+        if len(batches) == 1:
+            return batches[0]
+
+        detected = [batch.detected_at for batch in batches if batch.detected_at is not None]
+        return cls(
+            metric_name=np.concatenate([b.metric_name for b in batches]),
+            timestamp=np.concatenate([b.timestamp for b in batches]),
+            value=np.concatenate([b.value for b in batches]),
+            anomaly_score=np.concatenate([b.anomaly_score for b in batches]),
+            severity=np.concatenate([b.severity for b in batches]),
+            model_type=np.concatenate([b.model_type for b in batches]),
+            labels=np.concatenate([b.labels for b in batches]),
+            detected_at=max(detected) if detected else None,
+            end_timestamp=np.concatenate([b.end_timestamp for b in batches]),
+            count=np.concatenate([b.count for b in batches]),
+            context=np.concatenate([b.context for b in batches]),
+            expected_value=np.concatenate([b.expected_value for b in batches]),
+            event_id=np.concatenate([b.event_id for b in batches]),
+            ongoing=np.concatenate([b.ongoing for b in batches])
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    @property
+    def severity_names(self) -> np.ndarray:
+        return np.array(SEVERITY_NAMES, dtype=object)[self.severity]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Convert to a DataFrame with one row per anomaly"""
+        return pd.DataFrame({
+            'metric_name': self.metric_name,
+            'timestamp': pd.to_datetime(self.timestamp, unit='ms'),
+            'end_timestamp': pd.to_datetime(self.end_timestamp, unit='ms'),
+            'count': self.count,
+            'value': self.value,
+            'expected_value': self.expected_value,
+            'anomaly_score': self.anomaly_score,
+            'severity': self.severity_names,
+            'model_type': self.model_type,
+            'labels': self.labels,
+            'context': self.context,
+            'event_id': self.event_id,
+            'ongoing': self.ongoing
+        })
+
+    def to_records(self) -> list:
+        """One dict per anomaly, in the layout the API expects"""
+        timestamps = pd.to_datetime(self.timestamp, unit='ms').to_pydatetime()
+        end_timestamps = pd.to_datetime(self.end_timestamp, unit='ms').to_pydatetime()
+        severities = self.severity_names
+        return [
+            {
+                'metric_name': metric_name,
+                'timestamp': timestamp,
+                'end_timestamp': end_timestamp,
+                'count': count,
+                'value': value,
+                'expected_value': None if expected != expected else expected,
+                'anomaly_score': score,
+                'severity': severity,
+                'model_type': model_type,
+                'labels': labels,
+                'context': context or {},
+                'event_id': event_id,
+                'ongoing': ongoing,
+                'detected_at': self.detected_at
+            }
+            for metric_name, timestamp, end_timestamp, count, value, expected, score, severity, model_type, labels, \
+                    context, event_id, ongoing in zip(
+                self.metric_name.tolist(), timestamps, end_timestamps, self.count.tolist(), self.value.tolist(),
+                self.expected_value.tolist(), self.anomaly_score.tolist(), severities.tolist(),
+                self.model_type.tolist(), self.labels.tolist(), self.context.tolist(), self.event_id.tolist(),
+                self.ongoing.tolist())
+        ]
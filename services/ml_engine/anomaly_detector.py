@@ -5,14 +5,166 @@ Implements multiple ML algorithms for anomaly detection
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
+from sklearn.kernel_approximation import Nystroem
+from sklearn.linear_model import SGDOneClassSVM
+from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.svm import OneClassSVM
 from scipy import stats
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from multiprocessing import get_context, shared_memory
+import copy
 import joblib
+import os
+import shutil
+import time
 from pathlib import Path
 from datetime import datetime
 from loguru import logger
 
+from calibration import ScoreCalibration, calibration_sample
+from ensemble import ScoreFusion
+from anomaly_batch import AnomalyBatch, SEVERITY_NAMES, severity_codes, severity_thresholds
+from features import FeatureEngine, StreamingFeatureState
+from forecast import SeasonalARForecaster
+from forest_scorer import CompactIsolationForest
+from halfspace_trees import HalfSpaceTrees
+from model_store import ModelStore
+from multivariate import HostFeatures, MULTIVARIATE_PREFIX
+from run_filter import RunTracker
+from seasonal import SeasonalBaseline
+from series_batch import SeriesBatch, series_key
+
+
+def _fit_isolation_forest(features: np.ndarray, config: dict):
+    """Fit a scaler and Isolation Forest, returning (model, scaler)"""
+    scaler = StandardScaler()
+    features_scaled = scaler.fit_transform(features)
+    
+    model = IsolationForest(
+        contamination=config.get('contamination', 0.1),
+        n_estimators=config.get('n_estimators', 100),
+        max_samples=config.get('max_samples', 256),
+        random_state=config.get('random_state', 42)
+    )
+    model.fit(features_scaled)
+    model.calibration_ = ScoreCalibration.fit(model.decision_function(calibration_sample(features_scaled)))
+    
+    return model, scaler
+
+
+def _subsample_rows(features: np.ndarray, size: int) -> np.ndarray:
+    """
+    Evenly spaced rows of a training matrix
+    
+    Rows are grouped by series in time order, so a fixed stride keeps every
+    series and every part of the training window in proportion.
+    """
+    if not size or len(features) <= size:
+        return features
+    return features[np.linspace(0, len(features) - 1, int(size)).astype(np.int64)]
+
+
+def _fit_one_class_svm(features: np.ndarray, config: dict):
+    """
+    Fit a scaler and One-Class SVM, returning (model, scaler)
+    
+    ``mode: approximate`` replaces the kernel SVM, whose fit grows at least
+    quadratically with the sample count, by a Nystroem kernel map and a
+    linear SGD one-class solver, which scales linearly. ``subsample_size``
+    optionally caps the rows the model is fitted on in either mode.
+    """
+    scaler = StandardScaler()
+    features_scaled = scaler.fit_transform(features)
+    fit_rows = _subsample_rows(features_scaled, config.get('subsample_size'))
+    
+    kernel = config.get('kernel', 'rbf')
+    gamma = config.get('gamma', 'auto')
+    nu = config.get('nu', 0.1)
+    
+    if config.get('mode', 'exact') == 'approximate':
+        # Nystroem needs a numeric gamma; resolve it like OneClassSVM does
+        if gamma == 'auto':
+            gamma = 1.0 / fit_rows.shape[1]
+        elif gamma == 'scale':
+            gamma = 1.0 / (fit_rows.shape[1] * fit_rows.var())
+        
+        model = make_pipeline(
+            Nystroem(
+                kernel=kernel,
+                gamma=gamma,
+                n_components=min(config.get('n_components', 300), len(fit_rows)),
+                random_state=config.get('random_state', 42)
+            ),
+            SGDOneClassSVM(
+                nu=nu,
+                max_iter=config.get('max_iter', 1000),
+                tol=config.get('tol', 1e-3),
+                random_state=config.get('random_state', 42)
+            )
+        )
+    else:
+        model = OneClassSVM(kernel=kernel, gamma=gamma, nu=nu)
+    
+    model.fit(fit_rows)
+    model.calibration_ = ScoreCalibration.fit(model.decision_function(calibration_sample(features_scaled)))
+    
+    return model, scaler
+
+
+def _calibrated_scores(model, scores: np.ndarray) -> np.ndarray:
+    """
+    Map raw decision scores to 0-1 (higher is more anomalous)
+    
+    The mapping is fixed at training time, so a tick with one or a few new
+    rows scores the same as a full window. Models without a calibration
+    are rejected on load and retrained.
+    """
+    return model.calibration_.transform(scores)
+
+
+# Unsupervised models: (config name, fit function, enabled by default)
+UNSUPERVISED_MODELS = (
+    ('isolation_forest', _fit_isolation_forest, True),
+    ('one_class_svm', _fit_one_class_svm, False),
+)
+
+
+def _fit_unsupervised_shared(shm_name: str, shape: tuple, dtype: str, models_config: dict):
+    """
+    Training pool worker: fit the enabled unsupervised models on a feature
+    matrix held in shared memory
+    
+    Returns:
+        Tuple of ({model name: (model, scaler)}, {model name: error message})
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    results, errors = {}, {}
+    try:
+        features = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        for name, fit, default in UNSUPERVISED_MODELS:
+            config = models_config.get('unsupervised', {}).get(name, {})
+            if not config.get('enabled', default):
+                continue
+            try:
+                results[name] = fit(features, config)
+            except Exception as e:
+                errors[name] = str(e)
+        # The view must be gone before the segment can be closed
+        del features
+    finally:
+        shm.close()
+    
+    return results, errors
+
+
+def _shared_memory_free():
+    """Free bytes in /dev/shm, where shared memory segments live, or None if unknown"""
+    try:
+        return shutil.disk_usage('/dev/shm').free
+    except OSError:
+        return None
+
 
 class AnomalyDetectorEngine:
     """Main anomaly detection engine with multiple algorithms"""
@@ -20,51 +172,486 @@ class AnomalyDetectorEngine:
     def __init__(self, config: dict):
         """Initialize the anomaly detector"""
         self.config = config
-        self.models = {}
-        self.scalers = {}
         self.model_path = Path(config.get('model_path', '/app/models'))
         self.model_path.mkdir(parents=True, exist_ok=True)
         
+        # Metrics whose persisted model turned out unusable on first use
+        self.stale_metrics = set()
+        
+        # Trained models and scalers, LRU-bounded and loaded from disk on demand
+        performance_config = config.get('performance', {})
+        self.models = ModelStore(
+            self._load_into_store,
+            max_entries=performance_config.get('cache_size'),
+            max_bytes=int(performance_config.get('cache_memory_mb', 0) * 1024 * 1024)
+        )
+        
+        # Score Isolation Forests with the array-backed, memory-mapped export
+        self.compact_forests = config.get('models', {}).get('unsupervised', {}) \
+            .get('isolation_forest', {}).get('compact', True)
+        
+        # One Isolation Forest per host over the multivariate metrics, in
+        # place of their per-metric unsupervised models
+        self.multivariate = None
+        if config.get('models', {}).get('multivariate', {}).get('enabled', False):
+            self.multivariate = HostFeatures(config)
+        
         # Load configuration
         self.anomaly_config = config.get('anomaly_detection', {})
         self.threshold = self.anomaly_config.get('threshold', 0.7)
         self.window_size = self.anomaly_config.get('window_size', 60)
         self.min_consecutive = self.anomaly_config.get('min_consecutive', 3)
+        self.severity_thresholds = severity_thresholds(self.anomaly_config.get('severity_levels', {}))
+        
+        # One event per run of min_consecutive+ flagged points, reported as
+        # soon as it is long enough and updated while it grows
+        self.run_tracker = RunTracker(
+            self.min_consecutive,
+            timeout_ms=int(self.anomaly_config.get('run_timeout', 900) * 1000)
+        )
+        
+        # Per-model scores are fused into one ensemble score per point
+        self.fusion = ScoreFusion.from_config(self.anomaly_config.get('ensemble', {}))
+        
+        # Rolling and time features, computed in one vectorized pass
+        self.feature_engine = FeatureEngine(config)
+        
+        # Per-series incremental feature state for online scoring
+        feature_config = config.get('feature_engineering', {})
+        self.streaming_features = feature_config.get('streaming', False)
+        self.streaming_max_gap_ms = int(feature_config.get('streaming_max_gap', 900) * 1000)
+        self.feature_state_file = self.model_path / 'feature_state.pkl'
+        self.feature_states = {}
+        
+        # Latest timestamp scored per (metric, series key); older samples
+        # only serve as feature context so anomalies are reported once.
+        # Saved with the open runs after every detection run and restored
+        # by load_models()
+        self.high_water_marks = {}
+        self.detection_state_file = self.model_path / 'detection_state.pkl'
+        
+        # Z-Score seasonal baselines moved by the EWMA, per metric, kept apart
+        # from the evictable models and saved after every detection run
+        self.ewma_alpha = config.get('models', {}).get('statistical', {}).get('zscore', {}).get('ewma_alpha', 0)
+        self.seasonal_state_file = self.model_path / 'seasonal_state.pkl'
+        self.seasonal_states = {}
+        
+        # Forecasting model: recent samples per metric and series key as AR
+        # context, and the forecasts of the latest detection run
+        self.arima_config = config.get('models', {}).get('statistical', {}).get('arima', {})
+        self.forecast_history = {}
+        self.predictions = []
+        
+        # Online Half-Space Trees per metric, learning from every scored
+        # sample instead of being retrained (state in model_path/halfspace_trees.pkl)
+        self.halfspace_config = config.get('models', {}).get('streaming', {}).get('river_halfspace_trees', {})
+        self.halfspace_enabled = self.halfspace_config.get('enabled', False)
+        self.halfspace_file = self.model_path / 'halfspace_trees.pkl'
+        self.halfspace_trees = {}
+        
+        if self.streaming_features:
+            self.load_feature_state()
+        if self.halfspace_enabled:
+            self.load_halfspace_trees()
+        if self.ewma_alpha:
+            self.load_seasonal_state()
         
         logger.info("Anomaly Detector Engine initialized")
     
-    def train_all_models(self):
-        """Train models for all configured metrics"""
+    def train_all_models(self, metric_names: list = None, collector=None):
+        """
+        Train models for all configured metrics
+        
+        Args:
+            metric_names: Optional subset of configured metrics to train
+            collector: Data collector to fetch with; without one a collector
+                is created and closed for this run
+        """
         logger.info("Training models for all metrics...")
         
-        from data_collector import PrometheusDataCollector
-        collector = PrometheusDataCollector(self.config)
+        own_collector = collector is None
+        if own_collector:
+            from data_collector import PrometheusDataCollector
+            collector = PrometheusDataCollector(self.config)
         
+        try:
+            self._train_metrics(collector, metric_names)
+        finally:
+            if own_collector:
+                collector.close()
+    
+    def _train_metrics(self, collector, metric_names: list = None):
+        """Train the configured metrics (or a subset) with data from a collector"""
         metrics_config = self.config.get('data_collection', {}).get('metrics', [])
+        if metric_names is not None:
+            metrics_config = [m for m in metrics_config if m['name'] in metric_names]
+        # More workers than cores only adds process overhead
+        workers = min(int(self.config.get('performance', {}).get('workers', 1)), os.cpu_count() or 1)
         
-        for metric_config in metrics_config:
-            metric_name = metric_config['name']
+        # Training data of the multivariate metrics, reused for the host models
+        host_samples = {}
+        
+        if workers > 1:
+            self._train_parallel(collector, metrics_config, workers, host_samples)
+        else:
+            for metric_config in metrics_config:
+                metric_name = metric_config['name']
+                try:
+                    data = self._load_training_data(collector, metric_name)
+                    if data is None:
+                        continue
+                    if self.multivariate is not None and metric_name in self.multivariate.metrics:
+                        host_samples[metric_name] = data
+                    
+                    # Train models
+                    self.train_metric_models(metric_name, data)
+                    
+                except Exception as e:
+                    logger.error(f"Error training models for {metric_name}: {e}")
+        
+        if self.multivariate is not None and \
+                any(m['name'] in self.multivariate.metrics for m in metrics_config):
+            self.train_multivariate_models(collector, host_samples)
+    
+    def train_multivariate_models(self, collector, samples: dict = None):
+        """
+        Train one Isolation Forest per host on the joint multivariate features
+        
+        Args:
+            collector: Data collector, for metrics missing from samples
+            samples: Training data already fetched, by metric name
+        """
+        samples = dict(samples or {})
+        for metric_name in self.multivariate.metrics:
+            if metric_name not in samples:
+                data = self._load_training_data(collector, metric_name)
+                if data is None:
+                    logger.warning(f"Skipping multivariate training, {metric_name} has too little data")
+                    return
+                samples[metric_name] = data
+        
+        try:
+            hosts = self.multivariate.align(samples)
+        except Exception as e:
+            logger.error(f"Error aligning multivariate metrics: {e}")
+            return
+        
+        config = self.config.get('models', {}).get('unsupervised', {}).get('isolation_forest', {})
+        min_points = self.config.get('data_collection', {}).get('min_data_points', 1000)
+        
+        for host, (timestamps, matrix) in hosts.items():
             try:
-                # Fetch training data
-                data = collector.fetch_training_data(metric_name)
+                if len(timestamps) < min_points:
+                    logger.warning(f"Insufficient aligned data for host {host}, skipping training")
+                    continue
                 
-                if len(data) < self.config.get('data_collection', {}).get('min_data_points', 1000):
-                    logger.warning(f"Insufficient data for {metric_name}, skipping training")
+                features = self.multivariate.transform(timestamps, matrix)
+                model, scaler = _fit_isolation_forest(features, config)
+                self._store_unsupervised_model(f"{MULTIVARIATE_PREFIX}{host}", 'isolation_forest', model, scaler,
+                                               self.multivariate.feature_names)
+                logger.info(f"Trained multivariate Isolation Forest for host {host} "
+                            f"({len(self.multivariate.metrics)} metrics)")
+            except Exception as e:
+                logger.error(f"Error training multivariate model for host {host}: {e}")
+    
+    def _load_training_data(self, collector, metric_name: str):
+        """Fetch training data (memory-mapped from the training cache), or None if too little"""
+        data = collector.fetch_training_batch(metric_name)
+        
+        if len(data) < self.config.get('data_collection', {}).get('min_data_points', 1000):
+            logger.warning(f"Insufficient data for {metric_name}, skipping training")
+            return None
+        
+        return data
+    
+    def _train_parallel(self, collector, metrics_config: list, workers: int, host_samples: dict = None):
+        """
+        Train metrics on a process pool
+        
+        Data is fetched and features are built here, overlapping with fits
+        already running. Feature matrices reach the workers through shared
+        memory; the fitted models come back and are saved from this process.
+        At most ``workers`` fits are in flight, each segment is unlinked as
+        soon as its fit finishes, and a matrix that doesn't fit in the free
+        shared memory is fitted here instead. A failing metric or model is
+        logged without affecting the others.
+        """
+        models_config = self.config.get('models', {})
+        zscore_enabled = models_config.get('statistical', {}).get('zscore', {}).get('enabled', True)
+        pending = {}
+        
+        # Spawned workers start from a fresh interpreter and only import the
+        # fit functions; main.py creates its components in main(), not on import
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+            for metric_config in metrics_config:
+                metric_name = metric_config['name']
+                shm = None
+                try:
+                    data = self._load_training_data(collector, metric_name)
+                    if data is None:
+                        continue
+                    if host_samples is not None and self.multivariate is not None \
+                            and metric_name in self.multivariate.metrics:
+                        host_samples[metric_name] = data
+                    
+                    logger.info(f"Training models for metric: {metric_name}")
+                    features = self._prepare_features(data)
+                    if features is None or len(features) == 0:
+                        logger.warning(f"No features available for {metric_name}")
+                        continue
+                    
+                    # Z-Score is cheap enough to fit in place
+                    if zscore_enabled:
+                        series, series_keys = self._series_index(data)
+                        self._train_zscore(metric_name, features, series, series_keys,
+                                           self._sample_timestamps(data))
+                    
+                    # So is the forecaster, a batched least-squares solve
+                    if self.arima_config.get('enabled', False):
+                        series, series_keys = self._series_index(data)
+                        self._train_arima(metric_name, features, series, series_keys,
+                                          self._sample_timestamps(data))
+                    
+                    if not self._per_metric_unsupervised(metric_name):
+                        continue
+                    
+                    # Wait for a free worker, releasing finished segments
+                    while len(pending) >= workers:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._finish_shared_fit(future, *pending.pop(future))
+                    
+                    free = _shared_memory_free()
+                    if free is not None and features.nbytes > free:
+                        logger.warning(f"Features of {metric_name} ({features.nbytes / 2**20:.0f} MB) exceed "
+                                       f"free shared memory ({free / 2**20:.0f} MB), fitting in process")
+                        self._train_unsupervised(metric_name, features)
+                        logger.info(f"Completed training for {metric_name}")
+                        continue
+                    
+                    shm = shared_memory.SharedMemory(create=True, size=features.nbytes)
+                    np.ndarray(features.shape, dtype=features.dtype, buffer=shm.buf)[:] = features
+                    future = pool.submit(_fit_unsupervised_shared, shm.name, features.shape,
+                                         features.dtype.str, models_config)
+                    pending[future] = (metric_name, shm)
+                    
+                except Exception as e:
+                    logger.error(f"Error training models for {metric_name}: {e}")
+                    if shm is not None:
+                        shm.close()
+                        shm.unlink()
+            
+            for future in as_completed(pending):
+                self._finish_shared_fit(future, *pending[future])
+    
+    def _finish_shared_fit(self, future, metric_name: str, shm: shared_memory.SharedMemory):
+        """Store the models of a finished pool fit and release its shared memory"""
+        try:
+            results, errors = future.result()
+            for name, (model, scaler) in results.items():
+                self._store_unsupervised_model(metric_name, name, model, scaler)
+            for name, error in errors.items():
+                logger.error(f"Error training {name} for {metric_name}: {error}")
+            logger.info(f"Completed training for {metric_name}")
+        except Exception as e:
+            logger.error(f"Error training models for {metric_name}: {e}")
+        finally:
+            shm.close()
+            shm.unlink()
+    
+    def _store_unsupervised_model(self, metric_name: str, name: str, model, scaler, feature_names: list = None):
+        """Keep a fitted unsupervised model and its scaler, and persist them"""
+        model_key = f"{metric_name}_{name}"
+        if feature_names is None:
+            feature_names = self.feature_engine.feature_names
+        
+        # Feature names let a later load detect a changed feature configuration
+        self._save_model(model_key, {
+            'model': model,
+            'scaler': scaler,
+            'feature_names': feature_names
+        })
+        
+        if name == 'isolation_forest' and self.compact_forests:
+            loaded = self._export_compact_forest(model_key, model, scaler, feature_names)
+            if loaded is not None:
+                self.models.put(model_key, *loaded)
+                return
+        
+        self.models.put(model_key, model, scaler, self._model_file_size(model_key))
+    
+    def _export_compact_forest(self, model_key: str, model, scaler, feature_names: list):
+        """
+        Write a fitted Isolation Forest as flat arrays and map it back in
+        
+        Returns:
+            Tuple of (CompactIsolationForest, None, size in bytes), or None
+        """
+        try:
+            forest_dir = self.model_path / f"{model_key}.forest"
+            CompactIsolationForest.from_sklearn(model, scaler, feature_names).save(forest_dir)
+            forest = CompactIsolationForest.load(forest_dir)
+            # The forest applies the scaler itself
+            return forest, None, forest.nbytes
+        except Exception as e:
+            logger.error(f"Error exporting compact forest {model_key}: {e}")
+            return None
+    
+    def _per_metric_unsupervised(self, metric_name: str) -> bool:
+        """Whether a metric gets its own unsupervised models (not covered by host models)"""
+        return self.multivariate is None or metric_name not in self.multivariate.metrics
+    
+    def _enabled_model_types(self, metric_name: str = None) -> list:
+        """Model types trained for a metric (or every metric) under the current config"""
+        models_config = self.config.get('models', {})
+        model_types = []
+        if models_config.get('statistical', {}).get('zscore', {}).get('enabled', True):
+            model_types.append('zscore')
+        if self.arima_config.get('enabled', False):
+            model_types.append('arima')
+        if metric_name is not None and not self._per_metric_unsupervised(metric_name):
+            return model_types
+        for name, _, default in UNSUPERVISED_MODELS:
+            if models_config.get('unsupervised', {}).get(name, {}).get('enabled', default):
+                model_types.append(name)
+        return model_types
+    
+    def load_models(self) -> list:
+        """
+        Register the persisted models in model_path
+        
+        Models are only checked for existence and age here; the store loads
+        each one on first use. One found unreadable or incompatible then is
+        dropped and its metric queued in ``stale_metrics``.
+        
+        Returns:
+            Names of metrics with a missing or stale model, which need retraining
+        """
+        retrain_interval = self.config.get('training', {}).get('retrain_interval', 24) * 3600
+        metrics_config = self.config.get('data_collection', {}).get('metrics', [])
+        
+        needs_training = []
+        registered = 0
+        for metric_config in metrics_config:
+            metric_name = metric_config['name']
+            current = True
+            
+            for model_type in self._enabled_model_types(metric_name):
+                model_key = f"{metric_name}_{model_type}"
+                model_file = self.model_path / f"{model_key}.pkl"
+                if not model_file.exists():
+                    current = False
                     continue
                 
-                # Train models
-                self.train_metric_models(metric_name, data)
+                self.models.register(model_key)
+                registered += 1
                 
-            except Exception as e:
-                logger.error(f"Error training models for {metric_name}: {e}")
+                if time.time() - model_file.stat().st_mtime > retrain_interval:
+                    current = False
+            
+            if not current:
+                needs_training.append(metric_name)
+        
+        if self.multivariate is not None:
+            # Host models are found on disk; retraining them needs their metrics
+            host_files = sorted(self.model_path.glob(f"{MULTIVARIATE_PREFIX}*_isolation_forest.pkl"))
+            current = bool(host_files)
+            for model_file in host_files:
+                self.models.register(model_file.stem)
+                registered += 1
+                if time.time() - model_file.stat().st_mtime > retrain_interval:
+                    current = False
+            if not current:
+                needs_training.extend(m for m in self.multivariate.metrics if m not in needs_training)
+        
+        logger.info(f"Registered {registered} models from {self.model_path}, "
+                    f"{len(needs_training)} metrics need training")
+        
+        self.load_detection_state()
+        return needs_training
+    
+    def take_stale_metrics(self) -> list:
+        """Metrics whose model failed to load since the last call, for retraining"""
+        stale, self.stale_metrics = sorted(self.stale_metrics), set()
+        return stale
+    
+    def _mark_stale(self, model_key: str):
+        """Queue the metrics of a model that could not be loaded for retraining"""
+        if self.multivariate is not None and model_key.startswith(MULTIVARIATE_PREFIX):
+            self.stale_metrics.update(self.multivariate.metrics)
+            return
+        for model_type in self._enabled_model_types():
+            if model_key.endswith(f"_{model_type}"):
+                self.stale_metrics.add(model_key[:-len(model_type) - 1])
+                return
+    
+    def _load_into_store(self, model_key: str):
+        """
+        ModelStore loader: read a persisted model if it fits the current features
+        
+        Returns:
+            Tuple of (model, scaler, size in bytes), or None (the metric is
+            then queued for retraining)
+        """
+        loaded = self._read_model(model_key)
+        if loaded is None:
+            self._mark_stale(model_key)
+        return loaded
     
-    def train_metric_models(self, metric_name: str, data: pd.DataFrame):
+    def _read_model(self, model_key: str):
+        """Persisted model, scaler and size for a key, or None if unusable"""
+        feature_names = self.feature_engine.feature_names
+        if self.multivariate is not None and model_key.startswith(MULTIVARIATE_PREFIX):
+            feature_names = self.multivariate.feature_names
+        
+        if self.compact_forests and model_key.endswith('_isolation_forest'):
+            forest_dir = self.model_path / f"{model_key}.forest"
+            if (forest_dir / 'meta.json').exists():
+                try:
+                    forest = CompactIsolationForest.load(forest_dir)
+                    if forest.meta.get('feature_names') == feature_names and forest.calibration_ is not None:
+                        return forest, None, forest.nbytes
+                except Exception as e:
+                    logger.error(f"Error loading compact forest {model_key}: {e}")
+        
+        model_data = self._load_model(model_key)
+        if model_data is None:
+            return None
+        
+        nbytes = self._model_file_size(model_key)
+        if model_key.endswith(('_zscore', '_arima')):
+            return model_data, None, nbytes
+        
+        if model_data.get('feature_names') != feature_names:
+            logger.warning(f"Model {model_key} was trained on different features, ignoring it")
+            return None
+        
+        if getattr(model_data['model'], 'calibration_', None) is None:
+            logger.warning(f"Model {model_key} has no score calibration, ignoring it")
+            return None
+        
+        if self.compact_forests and model_key.endswith('_isolation_forest'):
+            # Exported once, then memory-mapped on later loads
+            loaded = self._export_compact_forest(model_key, model_data['model'], model_data['scaler'], feature_names)
+            if loaded is not None:
+                return loaded
+        
+        return model_data['model'], model_data['scaler'], nbytes
+    
+    def _model_file_size(self, model_key: str) -> int:
+        """Size of a persisted model, used as its cache footprint"""
+        try:
+            return (self.model_path / f"{model_key}.pkl").stat().st_size
+        except OSError:
+            return 0
+    
+    def train_metric_models(self, metric_name: str, data):
         """
         Train anomaly detection models for a specific metric
         
         Args:
             metric_name: Name of the metric
-            data: DataFrame with timestamp and value columns
+            data: SeriesBatch, or DataFrame with timestamp and value columns
         """
         logger.info(f"Training models for metric: {metric_name}")
         
@@ -75,98 +662,394 @@ class AnomalyDetectorEngine:
             logger.warning(f"No features available for {metric_name}")
             return
         
+        series, series_keys = self._series_index(data)
+        
         # Get enabled models from config
         models_config = self.config.get('models', {})
         
         # Train Statistical Models
         if models_config.get('statistical', {}).get('zscore', {}).get('enabled', True):
-            self._train_zscore(metric_name, features)
+            self._train_zscore(metric_name, features, series, series_keys, self._sample_timestamps(data))
+        
+        if self.arima_config.get('enabled', False):
+            self._train_arima(metric_name, features, series, series_keys, self._sample_timestamps(data))
+        
+        # Train Unsupervised ML Models (metrics in multivariate mode use host models)
+        if not self._per_metric_unsupervised(metric_name):
+            logger.info(f"Completed training for {metric_name}")
+            return
+        
+        self._train_unsupervised(metric_name, features)
+        
+        logger.info(f"Completed training for {metric_name}")
+    
+    def _train_unsupervised(self, metric_name: str, features: np.ndarray):
+        """Fit the enabled unsupervised models of a metric in this process"""
+        models_config = self.config.get('models', {})
         
-        # Train Unsupervised ML Models
         if models_config.get('unsupervised', {}).get('isolation_forest', {}).get('enabled', True):
             self._train_isolation_forest(metric_name, features)
         
         if models_config.get('unsupervised', {}).get('one_class_svm', {}).get('enabled', False):
             self._train_one_class_svm(metric_name, features)
+    
+    def _series_index(self, data):
+        """
+        Per-sample series index and the series key of each index
         
-        logger.info(f"Completed training for {metric_name}")
+        Returns:
+            Tuple of (int array of series indices, list mapping index -> key)
+        """
+        if isinstance(data, SeriesBatch):
+            return np.asarray(data.series), data.labels.keys
+        
+        if 'series' not in data.columns:
+            # Legacy frames without a series column are one series
+            labels = data['labels'].iloc[0] if 'labels' in data.columns and len(data) else {}
+            return np.zeros(len(data), dtype=np.int32), [series_key(labels or {})]
+        
+        series = data['series'].to_numpy()
+        series_keys = data.attrs.get('series_keys')
+        if series_keys is None:
+            first_labels = data.groupby('series', sort=True)['labels'].first()
+            series_keys = [None] * (int(series.max()) + 1)
+            for idx, labels in first_labels.items():
+                series_keys[idx] = series_key(labels)
+        
+        return series, series_keys
     
-    def _prepare_features(self, data: pd.DataFrame) -> np.ndarray:
-        """Prepare features from raw time series data"""
-        if data.empty or 'value' not in data.columns:
+    def _prepare_features(self, data) -> np.ndarray:
+        """
+        Prepare features from raw time series data
+        
+        Rolling statistics are computed within each series, so samples of
+        different label sets are never mixed in one window.
+        """
+        if isinstance(data, SeriesBatch):
+            if data.empty:
+                return None
+            values = data.values
+        elif data.empty or 'value' not in data.columns:
             return None
+        else:
+            values = data['value'].to_numpy(dtype=np.float64)
         
-        values = data['value'].values
+        series, _ = self._series_index(data)
         
-        # Feature engineering: rolling statistics
-        feature_config = self.config.get('feature_engineering', {})
-        rolling_windows = feature_config.get('rolling_windows', [5, 10, 30])
+        return self.feature_engine.transform(values, series, self._sample_timestamps(data))
+    
+    def _sample_timestamps(self, data) -> np.ndarray:
+        """int64 epoch milliseconds of every sample, or None without a timestamp column"""
+        if isinstance(data, SeriesBatch):
+            return data.timestamps
+        if 'timestamp' not in data.columns:
+            return None
+        return data['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    
+    def _unscored_rows(self, metric_name: str, data: pd.DataFrame):
+        """
+        Rows newer than their series' high-water mark
         
-        features_list = [values]
+        The marks are not moved here; the caller applies the returned ones
+        once the rows have been scored, so a failed tick is scored again.
         
-        for window in rolling_windows:
-            if len(values) > window:
-                rolling_mean = pd.Series(values).rolling(window=window, min_periods=1).mean().values
-                rolling_std = pd.Series(values).rolling(window=window, min_periods=1).std().fillna(0).values
-                features_list.extend([rolling_mean, rolling_std])
+        Returns:
+            Tuple of (row positions in data still to be scored,
+            {(metric, series key): new high-water mark})
+        """
+        series, series_keys = self._series_index(data)
+        timestamps = data['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
         
-        # Stack features
-        features = np.column_stack(features_list)
+        marks = np.array([self.high_water_marks.get((metric_name, key), np.iinfo(np.int64).min)
+                          for key in series_keys], dtype=np.int64)
+        rows = np.flatnonzero(timestamps > marks[series])
         
-        return features
+        latest = marks.copy()
+        np.maximum.at(latest, series, timestamps)
+        advanced = {(metric_name, series_keys[idx]): int(latest[idx]) for idx in np.flatnonzero(latest > marks)}
+        
+        return rows, advanced
     
-    def _train_zscore(self, metric_name: str, features: np.ndarray):
-        """Train Z-Score based anomaly detection"""
+    def _stream_features(self, metric_name: str, data: pd.DataFrame):
+        """
+        Advance copies of each series' feature state with its new samples
+        
+        The states are not replaced here; the caller applies the returned
+        ones once the rows have been scored, so a failed tick is scored again.
+        
+        Args:
+            metric_name: Metric the data belongs to
+            data: Recent samples, possibly overlapping earlier ticks
+        
+        Returns:
+            Tuple of (row positions in data that were new, their feature
+            matrix, {(metric, series key): advanced feature state})
+        """
+        series, series_keys = self._series_index(data)
+        timestamps = data['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        values = data['value'].to_numpy(dtype=np.float64)
+        
+        order = np.lexsort((timestamps, series))
+        bounds = np.flatnonzero(np.diff(series[order])) + 1
+        
+        rows, features, states = [], [], {}
+        for group in np.split(order, bounds):
+            if len(group) == 0:
+                continue
+            key = (metric_name, series_keys[series[group[0]]])
+            state = self.feature_states.get(key)
+            if state is None:
+                state = StreamingFeatureState(self.feature_engine, self.streaming_max_gap_ms)
+            else:
+                state = state.copy()
+            new, group_features = state.update_many(timestamps[group], values[group])
+            if len(new):
+                states[key] = state
+            rows.append(group[new])
+            features.append(group_features)
+        
+        if not rows:
+            return np.empty(0, dtype=np.int64), \
+                np.empty((0, len(self.feature_engine.feature_names)), dtype=np.float32), states
+        return np.concatenate(rows), np.vstack(features), states
+    
+    def _prune_series_state(self, metrics_data: dict, now_ms: int):
+        """
+        Drop per-series entries that can no longer affect scoring
+        
+        A high-water mark older than the first sample of its metric's
+        recent window filters nothing now or later. Feature states and
+        forecast history with no sample for ``streaming_max_gap`` would be
+        restarted by the next sample anyway.
+        """
+        window_starts = {}
+        for metric_name, data in metrics_data.items():
+            if data is not None and len(data):
+                window_starts[metric_name] = int(self._sample_timestamps(data).min())
+        
+        if self.multivariate is not None and all(m in window_starts for m in self.multivariate.metrics):
+            # Host marks are grid slots, up to one step before the sample
+            window_starts[MULTIVARIATE_PREFIX] = min(window_starts[m] for m in self.multivariate.metrics) \
+                - self.multivariate.step_ms
+        
+        stale_marks = [key for key, mark in self.high_water_marks.items()
+                       if key[0] in window_starts and mark < window_starts[key[0]]]
+        for key in stale_marks:
+            del self.high_water_marks[key]
+        
+        cutoff = now_ms - self.streaming_max_gap_ms
+        stale_states = [key for key, state in self.feature_states.items()
+                        if state.last_timestamp is None or state.last_timestamp < cutoff]
+        for key in stale_states:
+            del self.feature_states[key]
+        
+        for history in self.forecast_history.values():
+            for key in [k for k, (timestamps, _) in history.items() if not len(timestamps) or timestamps[-1] < cutoff]:
+                del history[key]
+        
+        if stale_marks or stale_states:
+            logger.debug(f"Pruned {len(stale_marks)} high-water marks and {len(stale_states)} feature states")
+    
+    def save_feature_state(self):
+        """Persist streaming feature state so restarts resume without a warm-up"""
+        try:
+            tmp_file = self.feature_state_file.with_suffix('.tmp')
+            joblib.dump({
+                'feature_names': self.feature_engine.feature_names,
+                'states': self.feature_states
+            }, tmp_file)
+            tmp_file.replace(self.feature_state_file)
+        except Exception as e:
+            logger.error(f"Error saving feature state: {e}")
+    
+    def load_feature_state(self):
+        """Restore streaming feature state saved by a previous run"""
+        try:
+            if not self.feature_state_file.exists():
+                return
+            saved = joblib.load(self.feature_state_file)
+            if saved.get('feature_names') != self.feature_engine.feature_names:
+                logger.warning("Feature configuration changed, discarding saved feature state")
+                return
+            self.feature_states = saved['states']
+            for state in self.feature_states.values():
+                state.max_gap_ms = self.streaming_max_gap_ms
+            logger.info(f"Restored feature state for {len(self.feature_states)} series")
+        except Exception as e:
+            logger.error(f"Error loading feature state: {e}")
+    
+    def save_detection_state(self):
+        """
+        Persist the high-water marks and open anomaly runs, so a restart
+        neither reports scored samples again nor loses the runs in progress
+        """
+        try:
+            tmp_file = self.detection_state_file.with_suffix('.tmp')
+            joblib.dump({
+                'high_water_marks': self.high_water_marks,
+                'open_runs': self.run_tracker.open_runs
+            }, tmp_file)
+            tmp_file.replace(self.detection_state_file)
+        except Exception as e:
+            logger.error(f"Error saving detection state: {e}")
+    
+    def load_detection_state(self):
+        """Restore the high-water marks and open anomaly runs saved by a previous run"""
+        try:
+            if not self.detection_state_file.exists():
+                return
+            saved = joblib.load(self.detection_state_file)
+            self.high_water_marks = saved['high_water_marks']
+            self.run_tracker.open_runs = saved.get('open_runs', {})
+            logger.info(f"Restored high-water marks for {len(self.high_water_marks)} series "
+                        f"and {len(self.run_tracker.open_runs)} open anomaly runs")
+        except Exception as e:
+            logger.error(f"Error loading detection state: {e}")
+    
+    def save_seasonal_state(self):
+        """Persist the EWMA-updated seasonal baselines so restarts don't revert them"""
+        try:
+            tmp_file = self.seasonal_state_file.with_suffix('.tmp')
+            joblib.dump(self.seasonal_states, tmp_file)
+            tmp_file.replace(self.seasonal_state_file)
+        except Exception as e:
+            logger.error(f"Error saving seasonal state: {e}")
+    
+    def load_seasonal_state(self):
+        """Restore EWMA-updated seasonal baselines saved by a previous run"""
+        try:
+            if not self.seasonal_state_file.exists():
+                return
+            self.seasonal_states = joblib.load(self.seasonal_state_file)
+            logger.info(f"Restored seasonal state for {len(self.seasonal_states)} metrics")
+        except Exception as e:
+            logger.error(f"Error loading seasonal state: {e}")
+    
+    def save_halfspace_trees(self):
+        """Persist the online Half-Space Trees so restarts keep their mass profiles"""
+        try:
+            tmp_file = self.halfspace_file.with_suffix('.tmp')
+            joblib.dump({
+                'feature_names': self.feature_engine.feature_names,
+                'models': self.halfspace_trees
+            }, tmp_file)
+            tmp_file.replace(self.halfspace_file)
+        except Exception as e:
+            logger.error(f"Error saving Half-Space Trees: {e}")
+    
+    def load_halfspace_trees(self):
+        """Restore Half-Space Trees saved by a previous run"""
+        try:
+            if not self.halfspace_file.exists():
+                return
+            saved = joblib.load(self.halfspace_file)
+            if saved.get('feature_names') != self.feature_engine.feature_names:
+                logger.warning("Feature configuration changed, discarding saved Half-Space Trees")
+                return
+            self.halfspace_trees = saved['models']
+            logger.info(f"Restored Half-Space Trees for {len(self.halfspace_trees)} metrics")
+        except Exception as e:
+            logger.error(f"Error loading Half-Space Trees: {e}")
+    
+    def _train_zscore(self, metric_name: str, features: np.ndarray, series: np.ndarray = None,
+                      series_keys: list = None, timestamps: np.ndarray = None):
+        """Train Z-Score based anomaly detection with per-series (and seasonal) baselines"""
         try:
             config = self.config.get('models', {}).get('statistical', {}).get('zscore', {})
             threshold = config.get('threshold', 3.0)
             
-            # Calculate mean and std
-            mean = np.mean(features[:, 0])
-            std = np.std(features[:, 0])
+            values = features[:, 0]
+            
+            # Calculate mean and std, globally and for every series
+            mean = np.mean(values)
+            std = np.std(values)
+            
+            series_stats = {}
+            if series is not None and series_keys is not None:
+                counts = np.bincount(series)
+                sums = np.bincount(series, weights=values)
+                sq_sums = np.bincount(series, weights=values * values)
+                present = np.flatnonzero(counts)
+                series_mean = sums[present] / counts[present]
+                series_std = np.sqrt(np.maximum(sq_sums[present] / counts[present] - series_mean ** 2, 0))
+                for idx, m, sd in zip(present, series_mean, series_std):
+                    if series_keys[idx] is not None:
+                        series_stats[series_keys[idx]] = [float(m), float(sd)]
             
             model_data = {
                 'type': 'zscore',
                 'mean': float(mean),
                 'std': float(std),
-                'threshold': threshold
+                'threshold': threshold,
+                'trained_at': time.time(),
+                'series': series_stats
             }
             
+            # Baselines per hour of the week, so daily and weekly patterns
+            # (lunch-hour peaks, nightly batch jobs) aren't flagged
+            if config.get('seasonal', True) and timestamps is not None:
+                if series is None or series_keys is None:
+                    series = np.zeros(len(values), dtype=np.int32)
+                    series_keys = [None]
+                model_data['seasonal'] = SeasonalBaseline.fit(
+                    values, series, series_keys, timestamps,
+                    min_samples=config.get('min_bucket_samples', 10)
+                )
+            
             # Save model
             model_key = f"{metric_name}_zscore"
-            self.models[model_key] = model_data
             self._save_model(model_key, model_data)
+            self.models.put(model_key, model_data, nbytes=self._model_file_size(model_key))
             
-            logger.info(f"Trained Z-Score model for {metric_name}")
+            logger.info(f"Trained Z-Score model for {metric_name} ({len(series_stats)} series)")
             
         except Exception as e:
             logger.error(f"Error training Z-Score for {metric_name}: {e}")
     
-    def _train_isolation_forest(self, metric_name: str, features: np.ndarray):
-        """Train Isolation Forest model"""
+    def _train_arima(self, metric_name: str, features: np.ndarray, series: np.ndarray,
+                     series_keys: list, timestamps: np.ndarray):
+        """Train the seasonal AR forecaster for every series of a metric"""
         try:
-            config = self.config.get('models', {}).get('unsupervised', {}).get('isolation_forest', {})
+            if timestamps is None:
+                logger.warning(f"No timestamps for {metric_name}, skipping forecaster")
+                return
             
-            # Scale features
-            scaler = StandardScaler()
-            features_scaled = scaler.fit_transform(features)
+            config = self.arima_config
+            order = config.get('order', [1, 0, 0])
+            seasonal_order = config.get('seasonal_order', [1, 0, 0, 168])
             
-            # Train model
-            model = IsolationForest(
-                contamination=config.get('contamination', 0.1),
-                n_estimators=config.get('n_estimators', 100),
-                max_samples=config.get('max_samples', 256),
-                random_state=config.get('random_state', 42)
+            forecaster = SeasonalARForecaster.fit(
+                features[:, 0], series, series_keys, timestamps,
+                p=order[0],
+                d=order[1],
+                seasonal=seasonal_order[0] > 0,
+                min_bucket_samples=self.config.get('models', {}).get('statistical', {})
+                    .get('zscore', {}).get('min_bucket_samples', 10)
             )
             
-            model.fit(features_scaled)
+            model_data = {
+                'type': 'arima',
+                'forecaster': forecaster,
+                'threshold': config.get('threshold', 3.0),
+                'order': [forecaster.p, forecaster.d]
+            }
             
-            # Save model and scaler
-            model_key = f"{metric_name}_isolation_forest"
-            self.models[model_key] = model
-            self.scalers[model_key] = scaler
+            model_key = f"{metric_name}_arima"
+            self._save_model(model_key, model_data)
+            self.models.put(model_key, model_data, nbytes=self._model_file_size(model_key))
+            
+            logger.info(f"Trained seasonal AR forecaster for {metric_name} ({len(series_keys)} series)")
+            
+        except Exception as e:
+            logger.error(f"Error training forecaster for {metric_name}: {e}")
+    
+    def _train_isolation_forest(self, metric_name: str, features: np.ndarray):
+        """Train Isolation Forest model"""
+        try:
+            config = self.config.get('models', {}).get('unsupervised', {}).get('isolation_forest', {})
             
-            self._save_model(model_key, {'model': model, 'scaler': scaler})
+            model, scaler = _fit_isolation_forest(features, config)
+            self._store_unsupervised_model(metric_name, 'isolation_forest', model, scaler)
             
             logger.info(f"Trained Isolation Forest for {metric_name}")
             
@@ -178,32 +1061,15 @@ class AnomalyDetectorEngine:
         try:
             config = self.config.get('models', {}).get('unsupervised', {}).get('one_class_svm', {})
             
-            # Scale features
-            scaler = StandardScaler()
-            features_scaled = scaler.fit_transform(features)
-            
-            # Train model
-            model = OneClassSVM(
-                kernel=config.get('kernel', 'rbf'),
-                gamma=config.get('gamma', 'auto'),
-                nu=config.get('nu', 0.1)
-            )
-            
-            model.fit(features_scaled)
-            
-            # Save model and scaler
-            model_key = f"{metric_name}_one_class_svm"
-            self.models[model_key] = model
-            self.scalers[model_key] = scaler
-            
-            self._save_model(model_key, {'model': model, 'scaler': scaler})
+            model, scaler = _fit_one_class_svm(features, config)
+            self._store_unsupervised_model(metric_name, 'one_class_svm', model, scaler)
             
             logger.info(f"Trained One-Class SVM for {metric_name}")
             
         except Exception as e:
             logger.error(f"Error training One-Class SVM for {metric_name}: {e}")
     
-    def detect_anomalies(self, metrics_data: dict) -> list:
+    def detect_anomalies(self, metrics_data: dict) -> AnomalyBatch:
         """
         Detect anomalies in metrics data
         
@@ -211,125 +1077,428 @@ class AnomalyDetectorEngine:
             metrics_data: Dictionary mapping metric names to DataFrames
         
         Returns:
-            List of detected anomalies
+            AnomalyBatch of detected anomalies
         """
-        all_anomalies = []
+        detected_at = datetime.utcnow()
+        batches = []
+        self.predictions = []
         
         for metric_name, data in metrics_data.items():
             try:
-                anomalies = self._detect_metric_anomalies(metric_name, data)
-                all_anomalies.extend(anomalies)
+                batches.extend(self._detect_metric_anomalies(metric_name, data, detected_at))
             except Exception as e:
                 logger.error(f"Error detecting anomalies for {metric_name}: {e}")
         
-        return all_anomalies
+        if self.multivariate is not None:
+            try:
+                batches.extend(self._detect_multivariate_anomalies(metrics_data, detected_at))
+            except Exception as e:
+                logger.error(f"Error detecting multivariate anomalies: {e}")
+        
+        # Close runs of every metric, including ones that sent nothing this tick
+        for model_key, runs in self.run_tracker.expire(int(time.time() * 1000)).items():
+            try:
+                if model_key.startswith(MULTIVARIATE_PREFIX):
+                    host = model_key[len(MULTIVARIATE_PREFIX):-len('_isolation_forest')]
+                    batches.append(self._multivariate_batch(host, runs, detected_at))
+                else:
+                    batches.append(self._ensemble_batch(model_key[:-len('_ensemble')], runs, detected_at))
+            except Exception as e:
+                logger.error(f"Error closing anomaly runs of {model_key}: {e}")
+        
+        # Per-series state of series that stopped reporting is dropped, so
+        # series churn doesn't grow memory or the saved state
+        try:
+            self._prune_series_state(metrics_data, int(time.time() * 1000))
+        except Exception as e:
+            logger.error(f"Error pruning series state: {e}")
+        
+        self.save_detection_state()
+        if self.streaming_features:
+            self.save_feature_state()
+        if self.halfspace_enabled:
+            self.save_halfspace_trees()
+        if self.ewma_alpha:
+            self.save_seasonal_state()
+        
+        logger.debug(f"Model cache: {self.models.stats()}")
+        
+        anomalies = AnomalyBatch.concat(batches)
+        anomalies.detected_at = detected_at
+        return anomalies
     
-    def _detect_metric_anomalies(self, metric_name: str, data: pd.DataFrame) -> list:
-        """Detect anomalies for a specific metric"""
+    def _detect_metric_anomalies(self, metric_name: str, data: pd.DataFrame, detected_at: datetime = None) -> list:
+        """
+        Detect anomalies for a specific metric
+        
+        Returns:
+            List with one AnomalyBatch of ensemble anomalies, or empty
+        """
         if data.empty:
             return []
         
         # Prepare features
-        features = self._prepare_features(data)
-        if features is None:
-            return []
+        marks, states = {}, {}
+        if self.streaming_features:
+            # Only samples the feature state hasn't seen yet are scored
+            rows, features, states = self._stream_features(metric_name, data)
+            if len(rows) == 0:
+                return []
+            data = data.iloc[rows].reset_index(drop=True)
+        else:
+            features = self._prepare_features(data)
+            if features is None:
+                return []
+            rows, marks = self._unscored_rows(metric_name, data)
+            if len(rows) == 0:
+                return []
+            if len(rows) < len(data):
+                features = features[rows]
+                data = data.iloc[rows].reset_index(drop=True)
         
-        anomalies = []
+        series, series_keys = self._series_index(data)
+        timestamps = data['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        values = data['value'].to_numpy(dtype=np.float64)
+        if 'labels' in data.columns:
+            labels = data['labels'].to_numpy(dtype=object)
+        else:
+            labels = np.empty(len(data), dtype=object)
+            labels[:] = [{}] * len(data)
         
-        # Try each available model
+        # Score with each available model
         models_to_try = [
-            (f"{metric_name}_zscore", self._predict_zscore),
-            (f"{metric_name}_isolation_forest", self._predict_isolation_forest),
-            (f"{metric_name}_one_class_svm", self._predict_one_class_svm)
+            ('zscore', self._predict_zscore),
+            ('isolation_forest', self._predict_isolation_forest),
+            ('one_class_svm', self._predict_one_class_svm)
         ]
         
-        for model_key, predict_func in models_to_try:
+        model_types = []
+        model_scores = []
+        for model_type, predict_func in models_to_try:
+            model_key = f"{metric_name}_{model_type}"
             if model_key in self.models:
                 try:
-                    scores = predict_func(model_key, features)
-                    
-                    # Find anomalies above threshold
-                    for idx, score in enumerate(scores):
-                        if score > self.threshold:
-                            severity = self._calculate_severity(score)
-                            
-                            anomaly = {
-                                'metric_name': metric_name,
-                                'timestamp': data.iloc[idx]['timestamp'],
-                                'value': float(data.iloc[idx]['value']),
-                                'anomaly_score': float(score),
-                                'severity': severity,
-                                'model_type': model_key.split('_')[-1],
-                                'detected_at': datetime.utcnow()
-                            }
-                            anomalies.append(anomaly)
-                            
+                    scores = np.asarray(predict_func(model_key, features, series, series_keys, timestamps),
+                                        dtype=np.float64)
+                    model_types.append(model_type)
+                    model_scores.append(scores)
                 except Exception as e:
                     logger.error(f"Error predicting with {model_key}: {e}")
         
+        # Online model: scores and learns every new sample, needs no training
+        if self.halfspace_enabled:
+            try:
+                scores = self._predict_halfspace_trees(metric_name, features, series, timestamps)
+                if not np.isnan(scores).all():
+                    model_types.append('halfspace_trees')
+                    model_scores.append(np.nan_to_num(scores))
+            except Exception as e:
+                logger.error(f"Error predicting with {metric_name}_halfspace_trees: {e}")
+        
+        # Forecasts give expected values along with their score
+        forecast = None
+        if f"{metric_name}_arima" in self.models:
+            try:
+                forecast = self._forecast(metric_name, values, series, series_keys, timestamps)
+                model_types.append('arima')
+                model_scores.append(forecast['scores'])
+            except Exception as e:
+                logger.error(f"Error predicting with {metric_name}_arima: {e}")
+        
+        if not model_types:
+            return []
+        
+        # One ensemble score per point, then one event per run of flagged points
+        model_scores = np.vstack(model_scores)
+        scores, mask = self.fusion.fuse(model_types, model_scores, self.threshold)
+        
+        # Per-model scores of flagged points, reported at each event's peak
+        context = np.full(len(values), None, dtype=object)
+        context[mask] = [
+            {'models': dict(zip(model_types, np.round(row, 4).tolist())), 'fusion': self.fusion.method}
+            for row in model_scores[:, mask].T
+        ]
+        model_type = model_types[0] if len(model_types) == 1 else 'ensemble'
+        
+        peak_columns = {
+            'value': values,
+            'labels': labels,
+            'context': context,
+            'model_type': np.full(len(values), model_type, dtype=object)
+        }
+        if forecast is not None:
+            peak_columns['expected_value'] = forecast['expected']
+            self.predictions.append({
+                'metric_name': metric_name,
+                'timestamp': timestamps,
+                'labels': labels,
+                'actual': values,
+                'expected': forecast['expected'],
+                'lower': forecast['lower'],
+                'upper': forecast['upper'],
+                'is_anomaly': mask
+            })
+        
+        runs = self.run_tracker.update(
+            f"{metric_name}_ensemble", mask, scores, timestamps, series, series_keys, peak_columns
+        )
+        # Scored: later ticks skip these rows
+        self.high_water_marks.update(marks)
+        self.feature_states.update(states)
+        if len(runs['timestamp']) == 0:
+            return []
+        return [self._ensemble_batch(metric_name, runs, detected_at)]
+    
+    def _ensemble_batch(self, metric_name: str, runs: dict, detected_at: datetime = None) -> AnomalyBatch:
+        """AnomalyBatch of the ensemble events of one metric"""
+        n_runs = len(runs['timestamp'])
+        return AnomalyBatch(
+            metric_name=np.full(n_runs, metric_name, dtype=object),
+            timestamp=runs['timestamp'],
+            value=runs['value'],
+            anomaly_score=runs['anomaly_score'],
+            severity=severity_codes(runs['anomaly_score'], self.severity_thresholds),
+            model_type=runs['model_type'],
+            labels=runs['labels'],
+            detected_at=detected_at,
+            end_timestamp=runs['end_timestamp'],
+            count=runs['count'],
+            context=runs['context'],
+            expected_value=runs.get('expected_value'),
+            event_id=runs['event_id'],
+            ongoing=runs['ongoing']
+        )
+    
+    def _detect_multivariate_anomalies(self, metrics_data: dict, detected_at: datetime = None) -> list:
+        """
+        Score every host with a model on the joint features of its metrics
+        
+        Each event is reported under the metric with the largest share of
+        the deviation at its peak; the shares of all metrics go in its context.
+        
+        Returns:
+            List of AnomalyBatch, one per host with anomalies
+        """
+        anomalies = []
+        
+        for host, (timestamps, matrix) in self.multivariate.align(metrics_data).items():
+            model_key = f"{MULTIVARIATE_PREFIX}{host}_isolation_forest"
+            if model_key not in self.models:
+                continue
+            
+            try:
+                features = self.multivariate.transform(timestamps, matrix)
+                
+                # Only slots newer than the last tick are scored
+                mark_key = (MULTIVARIATE_PREFIX, host)
+                rows = np.flatnonzero(timestamps > self.high_water_marks.get(mark_key, np.iinfo(np.int64).min))
+                if len(rows) == 0:
+                    continue
+                latest = int(timestamps[-1])
+                features, timestamps, matrix = features[rows], timestamps[rows], matrix[rows]
+                
+                scores = self._predict_isolation_forest(model_key, features)
+                attribution = self.multivariate.attribution(self._scaled_deviation(model_key, features))
+                
+                runs = self.run_tracker.update(
+                    model_key, scores > self.threshold, scores, timestamps,
+                    np.zeros(len(timestamps), dtype=np.int32), [host],
+                    {'values': matrix, 'attribution': attribution}
+                )
+                self.high_water_marks[mark_key] = latest
+                if len(runs['timestamp']):
+                    anomalies.append(self._multivariate_batch(host, runs, detected_at))
+            except Exception as e:
+                logger.error(f"Error predicting with {model_key}: {e}")
+        
         return anomalies
     
-    def _predict_zscore(self, model_key: str, features: np.ndarray) -> np.ndarray:
-        """Predict anomalies using Z-Score"""
+    def _multivariate_batch(self, host: str, runs: dict, detected_at: datetime = None) -> AnomalyBatch:
+        """AnomalyBatch of the events of one host, each under its top-attributed metric"""
+        n_runs = len(runs['timestamp'])
+        metric_names = np.array(self.multivariate.metrics, dtype=object)
+        top = runs['attribution'].argmax(axis=1)
+        labels = np.empty(n_runs, dtype=object)
+        labels[:] = [{self.multivariate.host_label: host}] * n_runs
+        context = np.empty(n_runs, dtype=object)
+        context[:] = [
+            {
+                'host': host,
+                'attribution': dict(zip(self.multivariate.metrics, np.round(shares, 4).tolist())),
+                'values': dict(zip(self.multivariate.metrics, values.tolist()))
+            }
+            for shares, values in zip(runs['attribution'], runs['values'])
+        ]
+        
+        return AnomalyBatch(
+            metric_name=metric_names[top],
+            timestamp=runs['timestamp'],
+            value=runs['values'][np.arange(n_runs), top],
+            anomaly_score=runs['anomaly_score'],
+            severity=severity_codes(runs['anomaly_score'], self.severity_thresholds),
+            model_type=np.full(n_runs, 'multivariate_isolation_forest', dtype=object),
+            labels=labels,
+            detected_at=detected_at,
+            end_timestamp=runs['end_timestamp'],
+            count=runs['count'],
+            context=context,
+            event_id=runs['event_id'],
+            ongoing=runs['ongoing']
+        )
+    
+    def _scaled_deviation(self, model_key: str, features: np.ndarray) -> np.ndarray:
+        """Absolute features standardized with the model's training scaler"""
+        model, scaler = self.models.get(model_key)
+        if scaler is not None:
+            return np.abs(scaler.transform(features))
+        if isinstance(model, CompactIsolationForest):
+            return np.abs((features - model.center) / model.scale)
+        return np.abs(features)
+    
+    def _predict_zscore(self, model_key: str, features: np.ndarray, series: np.ndarray = None,
+                        series_keys: list = None, timestamps: np.ndarray = None) -> np.ndarray:
+        """Predict anomalies using Z-Score against each series' own (seasonal) baseline"""
         model_data = self.models[model_key]
         values = features[:, 0]
         
-        z_scores = np.abs((values - model_data['mean']) / (model_data['std'] + 1e-10))
+        mean = model_data['mean']
+        std = model_data['std']
+        series_stats = model_data.get('series', {})
+        seasonal = model_data.get('seasonal')
+        if seasonal is not None and self.ewma_alpha:
+            seasonal = self._seasonal_state(model_key[:-len('_zscore')], model_data)
+        if seasonal is not None and timestamps is not None:
+            if series is None or series_keys is None:
+                series = np.zeros(len(values), dtype=np.int32)
+                series_keys = [None]
+            # Gather each sample's (series, hour of week) baseline
+            rows, buckets = seasonal.cells(series, series_keys, timestamps)
+            z_scores = np.abs((values - seasonal.mean[rows, buckets]) / (seasonal.std[rows, buckets] + 1e-10))
+            
+            if self.ewma_alpha:
+                # Track drift with the samples that look normal
+                normal = z_scores < model_data['threshold']
+                seasonal.update(rows[normal], buckets[normal], values[normal], self.ewma_alpha)
+            
+            return np.clip(z_scores / model_data['threshold'], 0, 1)
+        
+        if series is not None and series_keys is not None and series_stats:
+            # Look up baselines once per series, then gather per sample
+            baselines = np.array([series_stats.get(key, (mean, std)) for key in series_keys], dtype=np.float64)
+            mean = baselines[series, 0]
+            std = baselines[series, 1]
+        
+        z_scores = np.abs((values - mean) / (std + 1e-10))
         
         # Normalize to 0-1 range
         normalized_scores = z_scores / model_data['threshold']
         return np.clip(normalized_scores, 0, 1)
     
-    def _predict_isolation_forest(self, model_key: str, features: np.ndarray) -> np.ndarray:
+    def _seasonal_state(self, metric_name: str, model_data: dict) -> SeasonalBaseline:
+        """
+        The EWMA-updated seasonal baseline of a metric
+        
+        Starts as a copy of the trained table and is replaced when the
+        model is retrained, so evicting or reloading the model keeps it.
+        """
+        state = self.seasonal_states.get(metric_name)
+        if state is None or state[0] != model_data.get('trained_at'):
+            state = (model_data.get('trained_at'), copy.deepcopy(model_data['seasonal']))
+            self.seasonal_states[metric_name] = state
+        return state[1]
+    
+    def _forecast(self, metric_name: str, values: np.ndarray, series: np.ndarray, series_keys: list,
+                  timestamps: np.ndarray) -> dict:
+        """
+        Forecast new samples from the ones before them and score the errors
+        
+        Returns:
+            Dict of expected values, prediction interval bounds (lower,
+            upper) and scores in 0-1, per sample
+        """
+        model_data = self.models[f"{metric_name}_arima"]
+        history = self.forecast_history.setdefault(metric_name, {})
+        expected, sigma = model_data['forecaster'].forecast(
+            values, series, series_keys, timestamps, history, self.streaming_max_gap_ms
+        )
+        
+        # Two-sided normal interval at the configured coverage
+        width = stats.norm.ppf(0.5 + self.arima_config.get('interval', 0.95) / 2) * sigma
+        errors = np.abs(values - expected) / (sigma + 1e-10)
+        return {
+            'expected': expected,
+            'lower': expected - width,
+            'upper': expected + width,
+            'scores': np.clip(errors / model_data['threshold'], 0, 1)
+        }
+    
+    def _predict_halfspace_trees(self, metric_name: str, features: np.ndarray, series: np.ndarray,
+                                 timestamps: np.ndarray) -> np.ndarray:
+        """
+        Score new samples with the metric's Half-Space Trees and learn them
+        
+        Samples are streamed in time order (series interleaved), so every
+        mass window covers the series of the metric evenly.
+        
+        Returns:
+            Scores in 0-1 per sample, NaN while the model is warming up
+        """
+        model = self.halfspace_trees.get(metric_name)
+        if model is None:
+            model = HalfSpaceTrees(
+                n_trees=self.halfspace_config.get('n_trees', 10),
+                height=self.halfspace_config.get('height', 8),
+                window_size=self.halfspace_config.get('window_size', 250),
+                seed=self.halfspace_config.get('random_state', 42)
+            )
+            self.halfspace_trees[metric_name] = model
+        
+        order = np.lexsort((series, timestamps))
+        scores = np.empty(len(features))
+        scores[order] = model.score_learn(features[order])
+        return scores
+    
+    def _predict_isolation_forest(self, model_key: str, features: np.ndarray, series: np.ndarray = None,
+                                  series_keys: list = None, timestamps: np.ndarray = None) -> np.ndarray:
         """Predict anomalies using Isolation Forest"""
-        model = self.models[model_key]
-        scaler = self.scalers[model_key]
+        model, scaler = self.models.get(model_key)
         
-        features_scaled = scaler.transform(features)
+        # Compact forests apply their scaler themselves
+        features_scaled = scaler.transform(features) if scaler is not None else features
         
         # Get anomaly scores (negative scores are more anomalous)
         scores = model.decision_function(features_scaled)
         
-        # Convert to 0-1 range (higher is more anomalous)
-        normalized_scores = 1 - (scores - scores.min()) / (scores.max() - scores.min() + 1e-10)
-        
-        return normalized_scores
+        # Convert to 0-1 range (higher is more anomalous) via the training calibration
+        return _calibrated_scores(model, scores)
     
-    def _predict_one_class_svm(self, model_key: str, features: np.ndarray) -> np.ndarray:
+    def _predict_one_class_svm(self, model_key: str, features: np.ndarray, series: np.ndarray = None,
+                               series_keys: list = None, timestamps: np.ndarray = None) -> np.ndarray:
         """Predict anomalies using One-Class SVM"""
-        model = self.models[model_key]
-        scaler = self.scalers[model_key]
+        model, scaler = self.models.get(model_key)
         
         features_scaled = scaler.transform(features)
         
         # Get anomaly scores
         scores = model.decision_function(features_scaled)
         
-        # Convert to 0-1 range
-        normalized_scores = 1 - (scores - scores.min()) / (scores.max() - scores.min() + 1e-10)
-        
-        return normalized_scores
+        # Convert to 0-1 range via the training calibration
+        return _calibrated_scores(model, scores)
     
     def _calculate_severity(self, score: float) -> str:
         """Calculate severity level based on anomaly score"""
-        severity_levels = self.anomaly_config.get('severity_levels', {})
-        
-        if score >= severity_levels.get('critical', 0.99):
-            return 'critical'
-        elif score >= severity_levels.get('high', 0.95):
-            return 'high'
-        elif score >= severity_levels.get('medium', 0.85):
-            return 'medium'
-        else:
-            return 'low'
+        return SEVERITY_NAMES[severity_codes(np.array([score]), self.severity_thresholds)[0]]
     
-    def save_anomalies(self, anomalies: list):
-        """Save detected anomalies to database"""
-        if not anomalies:
+    def save_anomalies(self, anomalies):
+        """Save detected anomalies (an AnomalyBatch or list of dicts) to database"""
+        if not len(anomalies):
             return
             
         logger.info(f"Saving {len(anomalies)} anomalies to database")
         
+        if isinstance(anomalies, AnomalyBatch):
+            anomalies = anomalies.to_records()
+        
         import httpx
         from datetime import datetime
         
@@ -345,12 +1514,23 @@ class AnomalyDetectorEngine:
                 "metric_name": anomaly['metric_name'],
                 "timestamp": anomaly['timestamp'].isoformat() if isinstance(anomaly['timestamp'], datetime) else str(anomaly['timestamp']),
                 "value": float(anomaly['value']),
-                "expected_value": float(anomaly.get('expected_value', 0)),
+                "expected_value": float(anomaly.get('expected_value') or 0),
                 "anomaly_score": float(anomaly['anomaly_score']),
                 "severity": anomaly['severity'],
-                "algorithm": anomaly.get('algorithm', 'unknown'),
+                "algorithm": anomaly.get('algorithm', anomaly.get('model_type', 'unknown')),
                 "labels": anomaly.get('labels', {})
             }
+            if 'end_timestamp' in anomaly:
+                anomaly_data["context"] = {
+                    **anomaly.get('context', {}),
+                    "start": anomaly_data["timestamp"],
+                    "end": anomaly['end_timestamp'].isoformat() if isinstance(anomaly['end_timestamp'], datetime) else str(anomaly['end_timestamp']),
+                    "points": int(anomaly.get('count', 1)),
+                    "ongoing": bool(anomaly.get('ongoing', False))
+                }
+            if anomaly.get('event_id'):
+                # Later reports of a growing run update the same record
+                anomaly_data["id"] = anomaly['event_id']
             
             # Send to API
             try:
@@ -365,6 +1545,67 @@ class AnomalyDetectorEngine:
             except Exception as e:
                 logger.error(f"Error saving anomaly to API: {e}")
     
+    def save_predictions(self):
+        """
+        Save the forecasts of the latest detection run to the model_predictions table
+        
+        ``save_predictions: anomalies`` (the default) keeps only flagged
+        points, ``all`` (or true) every scored sample. Each row carries its
+        series' labels; samples without a finite value or forecast are skipped.
+        """
+        mode = self.arima_config.get('save_predictions', 'anomalies')
+        if mode is True:
+            mode = 'all'
+        if not self.predictions or mode not in ('all', 'anomalies'):
+            self.predictions = []
+            return
+        
+        import httpx
+        
+        api_url = self.config.get('api', {}).get('url', 'http://saimon-api:8000')
+        confidence = float(self.arima_config.get('interval', 0.95))
+        
+        for forecast in self.predictions:
+            keep = np.isfinite(forecast['actual']) & np.isfinite(forecast['expected'])
+            if mode == 'anomalies':
+                keep &= forecast['is_anomaly']
+            if not keep.any():
+                continue
+            forecast = {name: column[keep] if isinstance(column, np.ndarray) else column
+                        for name, column in forecast.items()}
+            
+            timestamps = pd.to_datetime(forecast['timestamp'], unit='ms')
+            payload = {
+                "metric_name": forecast['metric_name'],
+                "model_type": "arima",
+                "predictions": [
+                    {
+                        "timestamp": timestamp.isoformat(),
+                        "actual_value": actual,
+                        "predicted_value": expected,
+                        "prediction_interval_lower": lower,
+                        "prediction_interval_upper": upper,
+                        "confidence": confidence,
+                        "is_anomaly": is_anomaly,
+                        "labels": labels or {}
+                    }
+                    for timestamp, actual, expected, lower, upper, is_anomaly, labels in zip(
+                        timestamps, forecast['actual'].tolist(), forecast['expected'].tolist(),
+                        forecast['lower'].tolist(), forecast['upper'].tolist(), forecast['is_anomaly'].tolist(),
+                        forecast['labels'].tolist())
+                ]
+            }
+            
+            try:
+                response = httpx.post(f"{api_url}/api/v1/predictions", json=payload, timeout=10.0)
+                if response.status_code not in [200, 201]:
+                    logger.warning(f"Failed to save predictions for {forecast['metric_name']}: "
+                                   f"HTTP {response.status_code}")
+            except Exception as e:
+                logger.error(f"Error saving predictions to API: {e}")
+        
+        self.predictions = []
+    
     def _save_model(self, model_key: str, model_data):
         """Save model to disk and register in database"""
         try:
@@ -386,13 +1627,16 @@ class AnomalyDetectorEngine:
         
         try:
             # Parse model key: "{metric_name}_{model_type}"
-            # Known model types: zscore, isolation_forest, one_class_svm
+            # Known model types: zscore, arima, isolation_forest, one_class_svm
             model_type = None
             metric_name = None
             
             if model_key.endswith('_zscore'):
                 model_type = 'zscore'
                 metric_name = model_key[:-len('_zscore')]
+            elif model_key.endswith('_arima'):
+                model_type = 'arima'
+                metric_name = model_key[:-len('_arima')]
             elif model_key.endswith('_isolation_forest'):
                 model_type = 'isolation_forest'
                 metric_name = model_key[:-len('_isolation_forest')]
@@ -427,6 +1671,12 @@ class AnomalyDetectorEngine:
                     "std": model_data.get("std"),
                     "threshold": model_data.get("threshold")
                 }
+            elif model_type == "arima" and isinstance(model_data, dict):
+                config = {
+                    "order": model_data.get("order"),
+                    "threshold": model_data.get("threshold"),
+                    "series": len(model_data['forecaster'].baseline.keys) - 1
+                }
             elif model_type in ["isolation_forest", "one_class_svm"]:
                 # For ML models, store basic info
                 config = {
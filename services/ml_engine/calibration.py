@@ -0,0 +1,65 @@
+"""
+Score Calibration
+Fixed mapping of raw model scores to [0, 1] from the training-score distribution
+"""
+import numpy as np
+
+
+# Rarest tail probability the calibration resolves
+MIN_TAIL = 1e-4
+
+# Training scores used to fit a calibration
+CALIBRATION_SAMPLE = 20000
+
+
+class ScoreCalibration:
+    """
+    Maps raw decision scores (lower is more anomalous) to anomaly scores
+
+    At fit time the quantiles of the training scores are stored at tail
+    probabilities spaced logarithmically from ``floor`` up to 1. A new raw
+    score is placed on that table to estimate the fraction ``p`` of training
+    points at least as anomalous, and reported as ``log(p) / log(floor)``:
+    about 0 for typical points, 0.5 at a 1% tail and 1 at or beyond the
+    most extreme training scores. The mapping doesn't depend on what else
+    is being scored, so single points can be scored.
+    """
+
+    def __init__(self, levels: np.ndarray, quantiles: np.ndarray):
+        self.levels = np.asarray(levels, dtype=np.float64)
+        self.quantiles = np.asarray(quantiles, dtype=np.float64)
+        self.floor = float(self.levels[0])
+
+    @classmethod
+    def fit(cls, raw_scores: np.ndarray, points: int = 64) -> 'ScoreCalibration':
+        """
+        Build the quantile table from training scores
+
+        Args:
+            raw_scores: Raw scores of the training data
+            points: Quantiles stored
+        """
+        raw_scores = np.asarray(raw_scores, dtype=np.float64)
+        floor = max(MIN_TAIL, 1.0 / max(len(raw_scores), 1))
+        levels = np.geomspace(floor, 1.0, points)
+        return cls(levels, np.quantile(raw_scores, levels))
+
+    def transform(self, raw_scores: np.ndarray) -> np.ndarray:
+        """Anomaly scores in [0, 1] for raw scores"""
+        tail = np.interp(raw_scores, self.quantiles, self.levels)
+        return np.clip(np.log(tail) / np.log(self.floor), 0.0, 1.0)
+
+    def to_dict(self) -> dict:
+        return {'levels': self.levels.tolist(), 'quantiles': self.quantiles.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ScoreCalibration':
+        return cls(data['levels'], data['quantiles'])
+
+
+def calibration_sample(features: np.ndarray, size: int = CALIBRATION_SAMPLE, seed: int = 42) -> np.ndarray:
+    """Rows of a training matrix to score for calibration"""
+    if len(features) <= size:
+        return features
+    rows = np.sort(np.random.default_rng(seed).choice(len(features), size, replace=False))
+    return features[rows]
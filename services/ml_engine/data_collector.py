@@ -3,10 +3,72 @@ Prometheus Data Collector
 Fetches metrics from Prometheus for ML training and inference
 """
 from prometheus_api_client import PrometheusConnect
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from pathlib import Path
+import threading
+import time
+import httpx
+import numpy as np
 import pandas as pd
 from loguru import logger
 
+from series_batch import LabelTable, SeriesBatch, parse_query_range
+from series_buffer import MetricBuffer
+from training_cache import TrainingDataCache
+
+
+_STEP_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_step(step) -> float:
+    """Convert a Prometheus step ('30s', '1m', '1h' or seconds) to seconds"""
+    if isinstance(step, (int, float)):
+        return float(step)
+    step = str(step).strip()
+    for unit in ('ms', 's', 'm', 'h', 'd', 'w'):
+        if step.endswith(unit) and step[:-len(unit)].replace('.', '', 1).isdigit():
+            return float(step[:-len(unit)]) * _STEP_UNITS[unit]
+    return float(step)
+
+
+def build_query(metric_config: dict, default_rate_window: str = '5m') -> str:
+    """
+    Build the PromQL expression for a configured metric
+    
+    Counters are turned into per-second rates and optional ``aggregation``
+    (sum, avg, min, max) with ``by`` labels is pushed down to Prometheus,
+    so only the reduced series are transferred. An explicit ``query``
+    is used as-is.
+    
+    Args:
+        metric_config: Entry from ``data_collection.metrics``
+        default_rate_window: Range used for ``rate()`` when the metric sets none
+    
+    Returns:
+        PromQL expression string
+    """
+    if metric_config.get('query'):
+        return metric_config['query']
+    
+    expr = metric_config['name']
+    if metric_config.get('selector'):
+        expr = f"{expr}{{{metric_config['selector']}}}"
+    
+    if metric_config.get('type') == 'counter' and metric_config.get('rate', True):
+        window = metric_config.get('rate_window', default_rate_window)
+        expr = f"rate({expr}[{window}])"
+    
+    aggregation = metric_config.get('aggregation')
+    if aggregation:
+        if aggregation not in ('sum', 'avg', 'min', 'max'):
+            raise ValueError(f"Unsupported aggregation '{aggregation}' for {metric_config['name']}")
+        by = metric_config.get('by') or []
+        grouping = f" by ({', '.join(by)})" if by else ''
+        expr = f"{aggregation}{grouping} ({expr})"
+    
+    return expr
+
 
 class PrometheusDataCollector:
     """Collects time series data from Prometheus"""
@@ -16,8 +78,117 @@ class PrometheusDataCollector:
         self.config = config
         self.prometheus_url = config.get('prometheus_url', 'http://prometheus:9090')
         self.prom = PrometheusConnect(url=self.prometheus_url, disable_ssl=True)
+        
+        # Range query fetch settings
+        fetch_config = config.get('data_collection', {}).get('fetch', {})
+        self.fetch_mode = fetch_config.get('mode', 'concurrent')
+        self.max_concurrency = max(1, int(fetch_config.get('max_concurrency', 8)))
+        self.query_timeout = float(fetch_config.get('query_timeout', 30))
+        self.inference_step = fetch_config.get('step', '1m')
+        self.incremental = fetch_config.get('incremental', True)
+        self.max_series_lag_ms = int(fetch_config.get('max_series_lag', 300) * 1000)
+        self.max_points_per_shard = max(2, int(fetch_config.get('max_points_per_shard', 10000)))
+        self.shard_retries = max(0, int(fetch_config.get('shard_retries', 3)))
+        
+        # One pooled HTTP client shared by all fetch workers
+        self.http = httpx.Client(
+            base_url=self.prometheus_url,
+            timeout=self.query_timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency
+            ),
+            verify=False
+        )
+        
+        # Metric name -> error message for queries that failed in the last fetch
+        self.last_fetch_errors = {}
+        
+        # Metric name -> MetricBuffer of recent samples for incremental fetches
+        self.buffers = {}
+        self._buffer_locks = {}
+        self.recent_lookback_minutes = 60
+        
+        # Per-metric cardinality caps, so one exploding metric can't exhaust memory
+        collection_config = config.get('data_collection', {})
+        default_max_series = collection_config.get('max_series_per_metric', 500)
+        self.max_series = {
+            metric_config['name']: metric_config.get('max_series', default_max_series)
+            for metric_config in collection_config.get('metrics', [])
+        }
+        self.default_max_series = default_max_series
+        
+        # PromQL per configured metric (rate for counters, optional aggregation)
+        rate_window = collection_config.get('rate_window', '5m')
+        self.queries = {
+            metric_config['name']: build_query(metric_config, rate_window)
+            for metric_config in collection_config.get('metrics', [])
+        }
+        
+        # On-disk cache of training history, so retraining only fetches new data
+        cache_config = config.get('data_collection', {}).get('training_cache', {})
+        self.training_cache = None
+        if cache_config.get('enabled', True):
+            cache_dir = cache_config.get('path') or Path(config.get('model_path', '/app/models')) / 'training_cache'
+            self.training_cache = TrainingDataCache(cache_dir)
+        
+        # Remote-write push ingestion. Only metrics queried by bare name can be
+        # fed from raw pushed samples; rate()/aggregated ones always pull.
+        rw_config = config.get('remote_write', {})
+        self.scrape_interval = float(collection_config.get('scrape_interval', 60))
+        self.push_staleness = float(rw_config.get('staleness', 2 * self.scrape_interval))
+        self.push_metrics = set()
+        if rw_config.get('enabled', False):
+            self.push_metrics = {name for name, query in self.queries.items() if query == name}
+        self.last_push = {}
+        
         logger.info(f"Connected to Prometheus at {self.prometheus_url}")
     
+    def close(self):
+        """Close the pooled HTTP client"""
+        self.http.close()
+    
+    def _query_range(self, query: str, start_time: datetime, end_time: datetime, step: str) -> list:
+        """
+        Run a single query_range request over the pooled client
+        
+        Raises on transport errors, timeouts and non-success responses so
+        callers can tell a failed query apart from an empty result.
+        """
+        response = self.http.get(
+            "/api/v1/query_range",
+            params={
+                "query": query,
+                "start": start_time.timestamp(),
+                "end": end_time.timestamp(),
+                "step": step,
+                "timeout": self.query_timeout
+            }
+        )
+        response.raise_for_status()
+        
+        payload = response.json()
+        if payload.get('status') != 'success':
+            raise RuntimeError(payload.get('error', 'query_range failed'))
+        
+        return payload.get('data', {}).get('result', [])
+    
+    def _query_for(self, metric_name: str) -> str:
+        """PromQL for a metric; unconfigured metrics are queried raw"""
+        return self.queries.get(metric_name, metric_name)
+    
+    def _max_series(self, metric_name: str) -> int:
+        """Cardinality cap for a metric"""
+        return self.max_series.get(metric_name, self.default_max_series)
+    
+    def _warn_dropped(self, metric_name: str, batch: SeriesBatch):
+        """Log series left out by the cardinality cap"""
+        if batch.dropped_series:
+            logger.warning(
+                f"{metric_name} exceeds its cap of {self._max_series(metric_name)} series, "
+                f"dropped {batch.dropped_series} series"
+            )
+    
     def fetch_metric_data(self, metric_name: str, start_time: datetime, end_time: datetime, step: str = '1m') -> pd.DataFrame:
         """
         Fetch time series data for a specific metric
@@ -29,44 +200,127 @@ class PrometheusDataCollector:
             step: Query resolution step (e.g., '1m', '5m', '1h')
         
         Returns:
-            DataFrame with timestamp and value columns
+            DataFrame with timestamp, value, series and labels columns
         """
         try:
-            logger.info(f"Fetching data for metric: {metric_name}")
-            
-            # Query Prometheus
-            result = self.prom.custom_query_range(
-                query=metric_name,
-                start_time=start_time,
-                end_time=end_time,
-                step=step
-            )
-            
-            if not result:
-                logger.warning(f"No data returned for metric: {metric_name}")
-                return pd.DataFrame()
+            return self._fetch_metric_frame(metric_name, start_time, end_time, step)
+        except Exception as e:
+            logger.error(f"Error fetching metric {metric_name}: {e}")
+            return pd.DataFrame()
+    
+    def _fetch_metric_frame(self, metric_name: str, start_time: datetime, end_time: datetime, step: str = '1m') -> pd.DataFrame:
+        """Fetch a metric as a DataFrame, raising if the query fails"""
+        batch = self._fetch_metric_batch(metric_name, start_time, end_time, step)
+        return batch.to_frame()
+    
+    def _fetch_metric_batch(self, metric_name: str, start_time: datetime, end_time: datetime, step: str = '1m',
+                            labels: LabelTable = None) -> SeriesBatch:
+        """Fetch a metric as a columnar SeriesBatch, raising if the query fails"""
+        logger.info(f"Fetching data for metric: {metric_name}")
+        
+        # Query Prometheus
+        result = self._query_range(self._query_for(metric_name), start_time, end_time, step)
+        
+        if not result:
+            logger.warning(f"No data returned for metric: {metric_name}")
+            return SeriesBatch.empty_batch(labels)
+        
+        # Decode straight into arrays instead of building a dict per sample
+        batch = parse_query_range(result, labels, max_series=self._max_series(metric_name))
+        self._warn_dropped(metric_name, batch)
+        logger.info(f"Fetched {len(batch)} data points across {len(batch.labels)} series for {metric_name}")
+        
+        return batch
+    
+    def _fetch_recent_metric(self, metric_name: str, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+        """
+        Fetch the recent window of a metric, raising if the query fails
+        
+        In incremental mode only samples after the newest one of the series
+        furthest behind are queried (series more than ``max_series_lag``
+        behind count as gone); each series' ring buffer skips the samples
+        it already holds, and the window is then served from the buffers.
+        """
+        if not self.incremental and metric_name not in self.push_metrics:
+            return self._fetch_metric_frame(metric_name, start_time, end_time, self.inference_step)
+        
+        step_seconds = parse_step(self.inference_step)
+        window_seconds = (end_time - start_time).total_seconds()
+        
+        with self._buffer_lock(metric_name):
+            buffer = self._get_buffer(metric_name, window_seconds)
+            window_start = int(start_time.timestamp() * 1000)
             
-            # Convert to DataFrame
-            data_points = []
-            for metric_result in result:
-                metric_labels = metric_result['metric']
-                values = metric_result['values']
+            if not self._push_is_fresh(metric_name):
+                query_start = start_time
                 
-                for timestamp, value in values:
-                    data_points.append({
-                        'timestamp': datetime.fromtimestamp(float(timestamp)),
-                        'value': float(value),
-                        'labels': metric_labels
-                    })
-            
-            df = pd.DataFrame(data_points)
-            logger.info(f"Fetched {len(df)} data points for {metric_name}")
+                last_seen = buffer.resume_timestamp(self.max_series_lag_ms)
+                if last_seen is not None and last_seen >= window_start:
+                    # Continue on the same step grid right after the lagging series' newest sample
+                    query_start = datetime.fromtimestamp(last_seen / 1000 + step_seconds)
+                
+                if query_start <= end_time:
+                    batch = self._fetch_metric_batch(
+                        metric_name, query_start, end_time, self.inference_step, labels=buffer.labels
+                    )
+                    buffer.append_batch(batch)
             
-            return df
+            buffer.prune(window_start)
+            return buffer.to_batch(since=window_start).to_frame()
+    
+    def _buffer_lock(self, metric_name: str) -> threading.Lock:
+        """Lock guarding one metric's buffer against concurrent pull and push"""
+        return self._buffer_locks.setdefault(metric_name, threading.Lock())
+    
+    def _get_buffer(self, metric_name: str, window_seconds: float) -> MetricBuffer:
+        """Get or (re)create a metric's buffer large enough for the window"""
+        interval = min(parse_step(self.inference_step), self.scrape_interval)
+        capacity = int(window_seconds // interval) + 1
+        
+        buffer = self.buffers.get(metric_name)
+        if buffer is None or buffer.capacity < capacity:
+            buffer = self.buffers[metric_name] = MetricBuffer(capacity)
+        return buffer
+    
+    def _push_is_fresh(self, metric_name: str) -> bool:
+        """Whether remote write delivered this metric recently enough to skip pulling"""
+        last_push = self.last_push.get(metric_name)
+        return last_push is not None and time.monotonic() - last_push <= self.push_staleness
+    
+    def ingest_samples(self, metric_name: str, labels: dict, timestamps: np.ndarray, values: np.ndarray) -> int:
+        """
+        Append pushed samples of one series to its metric's buffer
+        
+        Args:
+            metric_name: Configured metric the series belongs to
+            labels: Full label set of the series
+            timestamps: int64 epoch milliseconds in ascending order
+            values: float64 sample values
+        
+        Returns:
+            Number of samples appended
+        """
+        if metric_name not in self.push_metrics:
+            return 0
+        
+        with self._buffer_lock(metric_name):
+            buffer = self._get_buffer(metric_name, self.recent_lookback_minutes * 60)
+            idx = buffer.labels.intern(labels, limit=self._max_series(metric_name))
+            if idx < 0:
+                return 0
             
-        except Exception as e:
-            logger.error(f"Error fetching metric {metric_name}: {e}")
-            return pd.DataFrame()
+            # Thin scrape-resolution samples to (roughly) the inference step,
+            # with slack for scrape jitter, so features match the pull path
+            min_interval = int(parse_step(self.inference_step) * 1000 * 0.9)
+            appended = buffer.append_batch(SeriesBatch(
+                timestamps=timestamps,
+                values=values,
+                series=np.full(len(timestamps), idx, dtype=np.int32),
+                labels=buffer.labels
+            ), min_interval=min_interval)
+        
+        self.last_push[metric_name] = time.monotonic()
+        return appended
     
     def fetch_recent_metrics(self, lookback_minutes: int = 60) -> dict:
         """
@@ -76,20 +330,58 @@ class PrometheusDataCollector:
             lookback_minutes: How many minutes of data to fetch
         
         Returns:
-            Dictionary mapping metric names to DataFrames
+            Dictionary mapping metric names to DataFrames. Metrics whose
+            query failed are left out and recorded in ``last_fetch_errors``.
         """
+        self.recent_lookback_minutes = lookback_minutes
         end_time = datetime.now()
         start_time = end_time - timedelta(minutes=lookback_minutes)
         
         metrics_config = self.config.get('data_collection', {}).get('metrics', [])
+        metric_names = [metric_config['name'] for metric_config in metrics_config]
         
         all_data = {}
-        for metric_config in metrics_config:
-            metric_name = metric_config['name']
-            df = self.fetch_metric_data(metric_name, start_time, end_time)
-            
-            if not df.empty:
-                all_data[metric_name] = df
+        errors = {}
+        
+        if self.fetch_mode == 'sequential' or len(metric_names) <= 1:
+            for metric_name in metric_names:
+                try:
+                    df = self._fetch_recent_metric(metric_name, start_time, end_time)
+                except Exception as e:
+                    errors[metric_name] = str(e)
+                    continue
+                
+                if not df.empty:
+                    all_data[metric_name] = df
+        else:
+            # Range queries are I/O bound, so a thread pool over the shared
+            # connection pool overlaps their network wait
+            workers = min(self.max_concurrency, len(metric_names))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prom-fetch') as pool:
+                futures = {
+                    pool.submit(self._fetch_recent_metric, metric_name, start_time, end_time): metric_name
+                    for metric_name in metric_names
+                }
+                
+                for future in as_completed(futures):
+                    metric_name = futures[future]
+                    try:
+                        df = future.result()
+                    except Exception as e:
+                        errors[metric_name] = str(e)
+                        continue
+                    
+                    if not df.empty:
+                        all_data[metric_name] = df
+        
+        self.last_fetch_errors = errors
+        if errors:
+            for metric_name, error in errors.items():
+                logger.error(f"Error fetching metric {metric_name}: {error}")
+            logger.warning(
+                f"Partial fetch: {len(metric_names) - len(errors)}/{len(metric_names)} metrics succeeded, "
+                f"failed: {', '.join(sorted(errors))}"
+            )
         
         return all_data
     
@@ -104,15 +396,179 @@ class PrometheusDataCollector:
         Returns:
             DataFrame with training data
         """
+        try:
+            return self.fetch_training_batch(metric_name, lookback_hours).to_frame()
+        except Exception as e:
+            logger.error(f"Error fetching training data for {metric_name}: {e}")
+            return pd.DataFrame()
+    
+    def fetch_training_batch(self, metric_name: str, lookback_hours: int = None, step: str = '1m') -> SeriesBatch:
+        """
+        Fetch historical data as a SeriesBatch using parallel time shards
+        
+        The lookback window is split into shards of at most
+        ``max_points_per_shard`` steps so no single query exceeds
+        Prometheus' per-series point limit. Shards are fetched concurrently,
+        failed shards are retried, and the results are stitched back
+        together in time order. Shards still failing are recorded in the
+        training cache and fetched again by the next call.
+        
+        Args:
+            metric_name: Name of the metric
+            lookback_hours: How many hours of historical data (default from config)
+            step: Query resolution step
+        
+        Returns:
+            SeriesBatch sorted by series and timestamp. With the training
+            cache enabled its columns are memory-mapped from disk.
+        """
         if lookback_hours is None:
             lookback_hours = self.config.get('data_collection', {}).get('lookback_hours', 168)
         
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=lookback_hours)
         
-        logger.info(f"Fetching {lookback_hours} hours of training data for {metric_name}")
+        if self.training_cache is None:
+            logger.info(f"Fetching {lookback_hours} hours of training data for {metric_name}")
+            batch, failed = self._fetch_sharded(metric_name, [(start_time, end_time)], step)
+            if failed:
+                logger.error(f"Training data for {metric_name} has {len(failed)} gap(s)")
+            return batch
+        
+        query = self._query_for(metric_name)
+        window_start = int(start_time.timestamp() * 1000)
+        step_ms = int(parse_step(step) * 1000)
+        cached = self.training_cache.load(metric_name, query=query, step=step)
+        
+        query_start = start_time
+        labels = None
+        gaps = []
+        if cached is not None:
+            # Series gone from the window must not hold slots under the cap
+            cached = self.training_cache.prune(cached, window_start)
+            labels = cached.labels
+            if not cached.empty:
+                last_cached = int(np.max(cached.timestamps))
+                query_start = datetime.fromtimestamp(last_cached / 1000 + parse_step(step))
+            
+            # Ranges that failed before, up to where the new range takes over
+            resume = int(query_start.timestamp() * 1000)
+            for gap_start, gap_end in self.training_cache.gaps(metric_name):
+                gap_start, gap_end = max(gap_start, window_start), min(gap_end, resume - step_ms)
+                if gap_start <= gap_end:
+                    gaps.append((datetime.fromtimestamp(gap_start / 1000), datetime.fromtimestamp(gap_end / 1000)))
+        
+        ranges = gaps + ([(query_start, end_time)] if query_start <= end_time else [])
+        failed = []
+        if not ranges:
+            new = SeriesBatch.empty_batch(labels)
+        else:
+            logger.info(
+                f"Fetching training data for {metric_name} since {query_start:%Y-%m-%d %H:%M} "
+                f"({'incremental' if query_start > start_time else f'{lookback_hours} hours'})"
+                + (f", refetching {len(gaps)} failed range(s)" if gaps else '')
+            )
+            new, failed = self._fetch_sharded(metric_name, ranges, step, labels=labels)
+            if failed:
+                logger.error(f"Training data for {metric_name} has {len(failed)} gap(s), "
+                             f"fetching them again on the next run")
+        
+        return self.training_cache.update(
+            metric_name, cached, new, since=window_start, query=query, step=step,
+            gaps=[(round(gap_start.timestamp() * 1000), round(gap_end.timestamp() * 1000))
+                  for gap_start, gap_end in failed]
+        )
+    
+    def _plan_shards(self, start_time: datetime, end_time: datetime, step: str) -> list:
+        """Split [start_time, end_time] into non-overlapping shards on the step grid"""
+        step_seconds = parse_step(step)
+        shard_span = timedelta(seconds=(self.max_points_per_shard - 1) * step_seconds)
+        
+        shards = []
+        shard_start = start_time
+        while shard_start <= end_time:
+            shard_end = min(shard_start + shard_span, end_time)
+            shards.append((shard_start, shard_end))
+            shard_start = shard_end + timedelta(seconds=step_seconds)
+        
+        return shards
+    
+    def _fetch_sharded(self, metric_name: str, ranges: list, step: str, labels: LabelTable = None) -> tuple:
+        """
+        Fetch a metric's range query shard by shard, retrying failed shards
+        
+        Args:
+            metric_name: Name of the metric
+            ranges: Non-overlapping (start, end) datetime ranges, each split into shards
+            step: Query resolution step
+            labels: Optional label table to intern into
+        
+        Returns:
+            Tuple of (SeriesBatch, (start, end) of the shards still failing
+            after the retries). Raises if every shard failed.
+        """
+        query = self._query_for(metric_name)
+        shards = [shard for start_time, end_time in ranges for shard in self._plan_shards(start_time, end_time, step)]
+        results = {}
+        errors = {}
+        pending = list(range(len(shards)))
+        
+        for attempt in range(self.shard_retries + 1):
+            if attempt:
+                logger.warning(f"Retrying {len(pending)} failed shard(s) for {metric_name} (attempt {attempt + 1})")
+                time.sleep(min(2 ** (attempt - 1), 10))
+            
+            workers = min(self.max_concurrency, len(pending))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prom-shard') as pool:
+                futures = {
+                    pool.submit(self._query_range, query, shards[i][0], shards[i][1], step): i
+                    for i in pending
+                }
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        results[i] = future.result()
+                        errors.pop(i, None)
+                    except Exception as e:
+                        errors[i] = str(e)
+            
+            pending = sorted(errors)
+            if not pending:
+                break
+        
+        if not results:
+            raise RuntimeError(f"All {len(shards)} shards failed: {next(iter(errors.values()))}")
+        
+        if errors:
+            logger.error(
+                f"{len(errors)}/{len(shards)} shards of {metric_name} still failing after "
+                f"{self.shard_retries} retries: {next(iter(errors.values()))}"
+            )
+        
+        # Decode in shard order into one label table, then stitch
+        if labels is None:
+            labels = LabelTable()
+        batches = [parse_query_range(results[i], labels, max_series=self._max_series(metric_name))
+                   for i in sorted(results)]
+        for shard_batch in batches:
+            self._warn_dropped(metric_name, shard_batch)
+        timestamps = np.concatenate([batch.timestamps for batch in batches])
+        values = np.concatenate([batch.values for batch in batches])
+        series = np.concatenate([batch.series for batch in batches])
+        
+        order = np.lexsort((timestamps, series))
+        batch = SeriesBatch(
+            timestamps=timestamps[order],
+            values=values[order],
+            series=series[order],
+            labels=labels
+        )
+        logger.info(
+            f"Fetched {len(batch)} data points across {len(labels)} series for {metric_name} "
+            f"in {len(shards)} shard(s)"
+        )
         
-        return self.fetch_metric_data(metric_name, start_time, end_time, step='1m')
+        return batch, [shards[i] for i in sorted(errors)]
     
     def get_available_metrics(self) -> list:
         """Get list of all available metrics from Prometheus"""
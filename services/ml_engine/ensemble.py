@@ -0,0 +1,64 @@
+"""
+Ensemble Score Fusion
+Combines the per-model anomaly scores of a metric into one score per point
+"""
+import numpy as np
+from loguru import logger
+
+
+FUSION_METHODS = ('max', 'mean')
+
+
+class ScoreFusion:
+    """
+    Fuses calibrated model scores (each in 0-1) into an ensemble score
+
+    ``max`` takes the highest weighted score, so any confident model can
+    flag a point; ``mean`` takes the weighted average, so models have to
+    agree. Weights default to 1 per model. On top of that a point is only
+    flagged if at least ``min_votes`` models score it above the threshold
+    on their own (capped at the number of models that produced scores).
+    """
+
+    def __init__(self, method: str = 'max', weights: dict = None, min_votes: int = 1):
+        if method not in FUSION_METHODS:
+            logger.warning(f"Unknown ensemble method '{method}', using 'max'")
+            method = 'max'
+        self.method = method
+        self.weights = weights or {}
+        self.min_votes = max(int(min_votes), 1)
+
+    @classmethod
+    def from_config(cls, ensemble_config: dict) -> 'ScoreFusion':
+        return cls(
+            method=ensemble_config.get('method', 'max'),
+            weights=ensemble_config.get('weights', {}),
+            min_votes=ensemble_config.get('min_votes', 1)
+        )
+
+    def fuse(self, model_types: list, scores: np.ndarray, threshold: float):
+        """
+        Combine the score rows of several models
+
+        Args:
+            model_types: Model of each row of ``scores``
+            scores: Array of shape (models, points)
+            threshold: Anomaly threshold applied to the scores
+
+        Returns:
+            Tuple of (ensemble scores, mask of flagged points)
+        """
+        weights = np.array([self.weights.get(name, 1.0) for name in model_types], dtype=np.float64)
+
+        if self.method == 'mean':
+            fused = weights @ scores / max(weights.sum(), 1e-10)
+        else:
+            fused = (weights[:, None] * scores).max(axis=0)
+        fused = np.clip(fused, 0.0, 1.0)
+
+        mask = fused > threshold
+        min_votes = min(self.min_votes, len(model_types))
+        if min_votes > 1:
+            mask &= (scores > threshold).sum(axis=0) >= min_votes
+
+        return fused, mask
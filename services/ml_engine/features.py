@@ -0,0 +1,377 @@
+"""
+Feature Engine
+Single-pass, vectorized rolling and time features for anomaly detection
+"""
+from collections import deque
+import math
+import numpy as np
+
+
+STATISTICAL_FEATURES = ('rolling_mean', 'rolling_std', 'rolling_min', 'rolling_max')
+TIME_FEATURES = ('hour_of_day', 'day_of_week', 'is_weekend')
+
+_MS_PER_HOUR = 3600 * 1000
+_MS_PER_DAY = 24 * _MS_PER_HOUR
+
+
+def _sliding_extreme(values: np.ndarray, window: int, segment_id: np.ndarray, maximum: bool) -> np.ndarray:
+    """
+    Rolling min or max over every series at once (van Herk/Gil-Werman)
+
+    ``window - 1`` sentinels are inserted before each series so windows
+    never reach into the previous series and are truncated at its start,
+    then block-wise prefix/suffix extremes give every window in O(1).
+
+    Args:
+        values: Samples grouped by series, in time order
+        window: Window length in samples
+        segment_id: Ordinal (0, 1, ...) of each sample's series
+        maximum: Max if True, else min
+    """
+    n = len(values)
+    if window <= 1:
+        return values.copy()
+
+    accumulate = np.maximum.accumulate if maximum else np.minimum.accumulate
+    extreme = np.maximum if maximum else np.minimum
+    sentinel = -np.inf if maximum else np.inf
+
+    # Layout: [pad, series 0, pad, series 1, ...], padded to whole blocks
+    pad = window - 1
+    positions = np.arange(n) + pad * (segment_id + 1)
+    length = n + pad * (int(segment_id[-1]) + 2)
+    length += (-length) % window
+
+    padded = np.full(length, sentinel, dtype=values.dtype)
+    padded[positions] = values
+
+    blocks = padded.reshape(-1, window)
+    prefix = accumulate(blocks, axis=1).ravel()
+    suffix = accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    return extreme(suffix[positions - pad], prefix[positions])
+
+
+def _day_of_week(timestamps):
+    """Day 0-6 (Monday = 0, UTC) of epoch-millisecond timestamps (array or int)"""
+    # 1970-01-01 was a Thursday; shift so Monday = 0
+    return (timestamps // _MS_PER_DAY + 3) % 7
+
+
+def _hour_of_day(timestamps):
+    """Hour 0-23 (UTC) of epoch-millisecond timestamps (array or int)"""
+    return (timestamps % _MS_PER_DAY) // _MS_PER_HOUR
+
+
+def hour_of_week(timestamps: np.ndarray) -> np.ndarray:
+    """Bucket index 0-167 (Monday 00:00 UTC = 0) of epoch-millisecond timestamps"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    return (_day_of_week(timestamps) * 24 + _hour_of_day(timestamps)).astype(np.intp)
+
+
+def time_feature_columns(timestamps: np.ndarray, names: list, out: np.ndarray = None) -> np.ndarray:
+    """
+    Calendar features of epoch-millisecond timestamps (UTC)
+
+    Args:
+        timestamps: int64 epoch milliseconds
+        names: Features from TIME_FEATURES, in column order
+        out: Optional (len(timestamps), len(names)) array to write into
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if out is None:
+        out = np.empty((len(timestamps), len(names)), dtype=np.float32)
+    day_of_week = _day_of_week(timestamps)
+    for col, name in enumerate(names):
+        if name == 'hour_of_day':
+            out[:, col] = _hour_of_day(timestamps)
+        elif name == 'day_of_week':
+            out[:, col] = day_of_week
+        elif name == 'is_weekend':
+            out[:, col] = day_of_week >= 5
+    return out
+
+
+class FeatureEngine:
+    """
+    Computes the configured feature matrix in one pass over all series
+
+    Columns are the raw value, then for every window in ``rolling_windows``
+    the enabled ``statistical_features`` (mean, std, min, max), then the
+    enabled ``time_features``. Windows are truncated at series starts like
+    ``rolling(min_periods=1)``.
+    """
+
+    def __init__(self, config: dict):
+        feature_config = config.get('feature_engineering', {})
+        self.windows = [int(w) for w in feature_config.get('rolling_windows', [5, 10, 30])]
+        self.statistics = [name for name in feature_config.get('statistical_features', ['rolling_mean', 'rolling_std'])
+                           if name in STATISTICAL_FEATURES]
+        self.time_features = [name for name in feature_config.get('time_features', [])
+                              if name in TIME_FEATURES]
+
+    @property
+    def feature_names(self) -> list:
+        """Column names of the feature matrix"""
+        names = ['value']
+        for window in self.windows:
+            names.extend(f"{name}_{window}" for name in self.statistics)
+        names.extend(self.time_features)
+        return names
+
+    def transform(self, values: np.ndarray, series: np.ndarray = None, timestamps: np.ndarray = None) -> np.ndarray:
+        """
+        Build the feature matrix
+
+        Args:
+            values: Sample values
+            series: Optional series index per sample; samples of one series
+                must be in time order but series may be interleaved
+            timestamps: int64 epoch milliseconds, required for time features
+
+        Returns:
+            float32 array of shape (len(values), len(feature_names)), rows in
+            input order, laid out column-major
+        """
+        n = len(values)
+        if n == 0:
+            return np.empty((0, len(self.feature_names)), dtype=np.float32)
+
+        values = np.asarray(values, dtype=np.float32)
+        if series is None:
+            series = np.zeros(n, dtype=np.int32)
+        series = np.asarray(series)
+
+        # Group by series; skip the permutation when already grouped
+        order = None
+        if np.any(series[1:] < series[:-1]):
+            order = np.argsort(series, kind='stable')
+            values = values[order]
+            series = series[order]
+            if timestamps is not None:
+                timestamps = np.asarray(timestamps)[order]
+
+        boundary = np.r_[True, series[1:] != series[:-1]]
+        segment_id = np.cumsum(boundary) - 1
+        starts = np.flatnonzero(boundary)
+        segment_start = starts[segment_id]
+        offset = np.arange(n) - segment_start
+
+        # Column-major, so every feature column is written contiguously
+        out = np.empty((n, len(self.feature_names)), dtype=np.float32, order='F')
+        out[:, 0] = values
+
+        # Shift each series by its first value before accumulating, so the
+        # float64 prefix sums stay small and the variance doesn't cancel out
+        shift = values[segment_start]
+        centered = values.astype(np.float64) - shift
+        csum = np.concatenate(([0.0], np.cumsum(centered)))
+        csum_sq = np.concatenate(([0.0], np.cumsum(centered * centered)))
+
+        col = 1
+        for window in self.windows:
+            # Full windows are a difference of shifted prefix sums; only the
+            # first window - 1 samples of each series need a truncated window
+            window_sum = np.empty(n, dtype=np.float64)
+            window_sq = np.empty(n, dtype=np.float64)
+            if n >= window:
+                np.subtract(csum[window:], csum[:n - window + 1], out=window_sum[window - 1:])
+                np.subtract(csum_sq[window:], csum_sq[:n - window + 1], out=window_sq[window - 1:])
+            partial = np.flatnonzero(offset < window - 1)
+            partial_count = offset[partial] + 1
+            lo = segment_start[partial]
+            window_sum[partial] = csum[partial + 1] - csum[lo]
+            window_sq[partial] = csum_sq[partial + 1] - csum_sq[lo]
+
+            # Mean of the shifted values
+            mean = window_sum / window
+            mean[partial] = window_sum[partial] / partial_count
+
+            for name in self.statistics:
+                if name == 'rolling_mean':
+                    out[:, col] = mean + shift
+                elif name == 'rolling_std':
+                    # Sample variance: (sum of squares - sum * mean) / (count - 1)
+                    var = window_sum * mean
+                    np.subtract(window_sq, var, out=var)
+                    if window > 1:
+                        var /= window - 1
+                        var[partial] /= np.maximum(partial_count - 1, 1) / (window - 1)
+                    else:
+                        var[:] = 0
+                    np.maximum(var, 0, out=var)
+                    out[:, col] = np.sqrt(var, out=var)
+                elif name == 'rolling_min':
+                    out[:, col] = _sliding_extreme(values, window, segment_id, maximum=False)
+                elif name == 'rolling_max':
+                    out[:, col] = _sliding_extreme(values, window, segment_id, maximum=True)
+                col += 1
+
+        if self.time_features:
+            if timestamps is None:
+                raise ValueError("timestamps are required for time features")
+            time_feature_columns(timestamps, self.time_features, out[:, col:])
+
+        if order is None:
+            return out
+
+        features = np.empty_like(out)
+        features[order] = out
+        return features
+
+
+class _WindowState:
+    """Running mean/variance (Welford) and monotonic min/max deques for one window"""
+
+    __slots__ = ('size', 'buffer', 'pos', 'count', 'mean', 'm2', 'index', 'min_deque', 'max_deque')
+
+    # Recompute mean/M2 from the buffer this often (in windows) to bound drift
+    RESYNC_WINDOWS = 64
+
+    def __init__(self, size: int):
+        self.size = size
+        self.buffer = [0.0] * size
+        self.pos = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.index = 0
+        self.min_deque = deque()
+        self.max_deque = deque()
+
+    def update(self, x: float):
+        if self.count < self.size:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.buffer[self.pos]
+            mean = self.mean + (x - old) / self.size
+            self.m2 += (x - old) * (x - mean + old - self.mean)
+            self.mean = mean
+
+        self.buffer[self.pos] = x
+        self.pos = (self.pos + 1) % self.size
+
+        i = self.index
+        self.index += 1
+        oldest = i - self.size + 1
+
+        while self.min_deque and self.min_deque[-1][1] >= x:
+            self.min_deque.pop()
+        self.min_deque.append((i, x))
+        if self.min_deque[0][0] < oldest:
+            self.min_deque.popleft()
+
+        while self.max_deque and self.max_deque[-1][1] <= x:
+            self.max_deque.pop()
+        self.max_deque.append((i, x))
+        if self.max_deque[0][0] < oldest:
+            self.max_deque.popleft()
+
+        if self.index % (self.size * self.RESYNC_WINDOWS) == 0:
+            window = self.buffer[:self.count]
+            self.mean = sum(window) / self.count
+            self.m2 = sum((v - self.mean) ** 2 for v in window)
+
+    def copy(self) -> '_WindowState':
+        other = _WindowState.__new__(_WindowState)
+        for name in ('size', 'pos', 'count', 'mean', 'm2', 'index'):
+            setattr(other, name, getattr(self, name))
+        other.buffer = list(self.buffer)
+        other.min_deque = deque(self.min_deque)
+        other.max_deque = deque(self.max_deque)
+        return other
+
+    @property
+    def std(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+
+class StreamingFeatureState:
+    """
+    Incremental feature state of one series
+
+    Each sample updates every window in O(1) (amortized for min/max) and
+    yields the same feature vector FeatureEngine.transform would produce
+    for it, without revisiting older samples. Instances pickle cleanly.
+    """
+
+    def __init__(self, engine: FeatureEngine, max_gap_ms: int = None):
+        self.feature_names = engine.feature_names
+        self.statistics = list(engine.statistics)
+        self.time_features = list(engine.time_features)
+        self.windows = [_WindowState(window) for window in engine.windows]
+        self.max_gap_ms = max_gap_ms
+        self.last_timestamp = None
+
+    def reset(self):
+        self.windows = [_WindowState(window.size) for window in self.windows]
+        self.last_timestamp = None
+
+    def copy(self) -> 'StreamingFeatureState':
+        """Independent copy, to advance without touching this state"""
+        other = StreamingFeatureState.__new__(StreamingFeatureState)
+        other.__dict__.update(self.__dict__)
+        other.windows = [window.copy() for window in self.windows]
+        return other
+
+    def update(self, timestamp: int, value: float, out: np.ndarray = None) -> np.ndarray:
+        """Feed one sample and return its feature vector"""
+        if out is None:
+            out = np.empty(len(self.feature_names), dtype=np.float32)
+
+        if self.last_timestamp is not None and self.max_gap_ms and timestamp - self.last_timestamp > self.max_gap_ms:
+            # Too old to continue the windows; start over
+            self.reset()
+        self.last_timestamp = timestamp
+
+        out[0] = value
+        col = 1
+        for window in self.windows:
+            window.update(value)
+            for name in self.statistics:
+                if name == 'rolling_mean':
+                    out[col] = window.mean
+                elif name == 'rolling_std':
+                    out[col] = window.std
+                elif name == 'rolling_min':
+                    out[col] = window.min_deque[0][1]
+                elif name == 'rolling_max':
+                    out[col] = window.max_deque[0][1]
+                col += 1
+
+        if self.time_features:
+            day_of_week = _day_of_week(timestamp)
+            for name in self.time_features:
+                if name == 'hour_of_day':
+                    out[col] = _hour_of_day(timestamp)
+                elif name == 'day_of_week':
+                    out[col] = day_of_week
+                elif name == 'is_weekend':
+                    out[col] = day_of_week >= 5
+                col += 1
+
+        return out
+
+    def update_many(self, timestamps: np.ndarray, values: np.ndarray):
+        """
+        Feed samples in time order, skipping ones already seen
+
+        Returns:
+            Tuple of (positions of the samples that were new, their feature matrix)
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if self.last_timestamp is not None:
+            new = np.flatnonzero(timestamps > self.last_timestamp)
+        else:
+            new = np.arange(len(timestamps))
+
+        features = np.empty((len(new), len(self.feature_names)), dtype=np.float32)
+        for row, i in enumerate(new.tolist()):
+            self.update(int(timestamps[i]), float(values[i]), features[row])
+
+        return new, features
@@ -0,0 +1,220 @@
+"""
+Seasonal AR Forecaster
+Per-series seasonal profile plus an autoregressive residual model, fitted by
+least squares for all series at once
+"""
+import numpy as np
+
+from seasonal import SeasonalBaseline, MIN_STD_RATIO
+
+
+# Residual samples a series needs to get its own AR coefficients
+MIN_FIT_SAMPLES = 30
+
+
+class SeasonalARForecaster:
+    """
+    One-step-ahead forecasts with prediction error for every series
+
+    Each sample is split into the series' hour-of-week mean (a
+    SeasonalBaseline) and a residual ``r``. The residual, or its first
+    difference when ``d`` is 1, follows an AR(p) model with intercept:
+    ``z_t = c + phi_1 z_(t-1) + ... + phi_p z_(t-p) + e_t``. The normal
+    equations of all series are accumulated with bincount and solved in
+    one batched call, and ``sigma`` is the standard deviation of ``e``.
+    Series with too little data use the coefficients pooled over the
+    metric. Forecasting only needs the last ``p + d`` samples of a series.
+    """
+
+    def __init__(self, baseline: SeasonalBaseline, coef: np.ndarray, sigma: np.ndarray, p: int, d: int):
+        self.baseline = baseline
+        self.coef = coef
+        self.sigma = sigma
+        self.p = p
+        self.d = d
+
+    @property
+    def history(self) -> int:
+        """Preceding samples needed to forecast a sample"""
+        return self.p + self.d
+
+    @classmethod
+    def fit(cls, values: np.ndarray, series: np.ndarray, series_keys: list, timestamps: np.ndarray,
+            p: int = 1, d: int = 0, seasonal: bool = True, min_bucket_samples: int = 10,
+            ridge: float = 1e-3) -> 'SeasonalARForecaster':
+        """
+        Fit every series of a metric
+
+        Args:
+            values: Sample values
+            series: Series index per sample
+            series_keys: Series key of each series index
+            timestamps: int64 epoch milliseconds
+            p: AR order
+            d: 1 to model first differences of the residual, else 0
+            seasonal: Hour-of-week profile if True, else one mean per series
+            min_bucket_samples: Samples a seasonal bucket needs for its own mean
+            ridge: Shrinkage of the AR coefficients, relative to their scale
+        """
+        p, d = max(int(p), 0), min(max(int(d), 0), 1)
+        order = np.lexsort((timestamps, series))
+        values = np.asarray(values, dtype=np.float64)[order]
+        series = np.asarray(series)[order]
+        timestamps = np.asarray(timestamps, dtype=np.int64)[order]
+
+        baseline = SeasonalBaseline.fit(
+            values, series, series_keys, timestamps,
+            min_samples=min_bucket_samples if seasonal else np.iinfo(np.int64).max
+        )
+        rows, buckets = baseline.cells(series, series_keys, timestamps)
+        z = _model_input(values - baseline.mean[rows, buckets], d)
+
+        # Lagged design rows, each within one series
+        start = np.r_[True, series[1:] != series[:-1]]
+        offset = np.arange(len(values)) - np.flatnonzero(start)[np.cumsum(start) - 1]
+        valid = np.flatnonzero(offset >= p + d)
+        k = p + 1
+        design = np.ones((len(valid), k))
+        for lag in range(1, k):
+            design[:, lag] = z[valid - lag]
+        target = z[valid]
+        cell = rows[valid]
+
+        # Normal equations per row; the metric-wide row pools all series
+        n_rows = len(baseline.keys)
+        xtx = np.empty((n_rows, k, k))
+        xty = np.empty((n_rows, k))
+        for i in range(k):
+            xty[:, i] = np.bincount(cell, weights=design[:, i] * target, minlength=n_rows)
+            for j in range(i, k):
+                xtx[:, i, j] = xtx[:, j, i] = np.bincount(cell, weights=design[:, i] * design[:, j],
+                                                          minlength=n_rows)
+        yty = np.bincount(cell, weights=target * target, minlength=n_rows)
+        metric_row = n_rows - 1
+        xtx[metric_row] = xtx.sum(axis=0)
+        xty[metric_row] = xty.sum(axis=0)
+        yty[metric_row] = yty.sum()
+        counts = xtx[:, 0, 0]
+
+        # Ridge on the lag coefficients keeps flat or short series solvable
+        diagonal = np.einsum('rii->ri', xtx).copy()
+        diagonal[:, 0] = 0.0
+        regularized = xtx.copy()
+        regularized[:, np.arange(k), np.arange(k)] += ridge * diagonal + 1e-9
+        coef = np.linalg.solve(regularized, xty[..., None])[..., 0]
+
+        # Residual sum of squares from the same sums, without a second pass
+        sse = yty - 2.0 * np.einsum('ri,ri->r', coef, xty) + np.einsum('ri,rij,rj->r', coef, xtx, coef)
+        sigma = np.sqrt(np.maximum(sse, 0.0) / np.maximum(counts - k, 1.0))
+
+        row_std = baseline.std_floor / MIN_STD_RATIO
+        few = counts < max(MIN_FIT_SAMPLES, 2 * k)
+        if few[metric_row]:
+            coef[metric_row] = 0.0
+        coef[few] = coef[metric_row]
+        sigma[few] = row_std[few]
+        sigma = np.maximum(sigma, baseline.std_floor)
+
+        return cls(baseline, coef, sigma.astype(np.float32), p, d)
+
+    def forecast(self, values: np.ndarray, series: np.ndarray, series_keys: list, timestamps: np.ndarray,
+                 history: dict = None, max_gap_ms: int = None):
+        """
+        One-step-ahead forecast of every sample from the samples before it
+
+        Args:
+            values, series, timestamps: New samples
+            series_keys: Series key of each series index
+            history: Series key -> (timestamps, values) of the latest earlier
+                samples; read for context and updated in place. None to
+                forecast from the new samples alone.
+            max_gap_ms: History further back than this is not used
+
+        Returns:
+            Tuple of (expected values, forecast standard deviations), in
+            input order. Samples without enough preceding samples get the
+            seasonal mean and the bucket's standard deviation.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        series = np.asarray(series)
+        n = len(values)
+        m = self.history
+        if n == 0:
+            return np.empty(0), np.empty(0)
+
+        order = np.lexsort((timestamps, series))
+        bounds = np.flatnonzero(np.r_[True, series[order][1:] != series[order][:-1], True])
+
+        # Prepend each series' history to its new samples
+        ext_values, ext_timestamps, ext_series, new_positions = [], [], [], []
+        size = 0
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            group = order[lo:hi]
+            idx = series[group[0]]
+            past_t, past_v = (None, None) if history is None else history.get(series_keys[idx], (None, None))
+            if past_t is not None:
+                keep = past_t < timestamps[group[0]]
+                if max_gap_ms is not None:
+                    keep &= timestamps[group[0]] - past_t[-1] <= max_gap_ms
+                past_t, past_v = past_t[keep], past_v[keep]
+                ext_timestamps.append(past_t)
+                ext_values.append(past_v)
+                ext_series.append(np.full(len(past_t), idx))
+                size += len(past_t)
+            ext_timestamps.append(timestamps[group])
+            ext_values.append(values[group])
+            ext_series.append(np.full(len(group), idx))
+            new_positions.append(np.arange(size, size + len(group)))
+            size += len(group)
+
+        ext_values = np.concatenate(ext_values)
+        ext_timestamps = np.concatenate(ext_timestamps)
+        ext_series = np.concatenate(ext_series)
+        new_positions = np.concatenate(new_positions)
+
+        rows, buckets = self.baseline.cells(ext_series, series_keys, ext_timestamps)
+        seasonal_mean = self.baseline.mean[rows, buckets].astype(np.float64)
+        residual = ext_values - seasonal_mean
+        z = _model_input(residual, self.d)
+
+        start = np.r_[True, ext_series[1:] != ext_series[:-1]]
+        offset = np.arange(size) - np.flatnonzero(start)[np.cumsum(start) - 1]
+
+        # Default: the seasonal profile alone
+        expected = seasonal_mean.copy()
+        sigma = self.baseline.std[rows, buckets].astype(np.float64)
+
+        ready = np.flatnonzero(offset >= m)
+        if len(ready):
+            coef = self.coef[rows[ready]]
+            predicted = coef[:, 0].copy()
+            for lag in range(1, self.p + 1):
+                predicted += coef[:, lag] * z[ready - lag]
+            if self.d:
+                predicted += residual[ready - 1]
+            expected[ready] = seasonal_mean[ready] + predicted
+            sigma[ready] = self.sigma[rows[ready]]
+
+        if history is not None and m:
+            ends = np.flatnonzero(np.r_[start[1:], True]) + 1
+            for begin, end in zip(np.flatnonzero(start), ends):
+                begin = max(begin, end - m)
+                history[series_keys[ext_series[begin]]] = (ext_timestamps[begin:end].copy(),
+                                                           ext_values[begin:end].copy())
+
+        out_expected = np.empty(n)
+        out_sigma = np.empty(n)
+        out_expected[order] = expected[new_positions]
+        out_sigma[order] = sigma[new_positions]
+        return out_expected, out_sigma
+
+
+def _model_input(residual: np.ndarray, d: int) -> np.ndarray:
+    """The residual, or its first difference (undefined at series starts) when d is 1"""
+    if not d:
+        return residual
+    z = np.empty_like(residual)
+    z[0] = 0.0
+    np.subtract(residual[1:], residual[:-1], out=z[1:])
+    return z
@@ -0,0 +1,193 @@
+"""
+Compact Isolation Forest
+Trained forests flattened into NumPy arrays and scored for all trees at once
+"""
+import json
+import shutil
+from pathlib import Path
+import numpy as np
+
+from calibration import ScoreCalibration
+
+
+_ARRAYS = ('feature', 'threshold', 'child', 'path_length', 'roots', 'center', 'scale')
+
+# Nodes (points x trees) visited per traversal step; bounds scratch memory
+_CHUNK_NODES = 1 << 16
+
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """Expected path length of an unsuccessful BST search among n samples, c(n)"""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    length = np.zeros_like(n_samples)
+    length[n_samples == 2] = 1.0
+    many = n_samples > 2
+    n = n_samples[many]
+    length[many] = 2.0 * (np.log(n - 1.0) + np.euler_gamma) - 2.0 * (n - 1.0) / n
+    return length
+
+
+class CompactIsolationForest:
+    """
+    Array-backed Isolation Forest scorer
+
+    All trees are concatenated into flat node arrays: ``feature`` and
+    ``threshold`` of each split, the global index of its first ``child``
+    and for leaves the ``path_length`` (depth plus c(leaf size)) that
+    scikit-learn adds up. Nodes are numbered breadth-first so the right
+    child directly follows the left one, and a step is just
+    ``child + (x > threshold)``. Leaves point to themselves with an
+    infinite threshold, so every point walks every tree in exactly
+    ``max_depth`` vectorized steps. A StandardScaler fitted in front of the
+    forest is exported as ``center``/``scale`` and applied the same way, so
+    raw features are scored directly.
+    """
+
+    def __init__(self, arrays: dict, meta: dict):
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta
+        self.n_trees = len(self.roots)
+        self.max_depth = meta['max_depth']
+        self.offset = meta['offset']
+        self.denominator = meta['denominator']
+        self.calibration_ = None
+        if meta.get('calibration'):
+            self.calibration_ = ScoreCalibration.from_dict(meta['calibration'])
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None, feature_names: list = None) -> 'CompactIsolationForest':
+        """
+        Export a fitted sklearn IsolationForest
+
+        Args:
+            model: Fitted IsolationForest
+            scaler: Optional fitted StandardScaler the forest was trained behind
+            feature_names: Stored with the export to detect layout changes
+        """
+        features, thresholds, children, path_lengths, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator, tree_features in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            is_leaf = tree.children_left < 0
+
+            # Breadth-first order, so siblings get consecutive indices
+            order = [0]
+            depth = [0]
+            first_child = []
+            for position, node in enumerate(order):
+                if is_leaf[node]:
+                    first_child.append(position)
+                else:
+                    first_child.append(len(order))
+                    order.extend((tree.children_left[node], tree.children_right[node]))
+                    depth.extend((depth[position] + 1, depth[position] + 1))
+            order = np.array(order)
+            depth = np.array(depth, dtype=np.float64)
+            leaf = is_leaf[order]
+            max_depth = max(max_depth, int(depth.max()))
+
+            # Map the tree's (possibly subsampled) columns to input columns
+            feature = np.where(leaf, 0, np.asarray(tree_features)[np.maximum(tree.feature[order], 0)])
+            threshold = tree.threshold[order].astype(np.float64)
+            threshold[leaf] = np.inf
+
+            features.append(feature)
+            thresholds.append(threshold)
+            children.append(np.array(first_child) + offset)
+            path_lengths.append(np.where(leaf, depth + _average_path_length(tree.n_node_samples[order]), 0.0))
+            roots.append(offset)
+            offset += len(order)
+
+        arrays = {
+            'feature': np.concatenate(features).astype(np.int32),
+            'threshold': np.concatenate(thresholds),
+            'child': np.concatenate(children).astype(np.int32),
+            'path_length': np.concatenate(path_lengths),
+            'roots': np.array(roots, dtype=np.int32),
+            # float32, as StandardScaler casts them to the float32 features
+            'center': np.zeros(model.n_features_in_, dtype=np.float32) if scaler is None
+            else np.asarray(scaler.mean_, dtype=np.float32),
+            'scale': np.ones(model.n_features_in_, dtype=np.float32) if scaler is None
+            else np.asarray(scaler.scale_, dtype=np.float32)
+        }
+        meta = {
+            'max_depth': max_depth,
+            'offset': float(model.offset_),
+            'denominator': float(len(roots) * _average_path_length([model.max_samples_])[0]),
+            'n_features': int(model.n_features_in_),
+            'feature_names': feature_names,
+            'calibration': model.calibration_.to_dict() if getattr(model, 'calibration_', None) else None
+        }
+        return cls(arrays, meta)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in _ARRAYS)
+
+    def _path_lengths(self, X: np.ndarray) -> np.ndarray:
+        """Summed path length over all trees for each row of X"""
+        n, d = X.shape
+        total = np.empty(n, dtype=np.float64)
+        chunk = max(1, _CHUNK_NODES // self.n_trees)
+
+        for start in range(0, n, chunk):
+            block = X[start:start + chunk]
+            flat = block.ravel()
+            row_offset = (np.arange(len(block), dtype=np.int64) * d)[:, None]
+            node = np.broadcast_to(self.roots, (len(block), self.n_trees)).copy()
+
+            for _ in range(self.max_depth):
+                value = flat[row_offset + self.feature[node]]
+                node = self.child[node] + (value > self.threshold[node])
+
+            total[start:start + chunk] = self.path_length[node].sum(axis=1)
+
+        return total
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        """Same as IsolationForest.score_samples (lower is more abnormal)"""
+        # Scale in float32 like StandardScaler does for the float32 features,
+        # then compare against the float64 thresholds like sklearn trees do
+        X = np.array(X, dtype=np.float32, order='C')
+        X -= self.center
+        X /= self.scale
+        if self.denominator == 0:
+            return -np.ones(len(X))
+        return -(2.0 ** (-self._path_lengths(X) / self.denominator))
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Same as IsolationForest.decision_function (negative is anomalous)"""
+        return self.score_samples(X) - self.offset
+
+    def save(self, directory):
+        """Write the arrays as .npy files plus meta.json, replacing any old export"""
+        directory = Path(directory)
+        tmp_dir = directory.with_name(directory.name + '.tmp')
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir(parents=True)
+
+        for name in _ARRAYS:
+            np.save(tmp_dir / f"{name}.npy", getattr(self, name))
+        with open(tmp_dir / 'meta.json', 'w') as f:
+            json.dump(self.meta, f)
+
+        old_dir = directory.with_name(directory.name + '.old')
+        if directory.exists():
+            directory.rename(old_dir)
+        tmp_dir.rename(directory)
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+
+    @classmethod
+    def load(cls, directory, mmap: bool = True) -> 'CompactIsolationForest':
+        """Load an export, memory-mapping the arrays by default"""
+        directory = Path(directory)
+        with open(directory / 'meta.json', 'r') as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode=mmap_mode) for name in _ARRAYS}
+        return cls(arrays, meta)
@@ -0,0 +1,173 @@
+"""
+Streaming Half-Space Trees
+Online anomaly detector that learns from every scored sample, without retraining
+"""
+import numpy as np
+
+from calibration import ScoreCalibration, CALIBRATION_SAMPLE
+
+
+# Stop descending at nodes whose reference mass is below this share of the window
+SIZE_LIMIT_RATIO = 0.1
+
+
+class HalfSpaceTrees:
+    """
+    Array-backed Half-Space Trees (Tan, Ting & Liu, 2011)
+
+    Every tree is a complete binary tree of ``height`` levels stored in
+    heap order (children of node ``i`` at ``2i + 1`` and ``2i + 2``), with
+    a random feature per node split at the middle of the node's half of a
+    randomly perturbed workspace. Samples are counted into the ``latest``
+    mass profile; every ``window_size`` samples it becomes the ``reference``
+    profile and counting restarts. A sample's raw score sums
+    ``reference mass * 2^depth`` along its path in every tree, stopping
+    below nodes with too little mass, so scoring and learning both take
+    ``n_trees * height`` steps per sample and sparse regions score low.
+
+    The workspace is laid over the ranges of the first window, which is
+    only learned from. Raw scores are then mapped to 0-1 with a
+    ScoreCalibration refitted at every window change from the most recent
+    raw scores, once a full window of them has been seen.
+    """
+
+    def __init__(self, n_trees: int = 10, height: int = 8, window_size: int = 250, seed: int = 42):
+        self.n_trees = int(n_trees)
+        self.height = int(height)
+        self.window_size = int(window_size)
+        self.seed = seed
+        self.n_nodes = 2 ** (self.height + 1) - 1
+        self.size_limit = SIZE_LIMIT_RATIO * self.window_size
+
+        # Flat node arrays, tree-major: node i of tree t is at t * n_nodes + i
+        self.feature = None
+        self.threshold = None
+        self.reference = np.zeros(self.n_trees * self.n_nodes, dtype=np.float64)
+        self.latest = np.zeros(self.n_trees * self.n_nodes, dtype=np.float64)
+        self.window_count = 0
+        self.windows = 0
+
+        self._warmup = []
+        self._recent = np.empty(CALIBRATION_SAMPLE, dtype=np.float64)
+        self._recent_count = 0
+        self.calibration = None
+
+    @property
+    def built(self) -> bool:
+        return self.feature is not None
+
+    def score_learn(self, features: np.ndarray) -> np.ndarray:
+        """
+        Score samples in order, learning each one after it is scored
+
+        Args:
+            features: Feature matrix, rows in arrival order
+
+        Returns:
+            Anomaly scores in [0, 1], NaN while the model is warming up
+        """
+        features = np.asarray(features, dtype=np.float64)
+        scores = np.full(len(features), np.nan)
+        start = 0
+
+        if not self.built:
+            # The first window only lays out the workspace and the reference
+            take = min(self.window_size - sum(len(rows) for rows in self._warmup), len(features))
+            self._warmup.append(features[:take])
+            start = take
+            if sum(len(rows) for rows in self._warmup) < self.window_size:
+                return scores
+            warmup = np.vstack(self._warmup)
+            self._warmup = []
+            self._build(warmup)
+            self._learn(self._walk(warmup))
+
+        # Within a window the reference is fixed, so each chunk up to the
+        # next window change is scored and learned in one pass
+        while start < len(features):
+            stop = min(start + self.window_size - self.window_count, len(features))
+            path = self._walk(features[start:stop])
+            raw = self._mass_scores(path)
+            if self.calibration is not None:
+                scores[start:stop] = self.calibration.transform(raw)
+            self._remember(raw)
+            self._learn(path)
+            start = stop
+
+        return scores
+
+    def _build(self, sample: np.ndarray):
+        """Random trees over a workspace perturbed around the sample's ranges"""
+        rng = np.random.default_rng(self.seed)
+        n_features = sample.shape[1]
+        low = sample.min(axis=0)
+        span = sample.max(axis=0) - low
+        span[span <= 0] = 1.0
+
+        n_internal = 2 ** self.height - 1
+        self.feature = np.zeros(self.n_trees * self.n_nodes, dtype=np.intp)
+        self.threshold = np.full(self.n_trees * self.n_nodes, np.inf)
+
+        for tree in range(self.n_trees):
+            # Workspace per feature: [s - r, s + r] with s random in the
+            # range and r = 2 * max(s, 1 - s), relative to the range
+            s = rng.random(n_features)
+            r = 2.0 * np.maximum(s, 1.0 - s)
+            node_low = np.empty((self.n_nodes, n_features))
+            node_high = np.empty((self.n_nodes, n_features))
+            node_low[0] = low + (s - r) * span
+            node_high[0] = low + (s + r) * span
+
+            split = rng.integers(n_features, size=n_internal)
+            base = tree * self.n_nodes
+            for node in range(n_internal):
+                q = split[node]
+                middle = 0.5 * (node_low[node, q] + node_high[node, q])
+                self.feature[base + node] = q
+                self.threshold[base + node] = middle
+                for child in (2 * node + 1, 2 * node + 2):
+                    node_low[child] = node_low[node]
+                    node_high[child] = node_high[node]
+                node_high[2 * node + 1, q] = middle
+                node_low[2 * node + 2, q] = middle
+
+    def _walk(self, features: np.ndarray) -> np.ndarray:
+        """Global node indices along every path, shape (height + 1, samples, trees)"""
+        rows = np.arange(len(features))[:, None]
+        base = np.arange(self.n_trees) * self.n_nodes
+        node = np.zeros((len(features), self.n_trees), dtype=np.intp)
+        path = np.empty((self.height + 1, len(features), self.n_trees), dtype=np.intp)
+        path[0] = base
+        for depth in range(1, self.height + 1):
+            flat = base + node
+            right = features[rows, self.feature[flat]] > self.threshold[flat]
+            node = 2 * node + 1 + right
+            path[depth] = base + node
+        return path
+
+    def _mass_scores(self, path: np.ndarray) -> np.ndarray:
+        """Sum of reference mass * 2^depth down to the first node below the size limit"""
+        mass = self.reference[path]
+        open_nodes = np.ones(mass.shape, dtype=bool)
+        np.logical_and.accumulate(mass[:-1] >= self.size_limit, axis=0, out=open_nodes[1:])
+        weights = 2.0 ** np.arange(self.height + 1)
+        return np.einsum('dst,d->s', mass * open_nodes, weights)
+
+    def _learn(self, path: np.ndarray):
+        """Count a chunk into the latest profile, swapping profiles when the window is full"""
+        self.latest += np.bincount(path.ravel(), minlength=len(self.latest))
+        self.window_count += path.shape[1]
+        if self.window_count >= self.window_size:
+            self.reference, self.latest = self.latest, self.reference
+            self.latest[:] = 0.0
+            self.window_count = 0
+            self.windows += 1
+            if self._recent_count >= self.window_size:
+                self.calibration = ScoreCalibration.fit(self._recent[:min(self._recent_count, len(self._recent))])
+
+    def _remember(self, raw: np.ndarray):
+        """Keep the latest raw scores in a ring buffer for calibration"""
+        raw = raw[-len(self._recent):]
+        positions = (self._recent_count + np.arange(len(raw))) % len(self._recent)
+        self._recent[positions] = raw
+        self._recent_count += len(raw)
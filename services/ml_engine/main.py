@@ -3,31 +3,62 @@ SAIMon ML Engine - Main entry point
 Handles model training, inference, and anomaly detection
 """
 import time
+import threading
 import schedule
 from loguru import logger
 from config import load_config
 from data_collector import PrometheusDataCollector
 from anomaly_detector import AnomalyDetectorEngine
+from remote_write import RemoteWriteReceiver
 
-# Load configuration
-config = load_config()
+# Components, created by init_components(). Nothing is built at import
+# time: training pool workers are spawned and re-import this module.
+config = None
+data_collector = None
+anomaly_detector = None
+remote_write_receiver = None
 
-# Initialize components
-data_collector = PrometheusDataCollector(config)
-anomaly_detector = AnomalyDetectorEngine(config)
+# Only one training run at a time
+training_lock = threading.Lock()
 
-logger.info("SAIMon ML Engine starting...")
+
+def init_components():
+    """Load the configuration and create the collector, engine and receiver"""
+    global config, data_collector, anomaly_detector, remote_write_receiver
+    
+    logger.info("SAIMon ML Engine starting...")
+    
+    # Load configuration
+    config = load_config()
+    
+    # Initialize components
+    data_collector = PrometheusDataCollector(config)
+    anomaly_detector = AnomalyDetectorEngine(config)
+    
+    # Optional push ingestion; pulling stays the fallback for every metric
+    if config.get('remote_write', {}).get('enabled', False):
+        remote_write_receiver = RemoteWriteReceiver(config, data_collector)
 
 
-def train_models():
+def train_models(metric_names: list = None):
     """Scheduled model training job"""
+    if not training_lock.acquire(blocking=False):
+        logger.warning("Model training already running, skipping")
+        return
+    
     logger.info("Starting scheduled model training...")
     try:
-        # This will be implemented in Phase 3
-        anomaly_detector.train_all_models()
+        anomaly_detector.train_all_models(metric_names, data_collector)
         logger.info("Model training completed successfully")
     except Exception as e:
         logger.error(f"Model training failed: {e}")
+    finally:
+        training_lock.release()
+
+
+def train_models_in_background(metric_names: list = None):
+    """Run train_models on a daemon thread so inference keeps running"""
+    threading.Thread(target=train_models, args=(metric_names,), name='model-training', daemon=True).start()
 
 
 def run_inference():
@@ -45,23 +76,41 @@ def run_inference():
             # Save anomalies to database
             anomaly_detector.save_anomalies(anomalies)
         
+        # Forecasts with their prediction intervals
+        anomaly_detector.save_predictions()
+        
+        # Models that were unreadable or trained on other features when first used
+        stale_metrics = anomaly_detector.take_stale_metrics()
+        if stale_metrics:
+            logger.info(f"Retraining in the background: {', '.join(stale_metrics)}")
+            train_models_in_background(stale_metrics)
+        
     except Exception as e:
         logger.error(f"Inference failed: {e}")
 
 
 def main():
     """Main loop"""
+    init_components()
+    
     # Schedule training (e.g., daily at 2 AM)
-    schedule.every().day.at("02:00").do(train_models)
+    schedule.every().day.at("02:00").do(train_models_in_background)
     
-    # Schedule inference (e.g., every 5 minutes)
-    schedule.every(5).minutes.do(run_inference)
+    # Schedule inference (e.g., every 5 minutes). With remote write feeding
+    # the buffers, run once per scrape interval instead.
+    if remote_write_receiver is not None:
+        remote_write_receiver.start()
+        schedule.every(int(data_collector.scrape_interval)).seconds.do(run_inference)
+    else:
+        schedule.every(5).minutes.do(run_inference)
     
     logger.info("ML Engine is running. Press Ctrl+C to stop.")
     
-    # Initial training on startup
-    logger.info("Running initial model training...")
-    train_models()
+    # Start from the persisted models; retrain only what is missing or stale
+    stale_metrics = anomaly_detector.load_models()
+    if stale_metrics:
+        logger.info(f"Training models in the background for: {', '.join(stale_metrics)}")
+        train_models_in_background(stale_metrics)
     
     # Run initial inference
     run_inference()
@@ -0,0 +1,136 @@
+"""
+Model Store
+Bounded LRU cache of trained models, loaded lazily from disk
+"""
+from collections import OrderedDict
+import threading
+from loguru import logger
+
+
+class ModelStore:
+    """
+    Trained models and their scalers, keyed by model key
+
+    Only the most recently used entries stay in memory, bounded by entry
+    count and/or an approximate byte budget (the size of the model file).
+    Evicted or registered-but-unloaded models are reloaded on first use via
+    ``loader(model_key)``, which returns ``(model, scaler, nbytes)`` or
+    None. Safe to use from the training thread and inference concurrently;
+    loads run outside the lock, so a slow disk read doesn't hold up ``put``,
+    and a model put while another thread was loading the same key wins.
+    """
+
+    def __init__(self, loader, max_entries: int = None, max_bytes: int = None):
+        self.loader = loader
+        self.max_entries = max_entries or None
+        self.max_bytes = max_bytes or None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._known = set()
+        # Bumped by put/discard, to spot models replaced during a load
+        self._versions = {}
+        self._lock = threading.RLock()
+
+    def __contains__(self, model_key: str) -> bool:
+        """Whether a model is available, in memory or on disk"""
+        return model_key in self._known
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+    def __iter__(self):
+        return iter(sorted(self._known))
+
+    def __getitem__(self, model_key: str):
+        """The model for a key, loading it if needed"""
+        entry = self.get(model_key)
+        if entry is None:
+            raise KeyError(model_key)
+        return entry[0]
+
+    def register(self, model_key: str):
+        """Mark a model as available on disk without loading it"""
+        with self._lock:
+            self._known.add(model_key)
+
+    def put(self, model_key: str, model, scaler=None, nbytes: int = 0):
+        """Add or replace a model, evicting least-recently-used ones over budget"""
+        with self._lock:
+            old = self._entries.pop(model_key, None)
+            if old is not None:
+                self.nbytes -= old[2]
+            self._entries[model_key] = (model, scaler, nbytes)
+            self._known.add(model_key)
+            self._versions[model_key] = self._versions.get(model_key, 0) + 1
+            self.nbytes += nbytes
+            self._evict()
+
+    def get(self, model_key: str):
+        """
+        Look up a model, loading it on a miss
+
+        Returns:
+            Tuple of (model, scaler), or None if it is unavailable
+        """
+        with self._lock:
+            entry = self._entries.get(model_key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(model_key)
+                return entry[0], entry[1]
+
+            self.misses += 1
+            if model_key not in self._known:
+                return None
+            version = self._versions.get(model_key, 0)
+
+        loaded = self.loader(model_key)
+
+        with self._lock:
+            if self._versions.get(model_key, 0) != version:
+                # Replaced or discarded while loading; the newer state wins
+                entry = self._entries.get(model_key)
+                return None if entry is None else (entry[0], entry[1])
+
+            if loaded is None:
+                # Unreadable or incompatible; don't retry every tick
+                self._known.discard(model_key)
+                return None
+
+            model, scaler, nbytes = loaded
+            self.put(model_key, model, scaler, nbytes)
+            return model, scaler
+
+    def discard(self, model_key: str):
+        """Forget a model entirely"""
+        with self._lock:
+            entry = self._entries.pop(model_key, None)
+            if entry is not None:
+                self.nbytes -= entry[2]
+            self._known.discard(model_key)
+            self._versions[model_key] = self._versions.get(model_key, 0) + 1
+
+    def _evict(self):
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while len(self._entries) > 1 and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries) or
+                (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            model_key, (_, _, nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+            logger.debug(f"Evicted model {model_key} from cache")
+
+    def stats(self) -> dict:
+        """Cache counters and current usage"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'cached': len(self._entries),
+                'known': len(self._known),
+                'bytes': self.nbytes
+            }
@@ -0,0 +1,149 @@
+"""
+Multivariate Host Features
+Aligns several metrics of each host on a shared timestamp grid
+"""
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from features import FeatureEngine, time_feature_columns
+from series_batch import SeriesBatch
+
+
+# Model keys of per-host models are "{MULTIVARIATE_PREFIX}{host}_{model type}"
+MULTIVARIATE_PREFIX = 'host:'
+
+AGGREGATIONS = ('sum', 'mean', 'min', 'max')
+
+
+class HostFeatures:
+    """
+    Joint feature matrices of the multivariate metrics, one per host
+
+    Samples are assigned to hosts by ``host_label`` and to grid slots of
+    ``step`` seconds. Several series of one metric on a host (CPU modes,
+    disks, interfaces) are combined with ``aggregation``, and only slots
+    where every metric has a value are kept. Each metric then contributes
+    the usual value and rolling features, and the time features are added
+    once at the end.
+    """
+
+    def __init__(self, config: dict):
+        multivariate_config = config.get('models', {}).get('multivariate', {})
+        data_config = config.get('data_collection', {})
+
+        self.metrics = multivariate_config.get('metrics') or [m['name'] for m in data_config.get('metrics', [])]
+        self.host_label = multivariate_config.get('host_label', 'instance')
+        self.step_ms = int(multivariate_config.get('step', data_config.get('scrape_interval', 60)) * 1000)
+        self.aggregation = multivariate_config.get('aggregation', 'sum')
+        if self.aggregation not in AGGREGATIONS:
+            logger.warning(f"Unknown multivariate aggregation '{self.aggregation}', using 'sum'")
+            self.aggregation = 'sum'
+
+        # Rolling features per metric; time features only once per row
+        self.engine = FeatureEngine(config)
+        self.time_features = self.engine.time_features
+        self.engine.time_features = []
+        self.features_per_metric = len(self.engine.feature_names)
+
+    @property
+    def feature_names(self) -> list:
+        """Column names of the joint feature matrix"""
+        names = [f"{metric}:{name}" for metric in self.metrics for name in self.engine.feature_names]
+        names.extend(self.time_features)
+        return names
+
+    def align(self, samples: dict) -> dict:
+        """
+        Put the multivariate metrics of every host on the shared grid
+
+        Args:
+            samples: Metric name -> SeriesBatch or DataFrame
+
+        Returns:
+            Dict of host -> (int64 slot timestamps, float64 matrix with one
+            column per metric), rows in time order. Empty if a metric is missing.
+        """
+        frames = []
+        for column, metric_name in enumerate(self.metrics):
+            data = samples.get(metric_name)
+            if data is None or len(data) == 0:
+                return {}
+            timestamps, values, hosts = self._host_samples(data)
+            frames.append(pd.DataFrame({
+                'host': hosts,
+                'slot': timestamps - timestamps % self.step_ms,
+                'metric': np.full(len(values), column, dtype=np.int32),
+                'value': values
+            }))
+
+        table = pd.concat(frames, ignore_index=True) \
+            .groupby(['host', 'slot', 'metric'], sort=True)['value'].agg(self.aggregation) \
+            .unstack('metric') \
+            .reindex(columns=range(len(self.metrics))) \
+            .dropna()
+
+        return {
+            host: (rows.index.get_level_values('slot').to_numpy(dtype=np.int64),
+                   rows.to_numpy(dtype=np.float64))
+            for host, rows in table.groupby(level='host', sort=False)
+        }
+
+    def _host_samples(self, data):
+        """Timestamps, values and host of every sample of one metric"""
+        if isinstance(data, SeriesBatch):
+            hosts = np.empty(len(data.labels.labels), dtype=object)
+            hosts[:] = [(labels or {}).get(self.host_label, '') for labels in data.labels.labels]
+            return data.timestamps, data.values, hosts[data.series]
+
+        timestamps = data['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        values = data['value'].to_numpy(dtype=np.float64)
+        if 'labels' not in data.columns:
+            return timestamps, values, np.full(len(data), '', dtype=object)
+
+        if 'series' in data.columns:
+            # Resolve the host once per series
+            series = data['series'].to_numpy()
+            first_labels = data.groupby('series', sort=True)['labels'].first()
+            lookup = np.full(int(series.max()) + 1, '', dtype=object)
+            lookup[first_labels.index.to_numpy()] = [(labels or {}).get(self.host_label, '')
+                                                     for labels in first_labels]
+            return timestamps, values, lookup[series]
+
+        hosts = np.empty(len(data), dtype=object)
+        hosts[:] = [(labels or {}).get(self.host_label, '') for labels in data['labels']]
+        return timestamps, values, hosts
+
+    def transform(self, timestamps: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        """
+        Joint feature matrix of one host
+
+        Args:
+            timestamps: Slot timestamps from align()
+            matrix: Aligned values from align()
+
+        Returns:
+            float32 array of shape (len(timestamps), len(feature_names))
+        """
+        k = self.features_per_metric
+        out = np.empty((len(timestamps), len(self.feature_names)), dtype=np.float32)
+        for column in range(matrix.shape[1]):
+            out[:, column * k:(column + 1) * k] = self.engine.transform(matrix[:, column])
+        if self.time_features:
+            time_feature_columns(timestamps, self.time_features, out[:, matrix.shape[1] * k:])
+        return out
+
+    def attribution(self, deviation: np.ndarray) -> np.ndarray:
+        """
+        Share of each metric in the deviation of every row
+
+        Args:
+            deviation: Absolute standardized features, as from transform()
+
+        Returns:
+            Array of shape (rows, metrics) with rows summing to 1
+        """
+        n_metrics = len(self.metrics)
+        per_metric = deviation[:, :n_metrics * self.features_per_metric] \
+            .reshape(len(deviation), n_metrics, self.features_per_metric).sum(axis=2, dtype=np.float64)
+        return per_metric / np.maximum(per_metric.sum(axis=1, keepdims=True), 1e-10)
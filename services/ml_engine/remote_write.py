@@ -0,0 +1,269 @@
+"""
+Prometheus Remote-Write Receiver
+Decodes snappy-compressed protobuf WriteRequests and pushes the samples
+straight into the collector's in-memory series buffers
+"""
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from loguru import logger
+
+try:
+    import snappy
+except ImportError:  # Optional: fall back to the pure-Python decoder below
+    snappy = None
+
+
+_DOUBLE = struct.Struct('<d')
+
+
+def _read_varint(buf, pos: int):
+    """Decode a base-128 varint, returning (value, new position)"""
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift >= 64:
+            raise ValueError("Varint too long")
+
+
+def _snappy_uncompress(data: bytes) -> bytes:
+    """Pure-Python decoder for the snappy block format used by remote write"""
+    expected, pos = _read_varint(data, 0)
+    out = bytearray()
+    end = len(data)
+
+    while pos < end:
+        tag = data[pos]
+        pos += 1
+        kind = tag & 3
+
+        if kind == 0:
+            # Literal run
+            size = tag >> 2
+            if size >= 60:
+                extra = size - 59
+                size = int.from_bytes(data[pos:pos + extra], 'little')
+                pos += extra
+            size += 1
+            out += data[pos:pos + size]
+            pos += size
+            continue
+
+        if kind == 1:
+            size = ((tag >> 2) & 7) + 4
+            offset = ((tag >> 5) << 8) | data[pos]
+            pos += 1
+        elif kind == 2:
+            size = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + 2], 'little')
+            pos += 2
+        else:
+            size = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + 4], 'little')
+            pos += 4
+
+        if offset == 0 or offset > len(out):
+            raise ValueError("Invalid snappy copy offset")
+
+        start = len(out) - offset
+        if offset >= size:
+            out += out[start:start + size]
+        else:
+            # Overlapping copy repeats the last `offset` bytes
+            pattern = bytes(out[start:])
+            out += (pattern * (size // offset + 1))[:size]
+
+    if len(out) != expected:
+        raise ValueError(f"Snappy length mismatch: expected {expected}, got {len(out)}")
+
+    return bytes(out)
+
+
+def snappy_uncompress(data: bytes) -> bytes:
+    """Decompress a snappy block, using python-snappy when installed"""
+    if snappy is not None:
+        return snappy.uncompress(data)
+    return _snappy_uncompress(data)
+
+
+def _iter_fields(buf, pos: int, end: int):
+    """
+    Iterate protobuf fields in buf[pos:end]
+
+    Yields (field number, wire type, value) where value is an int for
+    varints, a (start, end) span for length-delimited fields and the
+    field offset for fixed-width fields.
+    """
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 7
+
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+            yield field, wire_type, value
+        elif wire_type == 1:
+            yield field, wire_type, pos
+            pos += 8
+        elif wire_type == 2:
+            size, pos = _read_varint(buf, pos)
+            yield field, wire_type, (pos, pos + size)
+            pos += size
+        elif wire_type == 5:
+            yield field, wire_type, pos
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+
+
+def _decode_label(buf, start: int, end: int):
+    name = value = ''
+    for field, wire_type, span in _iter_fields(buf, start, end):
+        if wire_type != 2:
+            continue
+        text = bytes(buf[span[0]:span[1]]).decode('utf-8')
+        if field == 1:
+            name = text
+        elif field == 2:
+            value = text
+    return name, value
+
+
+def decode_write_request(payload: bytes, metric_names: set = None) -> list:
+    """
+    Decode a remote-write ``WriteRequest`` protobuf
+
+    Args:
+        payload: Uncompressed protobuf bytes
+        metric_names: Optional set of ``__name__`` values to keep; samples of
+            other metrics are skipped without decoding them
+
+    Returns:
+        List of (labels dict, int64 epoch-ms timestamps, float64 values)
+    """
+    buf = memoryview(payload)
+    series = []
+
+    for field, wire_type, span in _iter_fields(buf, 0, len(buf)):
+        if field != 1 or wire_type != 2:
+            continue  # metadata and unknown fields
+
+        labels = {}
+        sample_spans = []
+        for ts_field, ts_wire, ts_span in _iter_fields(buf, span[0], span[1]):
+            if ts_wire != 2:
+                continue
+            if ts_field == 1:
+                name, value = _decode_label(buf, *ts_span)
+                labels[name] = value
+            elif ts_field == 2:
+                sample_spans.append(ts_span)
+
+        if not sample_spans:
+            continue
+        if metric_names is not None and labels.get('__name__') not in metric_names:
+            continue
+
+        timestamps = np.empty(len(sample_spans), dtype=np.int64)
+        values = np.empty(len(sample_spans), dtype=np.float64)
+        for i, (start, end) in enumerate(sample_spans):
+            value, timestamp = 0.0, 0
+            for s_field, s_wire, s_value in _iter_fields(buf, start, end):
+                if s_field == 1 and s_wire == 1:
+                    value = _DOUBLE.unpack_from(buf, s_value)[0]
+                elif s_field == 2 and s_wire == 0:
+                    # int64 is two's complement in a varint
+                    timestamp = s_value - (1 << 64) if s_value >= (1 << 63) else s_value
+            timestamps[i] = timestamp
+            values[i] = value
+
+        series.append((labels, timestamps, values))
+
+    return series
+
+
+class RemoteWriteReceiver:
+    """HTTP endpoint accepting Prometheus remote-write batches"""
+
+    def __init__(self, config: dict, collector):
+        """
+        Args:
+            config: ML configuration
+            collector: PrometheusDataCollector whose buffers receive the samples
+        """
+        rw_config = config.get('remote_write', {})
+        self.host = rw_config.get('host', '0.0.0.0')
+        self.port = int(rw_config.get('port', 9201))
+        self.path = rw_config.get('path', '/api/v1/write')
+        # External labels Prometheus adds on remote write but not on queries
+        self.drop_labels = set(rw_config.get('drop_labels', []))
+        self.collector = collector
+        self.server = None
+        self.thread = None
+
+        # Counters exposed for logging
+        self.requests = 0
+        self.samples = 0
+        self.errors = 0
+
+    def handle(self, body: bytes) -> int:
+        """Decode a compressed WriteRequest and ingest it, returning samples accepted"""
+        payload = snappy_uncompress(body)
+        series = decode_write_request(payload, self.collector.push_metrics)
+
+        accepted = 0
+        for labels, timestamps, values in series:
+            if self.drop_labels:
+                labels = {name: value for name, value in labels.items() if name not in self.drop_labels}
+            accepted += self.collector.ingest_samples(labels['__name__'], labels, timestamps, values)
+
+        self.requests += 1
+        self.samples += accepted
+        return accepted
+
+    def _make_handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if self.path.split('?')[0] != receiver.path:
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    receiver.handle(self.rfile.read(length))
+                except Exception as e:
+                    receiver.errors += 1
+                    logger.warning(f"Rejected remote-write request: {type(e).__name__}: {e}")
+                    self.send_error(400, str(e))
+                    return
+                self.send_response(204)
+                self.end_headers()
+
+        return Handler
+
+    def start(self):
+        """Serve in a daemon thread"""
+        self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, name='remote-write', daemon=True)
+        self.thread.start()
+        logger.info(
+            f"Remote-write receiver listening on {self.host}:{self.port}{self.path} "
+            f"for {len(self.collector.push_metrics)} metric(s)"
+        )
+
+    def stop(self):
+        """Stop serving"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,180 @@
+"""
+Run-Length Anomaly Filter
+Collapses consecutive above-threshold points into one event per run
+"""
+import uuid
+import numpy as np
+
+
+class RunTracker:
+    """
+    Run-length filter over threshold masks, per model and series
+
+    Consecutive flagged samples of a series form a run. A run is reported
+    as an event (start and end timestamp, peak score, point count and the
+    rows of any ``peak_columns`` at the peak sample) as soon as it spans
+    ``min_consecutive`` points. Runs still open at the last sample of a
+    tick carry over to the next tick; while they grow they are reported
+    again under the same ``event_id`` with ``ongoing`` set, and a last
+    time with ``ongoing`` cleared once they end. ``expire`` closes open
+    runs with no new samples for ``timeout_ms``.
+    """
+
+    def __init__(self, min_consecutive: int = 1, timeout_ms: int = None):
+        self.min_consecutive = max(int(min_consecutive), 1)
+        self.timeout_ms = timeout_ms
+        # (model key, series key) -> [start, end, peak score, count, {column: peak row}, event id]
+        self.open_runs = {}
+
+    def update(self, model_key: str, mask: np.ndarray, scores: np.ndarray, timestamps: np.ndarray,
+               series: np.ndarray, series_keys: list, peak_columns: dict) -> dict:
+        """
+        Advance the runs of one model with a tick of scored samples
+
+        Args:
+            model_key: Model the scores come from
+            mask: Samples above threshold
+            scores, timestamps, series: Per-sample columns
+            series_keys: Series key of each series index
+            peak_columns: Per-sample arrays (e.g. value, labels) reported at each run's peak
+
+        Returns:
+            Dict of event columns: timestamp, end_timestamp, anomaly_score,
+            count, event_id, ongoing and one per peak column
+        """
+        order = np.lexsort((timestamps, series))
+        flagged = mask[order]
+        series_sorted = series[order]
+        changes = series_sorted[1:] != series_sorted[:-1]
+        series_first = np.r_[True, changes]
+        series_last = np.r_[changes, True]
+        run_first = flagged & (series_first | ~np.r_[False, flagged[:-1]])
+
+        events = self._new_events(peak_columns)
+
+        # Carried runs whose series resumed below threshold have ended
+        first_rows = np.flatnonzero(series_first)
+        for pos in first_rows[~flagged[first_rows]].tolist():
+            carried = self.open_runs.pop((model_key, series_keys[series_sorted[pos]]), None)
+            if carried is not None:
+                self._emit(events, carried, ongoing=False)
+
+        hits = np.flatnonzero(flagged)
+        if len(hits):
+            bounds = np.flatnonzero(run_first[hits])
+            run_id = np.cumsum(run_first[hits]) - 1
+            first = hits[bounds]
+            last = hits[np.r_[bounds[1:] - 1, len(hits) - 1]]
+            count = np.diff(np.r_[bounds, len(hits)])
+
+            hit_scores = scores[order[hits]]
+            peak_score = np.maximum.reduceat(hit_scores, bounds)
+            candidates = np.flatnonzero(hit_scores == peak_score[run_id])
+            _, first_candidate = np.unique(run_id[candidates], return_index=True)
+            peak = order[hits[candidates[first_candidate]]]
+
+            start = timestamps[order[first]]
+            end = timestamps[order[last]]
+
+            # Runs inside the tick are final and need no bookkeeping
+            interior = ~series_first[first] & ~series_last[last]
+            keep = interior & (count >= self.min_consecutive)
+            n_keep = int(keep.sum())
+            events['timestamp'].append(start[keep])
+            events['end_timestamp'].append(end[keep])
+            events['anomaly_score'].append(peak_score[keep])
+            events['count'].append(count[keep])
+            events['event_id'].append(np.array([str(uuid.uuid4()) for _ in range(n_keep)], dtype=object))
+            events['ongoing'].append(np.zeros(n_keep, dtype=bool))
+            for name, column in peak_columns.items():
+                events[name].append(column[peak[keep]])
+
+            # Runs touching either end of a series' samples may join a carried run
+            for r in np.flatnonzero(~interior).tolist():
+                key = (model_key, series_keys[series_sorted[first[r]]])
+                p = peak[r]
+                run = [int(start[r]), int(end[r]), float(peak_score[r]), int(count[r]),
+                       {name: column[p:p + 1].copy() for name, column in peak_columns.items()}, None]
+
+                carried = self.open_runs.pop(key, None) if series_first[first[r]] else None
+                if carried is not None:
+                    run[0] = carried[0]
+                    run[3] += carried[3]
+                    run[5] = carried[5]
+                    if carried[2] > run[2]:
+                        run[2] = carried[2]
+                        run[4] = carried[4]
+
+                if series_last[last[r]]:
+                    self.open_runs[key] = run
+                    self._emit(events, run, ongoing=True)
+                else:
+                    self._emit(events, run, ongoing=False)
+
+        return self._columns(events, {
+            **self._templates(timestamps, scores),
+            **{name: column[:0] for name, column in peak_columns.items()}
+        })
+
+    def expire(self, now_ms: int) -> dict:
+        """
+        Close open runs of every model with no new samples for ``timeout_ms``
+
+        Runs are checked on every tick, so a run still closes when its
+        metric or series stops reporting.
+
+        Returns:
+            Dict of model key -> event columns as from update()
+        """
+        if not self.timeout_ms:
+            return {}
+        expired = {}
+        for key in [k for k, run in self.open_runs.items() if now_ms - run[1] > self.timeout_ms]:
+            run = self.open_runs.pop(key)
+            events = expired.get(key[0])
+            if events is None:
+                events = expired[key[0]] = self._new_events(run[4])
+            self._emit(events, run, ongoing=False)
+
+        templates = self._templates(np.empty(0, dtype=np.int64), np.empty(0))
+        return {
+            model_key: self._columns(events, templates)
+            for model_key, events in expired.items() if events['timestamp']
+        }
+
+    def _new_events(self, peak_columns: dict) -> dict:
+        names = ('timestamp', 'end_timestamp', 'anomaly_score', 'count', 'event_id', 'ongoing')
+        events = {name: [] for name in names}
+        events.update({name: [] for name in peak_columns})
+        return events
+
+    def _templates(self, timestamps: np.ndarray, scores: np.ndarray) -> dict:
+        """Empty columns fixing the dtype of each event column"""
+        return {'timestamp': timestamps[:0].astype(np.int64), 'end_timestamp': timestamps[:0].astype(np.int64),
+                'anomaly_score': scores[:0].astype(np.float64), 'count': np.empty(0, dtype=np.int64),
+                'event_id': np.empty(0, dtype=object), 'ongoing': np.empty(0, dtype=bool)}
+
+    def _columns(self, events: dict, templates: dict) -> dict:
+        columns = {}
+        for name, parts in events.items():
+            template = templates.get(name)
+            if template is None:
+                columns[name] = np.concatenate(parts)
+            else:
+                columns[name] = np.concatenate(parts + [template]).astype(template.dtype, copy=False)
+        return columns
+
+    def _emit(self, events: dict, run: list, ongoing: bool):
+        """Append a run to the event columns once it is long enough, giving it its event id"""
+        if run[3] < self.min_consecutive:
+            return
+        if run[5] is None:
+            run[5] = str(uuid.uuid4())
+        events['timestamp'].append(np.array([run[0]], dtype=np.int64))
+        events['end_timestamp'].append(np.array([run[1]], dtype=np.int64))
+        events['anomaly_score'].append(np.array([run[2]], dtype=np.float64))
+        events['count'].append(np.array([run[3]], dtype=np.int64))
+        events['event_id'].append(np.array([run[5]], dtype=object))
+        events['ongoing'].append(np.array([ongoing]))
+        for name, row in run[4].items():
+            events[name].append(row)
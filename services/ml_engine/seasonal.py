@@ -0,0 +1,118 @@
+"""
+Seasonal Baselines
+Mean and standard deviation per hour of the week, for every series
+"""
+import numpy as np
+
+from features import hour_of_week
+
+
+HOURS_PER_WEEK = 168
+
+# Bucket standard deviations are kept at or above this fraction of the
+# series' overall one, so quiet hours don't turn small changes into alerts
+MIN_STD_RATIO = 0.1
+
+
+class SeasonalBaseline:
+    """
+    Table of (hour_of_day, day_of_week) baselines for a metric's series
+
+    ``mean`` and ``std`` have one row per series plus a last, metric-wide
+    row used for series that weren't seen in training. Buckets with fewer
+    than ``min_samples`` training samples take the row's overall statistics,
+    and no bucket's std drops below its row's ``std_floor``. Scoring is a
+    gather by (row, bucket); ``update`` optionally moves the buckets towards
+    new normal samples with an EWMA.
+    """
+
+    def __init__(self, keys: list, mean: np.ndarray, std: np.ndarray, std_floor: np.ndarray):
+        self.keys = list(keys)
+        self.mean = mean
+        self.std = std
+        self.std_floor = std_floor
+        self._rows = {key: row for row, key in enumerate(self.keys) if key is not None}
+
+    def __getstate__(self):
+        return {'keys': self.keys, 'mean': self.mean, 'std': self.std, 'std_floor': self.std_floor}
+
+    def __setstate__(self, state):
+        self.__init__(state['keys'], state['mean'], state['std'], state['std_floor'])
+
+    @classmethod
+    def fit(cls, values: np.ndarray, series: np.ndarray, series_keys: list, timestamps: np.ndarray,
+            min_samples: int = 10) -> 'SeasonalBaseline':
+        """
+        Build the table from training samples
+
+        Args:
+            values: Sample values
+            series: Series index per sample
+            series_keys: Series key of each series index
+            timestamps: int64 epoch milliseconds
+            min_samples: Samples a bucket needs for its own statistics
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n_rows = len(series_keys) + 1
+        metric_row = n_rows - 1
+
+        # Every sample counts for its series' row and the metric-wide row
+        bucket = hour_of_week(timestamps)
+        cells = np.concatenate((np.asarray(series, dtype=np.intp) * HOURS_PER_WEEK + bucket,
+                                metric_row * HOURS_PER_WEEK + bucket))
+        both = np.concatenate((values, values))
+        size = n_rows * HOURS_PER_WEEK
+
+        counts = np.bincount(cells, minlength=size).reshape(n_rows, HOURS_PER_WEEK)
+        sums = np.bincount(cells, weights=both, minlength=size).reshape(n_rows, HOURS_PER_WEEK)
+        sq_sums = np.bincount(cells, weights=both * both, minlength=size).reshape(n_rows, HOURS_PER_WEEK)
+
+        row_counts = np.maximum(counts.sum(axis=1, keepdims=True), 1)
+        row_mean = sums.sum(axis=1, keepdims=True) / row_counts
+        row_std = np.sqrt(np.maximum(sq_sums.sum(axis=1, keepdims=True) / row_counts - row_mean ** 2, 0))
+
+        safe_counts = np.maximum(counts, 1)
+        mean = sums / safe_counts
+        std = np.sqrt(np.maximum(sq_sums / safe_counts - mean ** 2, 0))
+
+        std_floor = MIN_STD_RATIO * row_std
+        sparse = counts < min_samples
+        mean = np.where(sparse, row_mean, mean)
+        std = np.where(sparse, row_std, np.maximum(std, std_floor))
+
+        keys = list(series_keys) + [None]
+        return cls(keys, mean.astype(np.float32), std.astype(np.float32), std_floor.ravel().astype(np.float32))
+
+    def cells(self, series: np.ndarray, series_keys: list, timestamps: np.ndarray):
+        """
+        Table row and bucket of every sample
+
+        Returns:
+            Tuple of (row indices, bucket indices)
+        """
+        metric_row = len(self.keys) - 1
+        series_rows = np.array([self._rows.get(key, metric_row) for key in series_keys], dtype=np.intp)
+        return series_rows[series], hour_of_week(timestamps)
+
+    def update(self, rows: np.ndarray, buckets: np.ndarray, values: np.ndarray, alpha: float):
+        """
+        EWMA update of the cells of new samples
+
+        Several samples of one cell are folded in at once, with the weight
+        that many sequential updates would give them.
+        """
+        if len(values) == 0:
+            return
+        cells = rows * HOURS_PER_WEEK + buckets
+        unique, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+
+        mean = self.mean.reshape(-1)
+        std = self.std.reshape(-1)
+        delta = np.asarray(values, dtype=np.float64) - mean[cells]
+        mean_delta = np.bincount(inverse, weights=delta) / counts
+        mean_sq = np.bincount(inverse, weights=delta * delta) / counts
+
+        weight = 1.0 - (1.0 - alpha) ** counts
+        variance = (1.0 - weight) * (std[unique].astype(np.float64) ** 2 + weight * mean_sq)
+        mean[unique] += (weight * mean_delta).astype(np.float32)
+        std[unique] = np.maximum(np.sqrt(variance), self.std_floor[unique // HOURS_PER_WEEK])
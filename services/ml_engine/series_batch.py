@@ -0,0 +1,200 @@
+"""
+Columnar Time Series Batches
+Decodes Prometheus range query results straight into NumPy arrays
+"""
+from dataclasses import dataclass, field
+from operator import itemgetter
+import numpy as np
+import pandas as pd
+
+
+_get_timestamp = itemgetter(0)
+_get_value = itemgetter(1)
+
+
+def series_key(labels: dict) -> str:
+    """Canonical string key for a label set"""
+    return ','.join(f"{name}={labels[name]}" for name in sorted(labels))
+
+
+class LabelTable:
+    """
+    Interned label sets addressed by an integer series index
+
+    Released indices are reused by later label sets, so a table bounded by
+    a cardinality cap does not fill up with series that went away.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.labels = []
+        self._index = {}
+        self._free = []
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def intern(self, labels: dict, limit: int = None) -> int:
+        """
+        Return the series index for a label set, adding it if new
+
+        Args:
+            labels: Label set of the series
+            limit: Optional cap on live series; new label sets beyond it get -1
+        """
+        key = series_key(labels)
+        idx = self._index.get(key)
+        if idx is None:
+            if limit is not None and len(self._index) >= limit:
+                return -1
+            if self._free:
+                idx = self._free.pop()
+                self.keys[idx] = key
+                self.labels[idx] = labels
+            else:
+                idx = len(self.labels)
+                self.keys.append(key)
+                self.labels.append(labels)
+            self._index[key] = idx
+        return idx
+
+    def index_of(self, key: str) -> int:
+        """Series index for a canonical key, or -1 if unknown"""
+        return self._index.get(key, -1)
+
+    def release(self, idx: int):
+        """Forget a series so its index can be reused"""
+        key = self.keys[idx]
+        if key is not None and self._index.get(key) == idx:
+            del self._index[key]
+            self.keys[idx] = None
+            self.labels[idx] = None
+            self._free.append(idx)
+
+    def compact(self, indices) -> tuple:
+        """
+        New table holding only the given series, numbered densely in index order
+
+        Args:
+            indices: Series indices to keep
+
+        Returns:
+            Tuple of (LabelTable, int32 array mapping each old index to its
+            new one, -1 for series left out)
+        """
+        table = LabelTable()
+        remap = np.full(len(self.keys), -1, dtype=np.int32)
+        for idx in sorted(set(int(i) for i in indices)):
+            if self.keys[idx] is not None:
+                remap[idx] = table.intern(self.labels[idx])
+        return table, remap
+
+
+@dataclass
+class SeriesBatch:
+    """
+    Samples of one metric stored column-wise
+
+    Attributes:
+        timestamps: int64 epoch milliseconds
+        values: float64 sample values
+        series: int32 index of each sample's label set in ``labels``
+        labels: Interned label table shared by all samples
+        dropped_series: Series left out by a cardinality cap
+    """
+    timestamps: np.ndarray
+    values: np.ndarray
+    series: np.ndarray
+    labels: LabelTable = field(default_factory=LabelTable)
+    dropped_series: int = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.values) == 0
+
+    @classmethod
+    def empty_batch(cls, labels: LabelTable = None) -> 'SeriesBatch':
+        """Create a batch without samples"""
+        return cls(
+            timestamps=np.empty(0, dtype=np.int64),
+            values=np.empty(0, dtype=np.float64),
+            series=np.empty(0, dtype=np.int32),
+            labels=labels if labels is not None else LabelTable()
+        )
+
+    def nbytes(self) -> int:
+        """Memory held by the sample arrays"""
+        return self.timestamps.nbytes + self.values.nbytes + self.series.nbytes
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Convert to the DataFrame layout used by the detector
+
+        Columns are ``timestamp``, ``value``, ``series`` and ``labels``. The
+        ``labels`` column references the interned dicts rather than copying
+        them, and ``attrs['series_keys']`` maps series indices to keys.
+        """
+        if self.empty:
+            return pd.DataFrame()
+
+        label_refs = np.empty(len(self.labels.labels), dtype=object)
+        label_refs[:] = self.labels.labels
+
+        df = pd.DataFrame({
+            'timestamp': pd.to_datetime(self.timestamps, unit='ms'),
+            'value': self.values,
+            'series': self.series,
+            'labels': label_refs[self.series]
+        })
+        df.attrs['series_keys'] = list(self.labels.keys)
+        return df
+
+
+def parse_query_range(result: list, labels: LabelTable = None, max_series: int = None) -> SeriesBatch:
+    """
+    Decode a query_range ``result`` list into a SeriesBatch
+
+    Args:
+        result: The ``data.result`` matrix returned by Prometheus
+        labels: Optional label table to intern into, so series indices stay
+            stable across batches of the same metric
+        max_series: Optional cap on live series in the label table; series
+            beyond it are dropped and counted in ``dropped_series``
+
+    Returns:
+        SeriesBatch with samples grouped by series in response order
+    """
+    if labels is None:
+        labels = LabelTable()
+
+    indices = [labels.intern(series_result['metric'], limit=max_series) for series_result in result]
+    counts = [len(series_result['values']) if idx >= 0 else 0
+              for series_result, idx in zip(result, indices)]
+    total = sum(counts)
+
+    timestamps = np.empty(total, dtype=np.float64)
+    values = np.empty(total, dtype=np.float64)
+    series = np.empty(total, dtype=np.int32)
+
+    offset = 0
+    for series_result, idx, count in zip(result, indices, counts):
+        if count == 0:
+            continue
+
+        pairs = series_result['values']
+        end = offset + count
+        timestamps[offset:end] = np.fromiter(map(_get_timestamp, pairs), dtype=np.float64, count=count)
+        values[offset:end] = np.fromiter(map(_get_value, pairs), dtype=np.float64, count=count)
+        series[offset:end] = idx
+        offset = end
+
+    return SeriesBatch(
+        timestamps=np.rint(timestamps * 1000).astype(np.int64),
+        values=values,
+        series=series,
+        labels=labels,
+        dropped_series=sum(1 for idx in indices if idx < 0)
+    )
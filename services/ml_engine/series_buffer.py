@@ -0,0 +1,195 @@
+"""
+In-memory Series Buffers
+Bounded ring buffers holding the most recent samples of each series
+"""
+import numpy as np
+
+from series_batch import LabelTable, SeriesBatch
+
+
+class SeriesRingBuffer:
+    """Fixed-capacity ring buffer of (timestamp, value) samples for one series"""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self.timestamps = np.zeros(self.capacity, dtype=np.int64)
+        self.values = np.zeros(self.capacity, dtype=np.float64)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def last_timestamp(self):
+        """Newest buffered timestamp in epoch milliseconds, or None if empty"""
+        if self.size == 0:
+            return None
+        return int(self.timestamps[(self.start + self.size - 1) % self.capacity])
+
+    def append(self, timestamps: np.ndarray, values: np.ndarray, min_interval: int = 0) -> int:
+        """
+        Append samples in ascending time order
+
+        Samples not newer than the last buffered timestamp are ignored, and
+        the oldest samples are overwritten once the buffer is full.
+
+        Args:
+            timestamps: int64 epoch milliseconds
+            values: float64 sample values
+            min_interval: Optional minimum spacing in ms; closer samples are
+                skipped to thin high-resolution input down to the step grid
+
+        Returns:
+            Number of samples appended
+        """
+        if self.size:
+            newer = timestamps > self.last_timestamp
+            timestamps = timestamps[newer]
+            values = values[newer]
+
+        if min_interval and len(timestamps):
+            keep = []
+            last = self.last_timestamp
+            for i, timestamp in enumerate(timestamps.tolist()):
+                if last is None or timestamp - last >= min_interval:
+                    keep.append(i)
+                    last = timestamp
+            timestamps = timestamps[keep]
+            values = values[keep]
+
+        count = len(timestamps)
+        if count == 0:
+            return 0
+
+        if count >= self.capacity:
+            self.timestamps[:] = timestamps[-self.capacity:]
+            self.values[:] = values[-self.capacity:]
+            self.start = 0
+            self.size = self.capacity
+            return count
+
+        end = (self.start + self.size) % self.capacity
+        positions = (end + np.arange(count)) % self.capacity
+        self.timestamps[positions] = timestamps
+        self.values[positions] = values
+
+        overflow = max(0, self.size + count - self.capacity)
+        self.size = min(self.capacity, self.size + count)
+        self.start = (self.start + overflow) % self.capacity
+        return count
+
+    def snapshot(self, since: int = None):
+        """
+        Copy out buffered samples in time order
+
+        Args:
+            since: Optional epoch-ms lower bound (inclusive)
+
+        Returns:
+            Tuple of (timestamps, values) arrays
+        """
+        positions = (self.start + np.arange(self.size)) % self.capacity
+        timestamps = self.timestamps[positions]
+        values = self.values[positions]
+
+        if since is not None:
+            first = np.searchsorted(timestamps, since, side='left')
+            timestamps = timestamps[first:]
+            values = values[first:]
+
+        return timestamps, values
+
+
+class MetricBuffer:
+    """Ring buffers for every series of one metric, sharing a label table"""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self.labels = LabelTable()
+        self.series = {}
+
+    @property
+    def last_timestamp(self):
+        """Newest timestamp across all series, or None if nothing is buffered"""
+        timestamps = [buffer.last_timestamp for buffer in self.series.values() if buffer.size]
+        return max(timestamps) if timestamps else None
+
+    def resume_timestamp(self, max_lag: int = None):
+        """
+        Newest timestamp of the series furthest behind, where an incremental
+        fetch has to continue so no series misses samples
+
+        Args:
+            max_lag: Optional bound in ms; series further behind the newest
+                sample are taken as gone and don't hold the fetch back
+
+        Returns:
+            Epoch milliseconds, or None if nothing is buffered
+        """
+        timestamps = [buffer.last_timestamp for buffer in self.series.values() if buffer.size]
+        if not timestamps:
+            return None
+        newest = max(timestamps)
+        if max_lag is not None:
+            timestamps = [timestamp for timestamp in timestamps if newest - timestamp <= max_lag]
+        return min(timestamps)
+
+    def append_batch(self, batch: SeriesBatch, min_interval: int = 0) -> int:
+        """
+        Append a batch whose series indices come from this buffer's label table
+
+        Args:
+            batch: Samples to append
+            min_interval: Optional minimum sample spacing in ms per series
+
+        Returns:
+            Number of samples appended across all series
+        """
+        if batch.empty:
+            return 0
+
+        order = np.argsort(batch.series, kind='stable')
+        series = batch.series[order]
+        boundaries = np.flatnonzero(np.diff(series)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(series)]))
+
+        appended = 0
+        for start, end in zip(starts, ends):
+            idx = int(series[start])
+            rows = order[start:end]
+            buffer = self.series.get(idx)
+            if buffer is None:
+                buffer = self.series[idx] = SeriesRingBuffer(self.capacity)
+            appended += buffer.append(batch.timestamps[rows], batch.values[rows], min_interval)
+
+        return appended
+
+    def prune(self, since: int):
+        """Drop series whose newest sample is older than ``since`` (epoch ms)"""
+        stale = [idx for idx, buffer in self.series.items()
+                 if buffer.last_timestamp is None or buffer.last_timestamp < since]
+        for idx in stale:
+            del self.series[idx]
+            self.labels.release(idx)
+
+    def to_batch(self, since: int = None) -> SeriesBatch:
+        """Materialize buffered samples, optionally from ``since`` onwards"""
+        timestamps, values, series = [], [], []
+        for idx in sorted(self.series):
+            ts, vals = self.series[idx].snapshot(since)
+            if len(ts):
+                timestamps.append(ts)
+                values.append(vals)
+                series.append(np.full(len(ts), idx, dtype=np.int32))
+
+        if not timestamps:
+            return SeriesBatch.empty_batch(self.labels)
+
+        return SeriesBatch(
+            timestamps=np.concatenate(timestamps),
+            values=np.concatenate(values),
+            series=np.concatenate(series),
+            labels=self.labels
+        )
@@ -0,0 +1,8 @@
+"""
+Test configuration for the ML engine
+The engine's modules import each other by bare name, as when run from /app
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,68 @@
+"""
+Tests for incremental recent-window fetches
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from data_collector import PrometheusDataCollector
+
+
+def make_collector(tmp_path):
+    return PrometheusDataCollector({
+        'prometheus_url': 'http://prometheus.invalid:9090',
+        'model_path': str(tmp_path),
+        'data_collection': {
+            'fetch': {'mode': 'sequential', 'step': '1m', 'max_series_lag': 600},
+            'metrics': [{'name': 'up', 'type': 'gauge'}]
+        }
+    })
+
+
+def serve(collector, last_sample, queries):
+    """Answer range queries on the minute grid, each instance up to its own last sample"""
+    def query_range(query, start_time, end_time, step):
+        queries.append(start_time)
+        result = []
+        for instance, last in last_sample.items():
+            grid = np.arange(start_time.timestamp(), min(end_time, last).timestamp() + 0.001, 60)
+            if len(grid):
+                result.append({'metric': {'instance': instance}, 'values': [[float(t), '1'] for t in grid]})
+        return result
+    collector._query_range = query_range
+
+
+def test_lagging_series_keeps_its_samples(tmp_path):
+    collector = make_collector(tmp_path)
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(minutes=60)
+    queries = []
+
+    # b's latest samples weren't in Prometheus yet at the first tick
+    serve(collector, {'a': end, 'b': end - timedelta(minutes=3)}, queries)
+    collector._fetch_recent_metric('up', start, end)
+
+    serve(collector, {'a': end + timedelta(minutes=5), 'b': end + timedelta(minutes=5)}, queries)
+    frame = collector._fetch_recent_metric('up', start + timedelta(minutes=5), end + timedelta(minutes=5))
+
+    assert queries[-1] == end - timedelta(minutes=2)
+    for instance in ('a', 'b'):
+        timestamps = frame.loc[frame['labels'].map(lambda labels: labels['instance']) == instance, 'timestamp']
+        assert timestamps.is_unique
+        assert (timestamps.diff().dropna() == timedelta(minutes=1)).all()
+        assert timestamps.max() >= end + timedelta(minutes=4)
+    collector.close()
+
+
+def test_series_gone_longer_than_max_lag_is_not_refetched(tmp_path):
+    collector = make_collector(tmp_path)
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(minutes=60)
+    queries = []
+
+    serve(collector, {'a': end, 'b': end - timedelta(minutes=30)}, queries)
+    collector._fetch_recent_metric('up', start, end)
+    collector._fetch_recent_metric('up', start + timedelta(minutes=2), end + timedelta(minutes=2))
+
+    assert queries[-1] > end
+    collector.close()
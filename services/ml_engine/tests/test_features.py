@@ -0,0 +1,29 @@
+"""
+Tests for calendar features
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+
+from features import FeatureEngine, StreamingFeatureState, hour_of_week, time_feature_columns
+
+
+def test_calendar_features_agree():
+    # Hourly samples over two weeks, starting on a Sunday evening
+    start = int(datetime(2024, 3, 3, 22, 30, tzinfo=timezone.utc).timestamp() * 1000)
+    timestamps = start + np.arange(14 * 24, dtype=np.int64) * 3600 * 1000
+    moments = [datetime.fromtimestamp(t / 1000, tz=timezone.utc) for t in timestamps]
+
+    expected_day = np.array([moment.weekday() for moment in moments])
+    expected_hour = np.array([moment.hour for moment in moments])
+
+    columns = time_feature_columns(timestamps, ['hour_of_day', 'day_of_week', 'is_weekend'])
+    assert (columns[:, 0] == expected_hour).all()
+    assert (columns[:, 1] == expected_day).all()
+    assert (columns[:, 2] == (expected_day >= 5)).all()
+    assert (hour_of_week(timestamps) == expected_day * 24 + expected_hour).all()
+
+    engine = FeatureEngine({'feature_engineering': {'rolling_windows': [5], 'time_features': ['hour_of_day', 'day_of_week']}})
+    state = StreamingFeatureState(engine)
+    streamed = np.array([state.update(int(t), 1.0)[-2:] for t in timestamps])
+    assert (streamed == columns[:, :2]).all()
@@ -0,0 +1,126 @@
+"""
+Tests for the training data cache and incremental training fetches
+"""
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from data_collector import PrometheusDataCollector
+from series_batch import LabelTable, SeriesBatch
+from training_cache import TrainingDataCache
+
+
+STEP_MS = 60_000
+
+
+def make_config(tmp_path, max_series):
+    return {
+        'prometheus_url': 'http://prometheus.invalid:9090',
+        'model_path': str(tmp_path),
+        'data_collection': {
+            'lookback_hours': 2,
+            'max_series_per_metric': max_series,
+            'fetch': {'shard_retries': 0},
+            'metrics': [{'name': 'churn', 'type': 'gauge'}]
+        }
+    }
+
+
+def make_batch(instances, start_ms, points, labels=None):
+    """Batch of ``points`` one-minute samples for each instance"""
+    labels = labels if labels is not None else LabelTable()
+    indices = [labels.intern({'instance': instance}) for instance in instances]
+    return SeriesBatch(
+        timestamps=np.tile(start_ms + np.arange(points, dtype=np.int64) * STEP_MS, len(indices)),
+        values=np.ones(points * len(indices)),
+        series=np.repeat(np.array(indices, dtype=np.int32), points),
+        labels=labels
+    )
+
+
+def serve(collector, instances, fail=None):
+    """Answer range queries with one sample per step for each instance, failing shards starting in ``fail``"""
+    def query_range(query, start_time, end_time, step):
+        if fail is not None and fail[0] < start_time < fail[1]:
+            raise RuntimeError('shard failed')
+        grid = np.arange(start_time.timestamp(), end_time.timestamp() + 0.001, 60)
+        return [{'metric': {'instance': instance}, 'values': [[float(t), '1'] for t in grid]}
+                for instance in instances]
+    collector._query_range = query_range
+
+
+def test_churned_series_replace_expired_ones(tmp_path):
+    collector = PrometheusDataCollector(make_config(tmp_path, max_series=3))
+    cache = collector.training_cache
+    query = collector._query_for('churn')
+
+    # Three series that stopped reporting well before the lookback window
+    old_start = int((datetime.now() - timedelta(hours=5)).timestamp() * 1000)
+    cache.update('churn', None, make_batch(['a', 'b', 'c'], old_start, 30), since=0, query=query, step='1m')
+
+    # Their replacements fill the cap again and are still fetched and cached
+    serve(collector, ['d', 'e', 'f'])
+    batch = collector.fetch_training_batch('churn')
+
+    trained = {batch.labels.labels[idx]['instance'] for idx in np.unique(batch.series)}
+    assert trained == {'d', 'e', 'f'}
+    assert len(batch.labels) == 3
+
+    meta = json.loads((cache._metric_dir('churn') / 'meta.json').read_text())
+    assert sorted(labels['instance'] for labels in meta['labels']) == ['d', 'e', 'f']
+    collector.close()
+
+
+def test_failed_shards_are_fetched_on_the_next_run(tmp_path):
+    config = make_config(tmp_path, max_series=3)
+    config['data_collection']['fetch']['max_points_per_shard'] = 30
+    collector = PrometheusDataCollector(config)
+
+    # Shards in the middle of the window fail, later ones succeed
+    now = datetime.now()
+    serve(collector, ['a'], fail=(now - timedelta(minutes=100), now - timedelta(minutes=40)))
+    partial = collector.fetch_training_batch('churn')
+    gaps = collector.training_cache.gaps('churn')
+    assert len(gaps) == 2
+    assert gaps[-1][1] < partial.timestamps.max()
+    assert not any(start <= t <= end for t in partial.timestamps.tolist() for start, end in gaps)
+
+    serve(collector, ['a'])
+    full = collector.fetch_training_batch('churn')
+
+    assert collector.training_cache.gaps('churn') == []
+    assert len(full) > len(partial)
+    assert all(((start <= full.timestamps) & (full.timestamps <= end)).any() for start, end in gaps)
+    assert len(np.unique(full.timestamps)) == len(full)
+    assert (np.diff(full.timestamps) == STEP_MS).all()
+    collector.close()
+
+
+def test_prune_compacts_label_table(tmp_path):
+    cache = TrainingDataCache(tmp_path)
+    labels = LabelTable()
+    old = make_batch(['a', 'b'], 0, 10, labels)
+    recent = make_batch(['b', 'c'], 100 * STEP_MS, 10, labels)
+    batch = SeriesBatch(
+        timestamps=np.concatenate([old.timestamps, recent.timestamps]),
+        values=np.concatenate([old.values, recent.values]),
+        series=np.concatenate([old.series, recent.series]),
+        labels=labels
+    )
+
+    pruned = cache.prune(batch, since=100 * STEP_MS)
+
+    assert len(pruned) == 20
+    assert [labels['instance'] for labels in pruned.labels.labels] == ['b', 'c']
+    assert sorted(np.unique(pruned.series).tolist()) == [0, 1]
+    for idx, instance in enumerate(['b', 'c']):
+        assert (pruned.series == idx).sum() == 10
+        assert pruned.labels.labels[idx]['instance'] == instance
+
+
+def test_prune_keeps_batch_without_expired_samples(tmp_path):
+    cache = TrainingDataCache(tmp_path)
+    batch = make_batch(['a', 'b'], 100 * STEP_MS, 10)
+
+    assert cache.prune(batch, since=0) is batch
@@ -0,0 +1,181 @@
+"""
+Training Data Cache
+Per-metric on-disk cache of historical samples stored as memory-mapped .npy columns
+"""
+import json
+import re
+import shutil
+from pathlib import Path
+import numpy as np
+from loguru import logger
+
+from series_batch import LabelTable, SeriesBatch
+
+
+_COLUMNS = ('timestamps', 'values', 'series')
+
+
+class TrainingDataCache:
+    """
+    Columnar cache of training samples under ``<model_path>/training_cache``
+
+    Each metric gets a directory holding ``timestamps.npy`` (int64 epoch ms),
+    ``values.npy`` (float64), ``series.npy`` (int32) and ``meta.json`` with
+    the query, step, interned label table and the time ranges whose fetch
+    failed. Columns are read back with ``mmap_mode='r'`` so training works
+    on the page cache without copies.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _metric_dir(self, metric_name: str) -> Path:
+        """Filesystem-safe directory for a metric"""
+        return self.cache_dir / re.sub(r'[^A-Za-z0-9_.-]', '_', metric_name)
+
+    def load(self, metric_name: str, query: str = None, step: str = None) -> SeriesBatch:
+        """
+        Memory-map the cached samples of a metric
+
+        Returns None when nothing is cached or the cache was written for a
+        different query or step.
+        """
+        metric_dir = self._metric_dir(metric_name)
+        meta_file = metric_dir / 'meta.json'
+        if not meta_file.exists():
+            return None
+
+        try:
+            with open(meta_file, 'r') as f:
+                meta = json.load(f)
+
+            if (query is not None and meta.get('query') != query) or \
+                    (step is not None and meta.get('step') != step):
+                logger.info(f"Training cache for {metric_name} is for a different query, ignoring it")
+                return None
+
+            labels = LabelTable()
+            for label_set in meta.get('labels', []):
+                labels.intern(label_set)
+
+            columns = {name: np.load(metric_dir / f"{name}.npy", mmap_mode='r') for name in _COLUMNS}
+            return SeriesBatch(labels=labels, **columns)
+
+        except Exception as e:
+            logger.error(f"Error loading training cache for {metric_name}: {e}")
+            return None
+
+    def gaps(self, metric_name: str) -> list:
+        """(start, end) epoch-ms ranges missing from the cached samples because their fetch failed"""
+        meta_file = self._metric_dir(metric_name) / 'meta.json'
+        try:
+            with open(meta_file, 'r') as f:
+                return [tuple(gap) for gap in json.load(f).get('gaps', [])]
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.error(f"Error reading training cache gaps for {metric_name}: {e}")
+            return []
+
+    def store(self, metric_name: str, batch: SeriesBatch, query: str = None, step: str = None,
+              gaps: list = None) -> SeriesBatch:
+        """
+        Atomically replace the cached samples of a metric
+
+        Args:
+            gaps: (start, end) epoch-ms ranges missing from ``batch``
+
+        Returns:
+            The stored batch, memory-mapped from disk
+        """
+        metric_dir = self._metric_dir(metric_name)
+        tmp_dir = metric_dir.with_name(metric_dir.name + '.tmp')
+        old_dir = metric_dir.with_name(metric_dir.name + '.old')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        for name in _COLUMNS:
+            np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(getattr(batch, name)))
+
+        with open(tmp_dir / 'meta.json', 'w') as f:
+            json.dump({'query': query, 'step': step, 'labels': batch.labels.labels, 'gaps': gaps or []}, f)
+
+        # Swap directories so readers never see a half-written cache
+        if metric_dir.exists():
+            metric_dir.rename(old_dir)
+        tmp_dir.rename(metric_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        return self.load(metric_name)
+
+    def prune(self, batch: SeriesBatch, since: int) -> SeriesBatch:
+        """
+        Drop samples older than ``since`` and the series left without samples
+
+        The label table is rebuilt from the remaining series, so series
+        that stopped reporting neither count toward the cardinality cap of
+        the next fetch nor stay in ``meta.json``.
+
+        Returns:
+            The remaining samples with a compacted label table, or ``batch``
+            itself when nothing was dropped
+        """
+        keep = np.asarray(batch.timestamps) >= since
+        series = np.asarray(batch.series)[keep]
+        live = np.unique(series)
+        if keep.all() and len(live) == len(batch.labels) == len(batch.labels.keys):
+            return batch
+
+        labels, remap = batch.labels.compact(live)
+        return SeriesBatch(
+            timestamps=np.asarray(batch.timestamps)[keep],
+            values=np.asarray(batch.values)[keep],
+            series=remap[series],
+            labels=labels
+        )
+
+    def update(self, metric_name: str, cached: SeriesBatch, new: SeriesBatch, since: int,
+               query: str = None, step: str = None, gaps: list = None) -> SeriesBatch:
+        """
+        Append new samples to the cached ones and prune everything older than ``since``
+
+        ``new`` must be interned into ``cached.labels`` when ``cached`` is given.
+
+        Args:
+            metric_name: Name of the metric
+            cached: Previously cached batch, or None
+            new: Newly fetched samples
+            since: Epoch-ms lower bound of the retained window
+            gaps: (start, end) epoch-ms ranges still missing after this fetch,
+                recorded so the next fetch retries them
+
+        Returns:
+            The merged batch, memory-mapped from disk
+        """
+        parts = [new]
+        if cached is not None and not cached.empty:
+            parts.insert(0, SeriesBatch(
+                timestamps=cached.timestamps,
+                values=cached.values,
+                series=cached.series,
+                labels=new.labels
+            ))
+
+        timestamps = np.concatenate([part.timestamps for part in parts])
+        values = np.concatenate([part.values for part in parts])
+        series = np.concatenate([part.series for part in parts])
+
+        order = np.lexsort((timestamps, series))
+        merged = self.prune(SeriesBatch(
+            timestamps=timestamps[order],
+            values=values[order],
+            series=series[order],
+            labels=new.labels
+        ), since)
+
+        logger.info(f"Caching {len(merged)} training samples across {len(merged.labels)} series "
+                    f"for {metric_name} ({len(new)} new)")
+        gaps = [(start, end) for start, end in gaps or [] if end >= since]
+        return self.store(metric_name, merged, query=query, step=step, gaps=gaps)